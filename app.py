@@ -1,88 +1,53 @@
 
+import time
+
 import streamlit as st
-import joblib
-import gzip
-import pandas as pd
-from sklearn.ensemble import RandomForestClassifier
+
+from fraude.auditoria import auditar
+from fraude.explicacion import ranking
+from fraude.modelo import RUTA_MODELO
+from fraude.paneles import panel_arranque, panel_cache, panel_metricas, panel_modelo
+from fraude.perfiles import PERFILES
+from fraude.puntuacion import CACHE_PREDICCIONES
+from fraude.registro import obtener_registro
 
 # Configuración de la app
 st.set_page_config(page_title="Predicción de Fraude Financiero", page_icon="💰", layout="wide")
 
-# Ruta del modelo
-RUTA_MODELO = "modelo_RandomForest_optimizado.pkl.gz"
-
-def cargar_modelo_comprimido(ruta):
-    """Carga el modelo comprimido con gzip."""
-    with gzip.open(ruta, "rb") as f:
-        modelo = joblib.load(f)
-    return modelo
-
-# Cargar el modelo
-try:
-    model = cargar_modelo_comprimido(RUTA_MODELO)
-except Exception as e:
-    st.error(f"Error al cargar el modelo: {str(e)}")
-    st.stop()
-
-# Verificar si el modelo es un RandomForestClassifier
-if not isinstance(model, RandomForestClassifier):
-    st.error("El archivo cargado no es un modelo RandomForest.")
-    st.stop()
-
-# Definir perfiles de clientes con explicaciones
-perfiles = {
-    "Cliente Nuevo y Desconocido": {
-        "explicacion": "Este cliente es nuevo en la plataforma y tiene un historial financiero limitado. "
-                       "Es más difícil de evaluar y representa un mayor riesgo. Suele tener ingresos bajos y realizar pocas transacciones previas.",
-        "datos": {
-            "income": 0.3, "name_email_similarity": 0.9, "prev_address_months_count": 5,
-            "current_address_months_count": 3, "customer_age": 25, "intended_balcon_amount": 500.0,
-            "velocity_6h": 1000, "velocity_24h": 3000, "bank_branch_count_8w": 2,
-            "date_of_birth_distinct_emails_4w": 10, "credit_risk_score": 200, "email_is_free": 1,
-            "phone_home_valid": 0, "phone_mobile_valid": 1, "has_other_cards": 0,
-            "proposed_credit_limit": 5000, "foreign_request": 1, "keep_alive_session": 10,
-            "device_distinct_emails_8w": 5, "month": 2
-        }
-    },
-    "Cliente Recurrente y Estable": {
-        "explicacion": "Este cliente ha estado utilizando la plataforma durante un largo período, "
-                       "tiene un historial financiero estable y confiable. Representa un menor riesgo de fraude.",
-        "datos": {
-            "income": 0.7, "name_email_similarity": 0.5, "prev_address_months_count": 20,
-            "current_address_months_count": 50, "customer_age": 40, "intended_balcon_amount": 20000.0,
-            "velocity_6h": 200, "velocity_24h": 800, "bank_branch_count_8w": 5,
-            "date_of_birth_distinct_emails_4w": 2, "credit_risk_score": 700, "email_is_free": 0,
-            "phone_home_valid": 1, "phone_mobile_valid": 1, "has_other_cards": 1,
-            "proposed_credit_limit": 20000, "foreign_request": 0, "keep_alive_session": 120,
-            "device_distinct_emails_8w": 1, "month": 6
-        }
-    },
-    "Cliente Corporativo": {
-        "explicacion": "Este cliente representa una empresa con altos volúmenes de transacciones. "
-                       "Usualmente tiene una relación sólida con el banco y un historial de crédito robusto.",
-        "datos": {
-            "income": 1.0, "name_email_similarity": 0.2, "prev_address_months_count": 100,
-            "current_address_months_count": 120, "customer_age": 50, "intended_balcon_amount": 500000.0,
-            "velocity_6h": 5000, "velocity_24h": 20000, "bank_branch_count_8w": 10,
-            "date_of_birth_distinct_emails_4w": 1, "credit_risk_score": 900, "email_is_free": 0,
-            "phone_home_valid": 1, "phone_mobile_valid": 1, "has_other_cards": 1,
-            "proposed_credit_limit": 100000, "foreign_request": 0, "keep_alive_session": 300,
-            "device_distinct_emails_8w": 0, "month": 12
-        }
-    }
-}
+# Registro del modelo: carga en segundo plano y recarga en caliente cuando cambia el artefacto;
+# el formulario se pinta mientras tanto
+registro = obtener_registro(RUTA_MODELO)
+
+# Modo de decisión rápida: deja de evaluar árboles cuando la etiqueta ya no puede cambiar
+decision_rapida = st.sidebar.toggle("⚡ Decisión rápida", help="Misma etiqueta, evaluando solo los árboles necesarios.")
+mostrar_explicacion = st.sidebar.toggle("🧭 Explicar predicción", value=True,
+                                        help="Contribución de cada característica a la probabilidad de fraude.")
 
 # Interfaz de usuario
 st.title("🔍 Predicción de Fraude Financiero")
 
+# Versión en servicio al empezar esta ejecución: la predicción termina con ella aunque llegue otra
+version = registro.actual()
+if version is None and not registro.listo():
+    st.info("⏳ Cargando el modelo... El botón de predicción se activará en cuanto esté listo.")
+elif version is None:
+    st.error(f"Error al cargar el modelo: {str(registro.error)}")
+    if st.button("🔄 Reintentar"):
+        registro.reintentar()
+        st.rerun()
+scorer = version.scorer if version is not None else None
+
 # Selección del perfil
-perfil_seleccionado = st.selectbox("Seleccione un perfil de cliente", list(perfiles.keys()))
+perfil_seleccionado = st.selectbox("Seleccione un perfil de cliente", list(PERFILES.keys()))
 
 # Mostrar la explicación del perfil
-st.markdown(f"**ℹ️ Sobre este perfil:** {perfiles[perfil_seleccionado]['explicacion']}")
+st.markdown(f"**ℹ️ Sobre este perfil:** {PERFILES[perfil_seleccionado]['explicacion']}")
+if version is not None and version.perfiles is not None:
+    # Puntuado en lote al cargar el modelo: no se vuelve a calcular al seleccionarlo
+    st.caption(f"Probabilidad de fraude del perfil sin ajustes: {version.perfiles.proba_de(perfil_seleccionado):.1%}")
 
 # Cargar los valores del perfil seleccionado
-data = perfiles[perfil_seleccionado]["datos"]
+data = PERFILES[perfil_seleccionado]["datos"]
 
 # Mostrar los valores y permitir ajustes en los parámetros clave
 st.subheader("📊 Ajuste de Parámetros")
@@ -100,16 +65,55 @@ with col2:
     has_other_cards = st.radio("¿Tiene Otras Tarjetas?", ["No", "Sí"], index=int(data["has_other_cards"]))
 
 # Botón de predicción
-if st.button("🚀 Predecir Fraude"):
-    input_data = pd.DataFrame([{**data, 
-                                "income": income, "name_email_similarity": name_email_similarity,
-                                "customer_age": customer_age, "proposed_credit_limit": proposed_credit_limit,
-                                "foreign_request": int(foreign_request == "Sí"),
-                                "email_is_free": int(email_is_free == "Sí"), "has_other_cards": int(has_other_cards == "Sí")}])
+if st.button("🚀 Predecir Fraude", disabled=scorer is None):
+    input_data = {**data,
+                  "income": income, "name_email_similarity": name_email_similarity,
+                  "customer_age": customer_age, "proposed_credit_limit": proposed_credit_limit,
+                  "foreign_request": int(foreign_request == "Sí"),
+                  "email_is_free": int(email_is_free == "Sí"), "has_other_cards": int(has_other_cards == "Sí")}
     
     try:
-        pred = model.predict(input_data)[0]
+        inicio = time.perf_counter()
+        proba_fraude = None
+        if decision_rapida:
+            etiquetas, evaluados = scorer.predict_rapido(input_data)
+            pred = etiquetas[0]
+        else:
+            # Solo se recorren los árboles que usan los campos cambiados desde la última predicción
+            proba, st.session_state["estado_incremental"], recorridos = scorer.predict_proba_incremental(
+                input_data, st.session_state.get("estado_incremental"))
+            pred = scorer.classes_[int(proba.argmax())]
+            proba_fraude = proba[scorer.indice_fraude]
+        segundos = time.perf_counter() - inicio
         resultado = "🚨 Fraude" if pred == 1 else "✅ No Fraude"
         st.success(f"🔮 **Predicción:** {resultado}")
+        st.session_state["version_modelo"] = version.version
+        st.caption(f"Modelo {version.corta} (cargado {version.cargado})")
+        if decision_rapida:
+            st.caption(f"Árboles evaluados: {evaluados[0]} de {scorer.n_arboles}")
+        else:
+            st.caption(f"Árboles recorridos: {recorridos} de {scorer.n_arboles}")
+        if mostrar_explicacion:
+            # Descomposición por caminos: probabilidad = base + suma de contribuciones
+            principales = ranking(scorer.features, scorer.explicar_fila(input_data), n=10)
+            st.markdown(f"**🧭 ¿Por qué?** Probabilidad base del modelo: {scorer.sesgo():.1%}. "
+                        "Las barras positivas empujan hacia fraude y las negativas lo alejan.")
+            st.bar_chart({"Característica": [f for f, _ in principales],
+                          "Contribución": [c for _, c in principales]},
+                         x="Característica", y="Contribución", horizontal=True, sort=False)
     except Exception as e:
         st.error(f"Error en la predicción: {str(e)}")
+    else:
+        # Historial de auditoría: entradas, resultado, versión del modelo y latencia
+        auditar(scorer, input_data, pred, segundos, "app", proba_fraude)
+
+# Estado de la caché de predicciones y latencia por etapa
+panel_modelo(registro)
+panel_cache(CACHE_PREDICCIONES)
+panel_metricas()
+panel_arranque()
+
+# Con el formulario ya visible, esperar a que termine la carga y volver a ejecutar para activar el botón
+if not registro.listo():
+    registro.esperar()
+    st.rerun()
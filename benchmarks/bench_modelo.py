@@ -0,0 +1,201 @@
+"""Benchmark de carga del modelo, latencia por fila y rendimiento por lotes.
+
+Uso::
+
+    python benchmarks/bench_modelo.py --salida bench_resultados.json
+    python benchmarks/bench_modelo.py --modelo modelo_RandomForest_optimizado.pkl.gz
+    python benchmarks/bench_modelo.py --comparar bench_anterior.json --tolerancia 0.2
+
+Sin ``--modelo`` se usa el modelo real si existe en la ruta por defecto y, si
+no, un bosque sintético con las mismas 20 características que las apps. Los
+resultados se escriben en JSON; con ``--comparar`` se informa de cada métrica
+que empeore más de ``--tolerancia`` respecto a una ejecución anterior y el
+proceso termina con código 1.
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from comun import bosque_sintetico, cronometrar, datos_sinteticos, entorno, guardar_gzip, resumen_latencias
+
+from fraude.modelo import RUTA_MODELO, cargar_modelo_comprimido
+from fraude.motor import BosqueCompilado
+from fraude.puntuacion import FraudScorer
+
+TAMANOS_LOTE = [1, 10, 100, 1000, 10000]
+
+
+def medir_carga(ruta_gzip, dir_trabajo, repeticiones):
+    """Tiempo de carga por formato: gzip, joblib sin comprimir y joblib con mmap."""
+    modelo = cargar_modelo_comprimido(ruta_gzip)
+    ruta_plana = os.path.join(dir_trabajo, "modelo.joblib")
+    joblib.dump(modelo, ruta_plana)
+    formatos = {
+        "gzip_pickle": lambda: cargar_modelo_comprimido(ruta_gzip),
+        "joblib_sin_comprimir": lambda: joblib.load(ruta_plana),
+        "joblib_mmap": lambda: joblib.load(ruta_plana, mmap_mode="r"),
+    }
+    tamanos = {"gzip_pickle": os.path.getsize(ruta_gzip), "joblib_sin_comprimir": os.path.getsize(ruta_plana),
+               "joblib_mmap": os.path.getsize(ruta_plana)}
+    return {nombre: {**resumen_latencias(cronometrar(cargar, repeticiones)), "bytes": tamanos[nombre]}
+            for nombre, cargar in formatos.items()}
+
+
+def medir_fila(modelo, ruta_gzip, registros, repeticiones):
+    """Latencia de una fila por cada camino de puntuación."""
+    features = list(modelo.feature_names_in_)
+    scorer_sklearn = FraudScorer(modelo, motor="sklearn")
+    scorer_compilado = FraudScorer(modelo, motor="compilado")
+    ciclo = [registros[i % len(registros)] for i in range(repeticiones)]
+
+    def legado_con_carga():
+        # Lo que hacía app.py en cada rerun: descomprimir, construir el DataFrame y predecir
+        m = cargar_modelo_comprimido(ruta_gzip)
+        m.predict(pd.DataFrame([ciclo[0]])[features])
+
+    caminos = {
+        "dataframe_predict": lambda r: modelo.predict(pd.DataFrame([r])[features]),
+        "scorer_sklearn": scorer_sklearn.predict,
+        "scorer_compilado": scorer_compilado.predict,
+    }
+    resultados = {"legado_con_carga": resumen_latencias(cronometrar(legado_con_carga, max(3, repeticiones // 50)))}
+    for nombre, puntuar in caminos.items():
+        puntuar(ciclo[0])  # calentamiento
+        tiempos = np.empty(repeticiones)
+        for i, registro in enumerate(ciclo):
+            inicio = time.perf_counter()
+            puntuar(registro)
+            tiempos[i] = time.perf_counter() - inicio
+        resultados[nombre] = resumen_latencias(tiempos)
+    return resultados
+
+
+def medir_lotes(modelo, X, tamanos, segundos_min=0.5):
+    """Filas por segundo para varios tamaños de lote y caminos de puntuación."""
+    features = list(modelo.feature_names_in_)
+    scorer_sklearn = FraudScorer(modelo, motor="sklearn")
+    compilado = BosqueCompilado.desde_modelo(modelo)
+    caminos = {
+        "dataframe_predict_proba": lambda A: modelo.predict_proba(pd.DataFrame(A, columns=features)),
+        "scorer_sklearn": scorer_sklearn.predict_proba,
+        "motor_compilado": compilado.predict_proba,
+    }
+    resultados = {}
+    for tamano in tamanos:
+        lote = X[:tamano]
+        resultados[str(tamano)] = {}
+        for nombre, puntuar in caminos.items():
+            puntuar(lote)
+            filas, inicio = 0, time.perf_counter()
+            while time.perf_counter() - inicio < segundos_min:
+                puntuar(lote)
+                filas += tamano
+            resultados[str(tamano)][nombre] = filas / (time.perf_counter() - inicio)
+    return resultados
+
+
+def aplanar(resultados, prefijo=""):
+    """Convierte el JSON anidado en {ruta.de.la.metrica: valor} para compararlo."""
+    plano = {}
+    for clave, valor in resultados.items():
+        ruta = f"{prefijo}{clave}"
+        if isinstance(valor, dict):
+            plano.update(aplanar(valor, ruta + "."))
+        elif isinstance(valor, (int, float)) and not isinstance(valor, bool):
+            plano[ruta] = valor
+    return plano
+
+
+def comparar(actual, anterior, tolerancia):
+    """Lista de regresiones: tiempos que suben o rendimientos que bajan más de ``tolerancia``."""
+    regresiones = []
+    a, b = aplanar(actual["metricas"]), aplanar(anterior["metricas"])
+    for clave, nuevo in a.items():
+        viejo = b.get(clave)
+        if not viejo or clave.endswith((".n", ".bytes")):
+            continue
+        # Las latencias (ms) empeoran al subir; los rendimientos (filas/s) al bajar
+        cambio = nuevo / viejo - 1 if clave.endswith("_ms") else viejo / nuevo - 1
+        if cambio > tolerancia:
+            regresiones.append((clave, viejo, nuevo, cambio))
+    return regresiones
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark del modelo de fraude.")
+    parser.add_argument("--modelo", help="Artefacto .pkl.gz a medir (por defecto el real si existe)")
+    parser.add_argument("--sintetico", action="store_true", help="Forzar el bosque sintético")
+    parser.add_argument("--arboles", type=int, default=100)
+    parser.add_argument("--profundidad", type=int, default=16)
+    parser.add_argument("--repeticiones", type=int, default=500, help="Predicciones de una fila por camino")
+    parser.add_argument("--repeticiones-carga", type=int, default=5)
+    parser.add_argument("--lotes", type=int, nargs="+", default=TAMANOS_LOTE)
+    parser.add_argument("--salida", default="bench_resultados.json")
+    parser.add_argument("--comparar", help="JSON de una ejecución anterior")
+    parser.add_argument("--tolerancia", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    dir_trabajo = tempfile.mkdtemp(prefix="bench_fraude_")
+    try:
+        ruta = args.modelo or RUTA_MODELO
+        if args.sintetico or not os.path.exists(ruta):
+            print(f"Entrenando bosque sintético ({args.arboles} árboles, profundidad {args.profundidad})...")
+            modelo = bosque_sintetico(args.arboles, args.profundidad)
+            ruta = guardar_gzip(modelo, os.path.join(dir_trabajo, "modelo_sintetico.pkl.gz"))
+            origen = "sintetico"
+        else:
+            modelo = cargar_modelo_comprimido(ruta)
+            origen = os.path.abspath(ruta)
+
+        X, _ = datos_sinteticos(max(args.lotes), semilla=1)
+        X = X[list(modelo.feature_names_in_)]
+        registros = X.head(1000).to_dict("records")
+        Xn = X.to_numpy(dtype=np.float32)
+
+        print("Midiendo carga...")
+        carga = medir_carga(ruta, dir_trabajo, args.repeticiones_carga)
+        print("Midiendo latencia por fila...")
+        fila = medir_fila(modelo, ruta, registros, args.repeticiones)
+        print("Midiendo rendimiento por lotes...")
+        lotes = medir_lotes(modelo, Xn, args.lotes)
+    finally:
+        shutil.rmtree(dir_trabajo, ignore_errors=True)
+
+    resultados = {
+        "entorno": entorno(),
+        "modelo": {"origen": origen, "arboles": len(modelo.estimators_),
+                   "nodos": int(sum(e.tree_.node_count for e in modelo.estimators_))},
+        "metricas": {"carga": carga, "fila": fila, "lotes_filas_por_segundo": lotes},
+    }
+    with open(args.salida, "w", encoding="utf-8") as f:
+        json.dump(resultados, f, indent=2)
+
+    for nombre, r in carga.items():
+        print(f"carga  {nombre:24s} p50 {r['p50_ms']:9.1f} ms  ({r['bytes'] / 1e6:.1f} MB)")
+    for nombre, r in fila.items():
+        print(f"fila   {nombre:24s} p50 {r['p50_ms']:9.3f} ms  p99 {r['p99_ms']:9.3f} ms")
+    for tamano, caminos in lotes.items():
+        print(f"lote {tamano:>6s}  " + "  ".join(f"{n} {v:,.0f} filas/s" for n, v in caminos.items()))
+    print(f"Resultados guardados en {args.salida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            anterior = json.load(f)
+        regresiones = comparar(resultados, anterior, args.tolerancia)
+        for clave, viejo, nuevo, cambio in regresiones:
+            print(f"REGRESIÓN {clave}: {viejo:,.3f} -> {nuevo:,.3f} ({cambio:+.0%})")
+        if regresiones:
+            sys.exit(1)
+        print("Sin regresiones respecto a", args.comparar)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Benchmark de escalado de la puntuación multiproceso.
+
+Uso::
+
+    python benchmarks/bench_paralelo.py --filas 1000000 --procesos 1 2 4 8 16 32
+    python benchmarks/bench_paralelo.py --motor sklearn --salida bench_paralelo.json
+
+Mide filas/segundo de ``PuntuadorParalelo`` para cada número de procesos y
+el speedup respecto a un solo proceso. El escalado casi lineal solo se
+observa si la máquina tiene al menos ese número de núcleos libres.
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from comun import bosque_sintetico, datos_sinteticos, entorno, guardar_gzip
+
+from fraude.modelo import RUTA_MODELO, cargar_modelo_comprimido
+from fraude.paralelo import PuntuadorParalelo
+from fraude.puntuacion import FraudScorer
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Escalado de la puntuación multiproceso.")
+    parser.add_argument("--modelo", help="Artefacto .pkl.gz (por defecto el real si existe)")
+    parser.add_argument("--filas", type=int, default=500_000)
+    parser.add_argument("--procesos", type=int, nargs="+")
+    parser.add_argument("--motor", choices=["sklearn", "compilado"], default="compilado")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--salida", default="bench_paralelo.json")
+    args = parser.parse_args(argv)
+
+    cpus = os.cpu_count() or 1
+    procesos = args.procesos or sorted({2 ** i for i in range(cpus.bit_length()) if 2 ** i <= cpus} | {cpus})
+    dir_trabajo = tempfile.mkdtemp(prefix="bench_paralelo_")
+    try:
+        ruta = args.modelo or RUTA_MODELO
+        if not os.path.exists(ruta):
+            print("Entrenando bosque sintético...")
+            ruta = guardar_gzip(bosque_sintetico(), os.path.join(dir_trabajo, "modelo_sintetico.pkl.gz"))
+
+        X, _ = datos_sinteticos(args.filas, semilla=1)
+        resultados = {"entorno": entorno(), "filas": args.filas, "motor": args.motor, "procesos": {}}
+        referencia = None
+        for n in procesos:
+            with PuntuadorParalelo(ruta, procesos=n, motor=args.motor) as puntuador:
+                Xn = X[list(puntuador.features)].to_numpy(dtype=np.float32)
+                puntuador.proba_fraude(Xn[: n * 100])  # arranque de los procesos
+                tiempos = []
+                for _ in range(args.repeticiones):
+                    inicio = time.perf_counter()
+                    proba = puntuador.proba_fraude(Xn)
+                    tiempos.append(time.perf_counter() - inicio)
+            if referencia is None:
+                # Comprobar que el orden y los valores coinciden con la puntuación en proceso
+                referencia = FraudScorer(cargar_modelo_comprimido(ruta), motor="sklearn").proba_fraude(Xn)
+            if not np.array_equal(proba, referencia):
+                raise AssertionError(f"Con {n} procesos el resultado no coincide con la puntuación en proceso.")
+            filas_s = args.filas / float(np.median(tiempos))
+            resultados["procesos"][str(n)] = {"filas_por_segundo": filas_s}
+
+        base = resultados["procesos"][str(procesos[0])]["filas_por_segundo"] / procesos[0]
+        for n in procesos:
+            r = resultados["procesos"][str(n)]
+            r["speedup"] = r["filas_por_segundo"] / base
+            r["eficiencia"] = r["speedup"] / n
+            print(f"{n:3d} procesos  {r['filas_por_segundo']:12,.0f} filas/s  speedup {r['speedup']:5.2f}x  "
+                  f"eficiencia {r['eficiencia']:.0%}")
+        if max(procesos) > cpus:
+            print(f"Aviso: solo hay {cpus} núcleos; por encima de ese número no puede haber escalado.")
+    finally:
+        shutil.rmtree(dir_trabajo, ignore_errors=True)
+
+    with open(args.salida, "w", encoding="utf-8") as f:
+        json.dump(resultados, f, indent=2)
+    print(f"Resultados guardados en {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
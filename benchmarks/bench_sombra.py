@@ -0,0 +1,137 @@
+"""Benchmark de la latencia de la predicción principal con el retador en sombra.
+
+Uso::
+
+    python benchmarks/bench_sombra.py --peticiones 5000
+    python benchmarks/bench_sombra.py --retador retador.pkl.gz --salida bench_sombra.json
+
+Reproduce el camino de una petición de ``app.py`` (``predict_proba_incremental``
++ ``auditar``) y de ``src/app1.py`` (``predict_proba_fila`` + ``auditar``) y
+mide su p50/p99 sin retador y con el retador en sombra (``fraude.sombra``).
+Sin ``--retador`` se entrena un bosque sintético distinto del campeón. La
+puntuación del retador ocurre en sus propios hilos; aquí solo se mide lo que
+paga la petición. El retador no se carga de antemano: la primera medida con
+sombra incluye su carga en segundo plano, como la primera petición de una
+app recién arrancada. Las comparaciones omitidas (durante la carga o por
+cola llena) se informan aparte.
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from comun import bosque_sintetico, datos_sinteticos, entorno, guardar_gzip, resumen_latencias
+
+from fraude import sombra
+from fraude.auditoria import auditar, obtener_auditoria
+from fraude.modelo import RUTA_MODELO, cargar_modelo_comprimido
+from fraude.puntuacion import FraudScorer
+
+
+def caminos(scorer, registros):
+    """Funciones que atienden una petición como ``app.py`` y ``src/app1.py``."""
+    estado = {"i": 0, "incremental": None}
+
+    def siguiente():
+        registro = registros[estado["i"] % len(registros)]
+        estado["i"] += 1
+        return registro
+
+    def app():
+        registro = siguiente()
+        inicio = time.perf_counter()
+        proba, estado["incremental"], _ = scorer.predict_proba_incremental(registro, estado["incremental"])
+        pred = scorer.classes_[int(proba.argmax())]
+        auditar(scorer, registro, pred, time.perf_counter() - inicio, "bench_app", proba[scorer.indice_fraude])
+
+    def app1():
+        registro = siguiente()
+        inicio = time.perf_counter()
+        proba = scorer.predict_proba_fila(registro)
+        pred = int(scorer.classes_[int(proba.argmax())])
+        auditar(scorer, registro, pred, time.perf_counter() - inicio, "bench_app1", proba[scorer.indice_fraude])
+
+    return {"app.py": app, "src/app1.py": app1}
+
+
+def cronometrar_con_pausa(funcion, repeticiones, pausa):
+    """Como ``cronometrar``, pero esperando ``pausa`` segundos entre llamadas (fuera de la medida)."""
+    tiempos = np.empty(repeticiones)
+    for i in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos[i] = time.perf_counter() - inicio
+        time.sleep(pausa)
+    return tiempos
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Latencia de la predicción principal con el retador en sombra.")
+    parser.add_argument("--modelo", help="Campeón .pkl.gz (por defecto el real si existe)")
+    parser.add_argument("--retador", help="Retador (.pkl.gz, .joblib o XGBoost .json/.ubj)")
+    parser.add_argument("--peticiones", type=int, default=3000)
+    parser.add_argument("--pausa-ms", type=float, default=1.0, help="Espera entre peticiones (tráfico simulado)")
+    parser.add_argument("--salida", default="bench_sombra.json")
+    args = parser.parse_args(argv)
+
+    directorio = os.getcwd()
+    salida = os.path.abspath(args.salida)
+    dir_trabajo = tempfile.mkdtemp(prefix="bench_sombra_")
+    try:
+        ruta = args.modelo or RUTA_MODELO
+        if not os.path.exists(ruta):
+            print("Entrenando campeón sintético...")
+            ruta = guardar_gzip(bosque_sintetico(), os.path.join(dir_trabajo, "modelo_sintetico.pkl.gz"))
+        retador = args.retador
+        if retador is None:
+            print("Entrenando retador sintético...")
+            retador = guardar_gzip(bosque_sintetico(n_arboles=200, profundidad=12, semilla=1),
+                                   os.path.join(dir_trabajo, "retador_sintetico.pkl.gz"))
+
+        scorer = FraudScorer(cargar_modelo_comprimido(ruta))
+        X, _ = datos_sinteticos(2000, semilla=2)
+        registros = X[list(scorer.features)].to_dict("records")
+
+        # Historial y registro de comparaciones (rutas relativas) en la carpeta temporal
+        ruta, retador = os.path.abspath(ruta), os.path.abspath(retador)
+        os.chdir(dir_trabajo)
+
+        resultados = {"entorno": entorno(), "peticiones": args.peticiones, "pausa_ms": args.pausa_ms, "caminos": {}}
+        pausa = args.pausa_ms / 1000.0
+        for nombre, camino in caminos(scorer, registros).items():
+            r = resultados["caminos"][nombre] = {}
+            sombra.RUTA_RETADOR = None
+            cronometrar_con_pausa(camino, 200, pausa)  # calentamiento del campeón
+            r["sin_sombra"] = resumen_latencias(cronometrar_con_pausa(camino, args.peticiones, pausa))
+            # Sin calentamiento: la primera vez se mide también la carga del retador
+            sombra.RUTA_RETADOR = retador
+            r["con_sombra"] = resumen_latencias(cronometrar_con_pausa(camino, args.peticiones, pausa))
+            # Que la carga y la cola del retador no se arrastren a la siguiente medida
+            sombra.obtener_retador(retador).esperar()
+            if sombra.error_retador(retador) is not None:
+                raise sombra.error_retador(retador)
+            r["delta_p99_ms"] = r["con_sombra"]["p99_ms"] - r["sin_sombra"]["p99_ms"]
+            print(f"{nombre:12s} p99 sin sombra {r['sin_sombra']['p99_ms']:7.3f} ms · "
+                  f"con sombra {r['con_sombra']['p99_ms']:7.3f} ms · delta {r['delta_p99_ms']:+.3f} ms")
+        sombra.RUTA_RETADOR = None
+        resultados["retador"] = sombra.obtener_retador(retador).estadisticas()
+        print(f"Comparadas {resultados['retador']['comparadas']:,} · "
+              f"desacuerdos {resultados['retador']['tasa_desacuerdo']:.2%} · "
+              f"omitidas {resultados['retador']['omitidas']:,}")
+        obtener_auditoria().volcar()
+        sombra.obtener_retador(retador).registro.volcar()
+    finally:
+        os.chdir(directorio)
+        shutil.rmtree(dir_trabajo, ignore_errors=True)
+
+    with open(salida, "w", encoding="utf-8") as f:
+        json.dump(resultados, f, indent=2)
+    print(f"Resultados guardados en {salida}")
+
+
+if __name__ == "__main__":
+    main()
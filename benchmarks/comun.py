@@ -0,0 +1,89 @@
+"""Utilidades compartidas por los benchmarks."""
+import gzip
+import os
+import platform
+import sys
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+
+# Permitir importar el paquete compartido desde la raíz del proyecto
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+# Las 20 características que usan las aplicaciones, en el orden de src/app1.py
+FEATURES = [
+    "income", "name_email_similarity", "prev_address_months_count", "current_address_months_count",
+    "customer_age", "intended_balcon_amount", "velocity_6h", "velocity_24h", "bank_branch_count_8w",
+    "date_of_birth_distinct_emails_4w", "credit_risk_score", "email_is_free", "phone_home_valid",
+    "phone_mobile_valid", "has_other_cards", "proposed_credit_limit", "foreign_request",
+    "keep_alive_session", "device_distinct_emails_8w", "month",
+]
+
+# Escala aproximada de cada característica según los rangos de los formularios
+ESCALAS = np.array([1, 1, 240, 240, 100, 1e6, 1e4, 1e4, 50, 50, 1000, 1, 1, 1, 1, 1e6, 1, 1440, 50, 12])
+BINARIAS = [FEATURES.index(f) for f in ("email_is_free", "phone_home_valid", "phone_mobile_valid",
+                                        "has_other_cards", "foreign_request")]
+
+
+def datos_sinteticos(n_filas, semilla=0):
+    """DataFrame con las 20 características y una etiqueta de fraude desbalanceada."""
+    rng = np.random.default_rng(semilla)
+    X = rng.random((n_filas, len(FEATURES))) * ESCALAS
+    X[:, BINARIAS] = np.round(X[:, BINARIAS])
+    X[:, FEATURES.index("month")] = np.floor(X[:, FEATURES.index("month")])
+    X = pd.DataFrame(X, columns=FEATURES)
+    riesgo = (X["credit_risk_score"] < 300) & (X["name_email_similarity"] > 0.5) & (X["foreign_request"] == 1)
+    y = (riesgo | (rng.random(n_filas) < 0.02)).astype(int)
+    return X, y
+
+
+def bosque_sintetico(n_arboles=100, profundidad=16, n_filas=20000, semilla=0):
+    """RandomForest entrenado sobre datos sintéticos con las mismas características que las apps."""
+    X, y = datos_sinteticos(n_filas, semilla)
+    modelo = RandomForestClassifier(n_estimators=n_arboles, max_depth=profundidad, random_state=semilla, n_jobs=-1)
+    modelo.fit(X, y)
+    modelo.n_jobs = None
+    return modelo
+
+
+def guardar_gzip(modelo, ruta):
+    """Guarda el modelo con el mismo formato que ``modelo_RandomForest_optimizado.pkl.gz``."""
+    with gzip.open(ruta, "wb") as f:
+        joblib.dump(modelo, f)
+    return ruta
+
+
+def cronometrar(funcion, repeticiones):
+    """Ejecuta ``funcion`` varias veces y devuelve las duraciones en segundos."""
+    tiempos = np.empty(repeticiones)
+    for i in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos[i] = time.perf_counter() - inicio
+    return tiempos
+
+
+def resumen_latencias(tiempos):
+    """p50/p99/media en milisegundos."""
+    ms = np.asarray(tiempos) * 1000.0
+    return {"p50_ms": float(np.percentile(ms, 50)), "p99_ms": float(np.percentile(ms, 99)),
+            "media_ms": float(ms.mean()), "n": int(len(ms))}
+
+
+def entorno():
+    """Versiones y máquina, para poder comparar resultados entre ejecuciones."""
+    import sklearn
+
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "sklearn": sklearn.__version__,
+        "plataforma": platform.platform(),
+        "cpus": os.cpu_count(),
+        "fecha": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
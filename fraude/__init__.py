@@ -0,0 +1,15 @@
+"""Código compartido por las aplicaciones de predicción de fraude."""
+from fraude.modelo import RUTA_MODELO, cargar_modelo, cargar_modelo_comprimido
+from fraude.motor import BosqueCompilado
+from fraude.rapido import DecisorRapido
+from fraude.puntuacion import FraudScorer, obtener_scorer
+
+__all__ = [
+    "RUTA_MODELO",
+    "BosqueCompilado",
+    "DecisorRapido",
+    "FraudScorer",
+    "cargar_modelo",
+    "cargar_modelo_comprimido",
+    "obtener_scorer",
+]
@@ -0,0 +1,144 @@
+"""Perfil de arranque: tiempo de importación por módulo y tiempo hasta el primer render.
+
+Cada proceso nuevo de Streamlit paga las importaciones y la carga del modelo
+antes de pintar la primera página. Para medirlo::
+
+    python -m fraude.arranque app.py
+    python -m fraude.arranque src/app1.py --top 25 --salida arranque.json
+
+ejecuta la app una vez en un proceso nuevo con ``python -X importtime`` (con
+el ``AppTest`` de Streamlit, sin navegador) y muestra el tiempo propio de
+importación de cada paquete, los módulos más lentos y los segundos desde el
+arranque del proceso hasta el primer render (la llamada a ``panel_arranque``
+o, si la app no la hace, el final de la primera ejecución del script).
+
+Con ``FRAUDE_PERFIL_ARRANQUE=1`` las apps muestran además en la barra
+lateral el tiempo hasta su primer render (ver ``fraude.paneles``).
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+
+_lock = threading.Lock()
+_primer_render = None  # segundos desde el inicio del proceso hasta el primer render
+
+# Se ejecuta en el proceso hijo: primera ejecución de la app y tiempo desde el inicio del proceso
+_CODIGO_HIJO = """
+import json, sys
+from streamlit.testing.v1 import AppTest
+from fraude import arranque
+app = AppTest.from_file(sys.argv[1], default_timeout=600).run()
+fin = arranque.segundos_desde_inicio()
+# Si la app llama a panel_arranque, el primer render se registra antes de esperar al modelo
+print(json.dumps({"primer_render_s": arranque.registrar_primer_render(), "fin_ejecucion_s": fin,
+                  "excepciones": [str(e.value) for e in app.exception]}))
+"""
+
+_LINEA_IMPORTTIME = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def activado():
+    return os.environ.get("FRAUDE_PERFIL_ARRANQUE", "0") == "1"
+
+
+def segundos_desde_inicio():
+    """Segundos de reloj desde que arrancó el proceso (Linux), o None si no se puede saber."""
+    try:
+        with open("/proc/self/stat", encoding="ascii") as f:
+            # El nombre del proceso va entre paréntesis y puede contener espacios
+            campos = f.read().rsplit(")", 1)[1].split()
+        with open("/proc/uptime", encoding="ascii") as f:
+            uptime = float(f.read().split()[0])
+    except (OSError, IndexError, ValueError):
+        return None
+    return uptime - int(campos[19]) / os.sysconf("SC_CLK_TCK")
+
+
+def registrar_primer_render():
+    """Guarda (una vez por proceso) el tiempo hasta el primer render y lo devuelve."""
+    global _primer_render
+    with _lock:
+        if _primer_render is None:
+            _primer_render = segundos_desde_inicio()
+        return _primer_render
+
+
+def leer_importtime(texto):
+    """Lista de (módulo, propio_ms, acumulado_ms, nivel) a partir de la salida de ``-X importtime``."""
+    modulos = []
+    for linea in texto.splitlines():
+        m = _LINEA_IMPORTTIME.match(linea)
+        if m:
+            modulos.append((m.group(4), int(m.group(1)) / 1000.0, int(m.group(2)) / 1000.0,
+                            len(m.group(3)) // 2))
+    return modulos
+
+
+def por_paquete(modulos):
+    """Tiempo propio de importación sumado por paquete de primer nivel, de mayor a menor."""
+    totales = {}
+    for modulo, propio, _, _ in modulos:
+        paquete = modulo.split(".")[0]
+        totales[paquete] = totales.get(paquete, 0.0) + propio
+    return sorted(totales.items(), key=lambda x: -x[1])
+
+
+def perfilar(script):
+    """Ejecuta ``script`` en un proceso nuevo y devuelve el perfil de arranque."""
+    raiz = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    entorno = dict(os.environ, FRAUDE_PERFIL_ARRANQUE="1",
+                   PYTHONPATH=os.pathsep.join(filter(None, [raiz, os.environ.get("PYTHONPATH")])))
+    inicio = time.perf_counter()
+    proceso = subprocess.run([sys.executable, "-X", "importtime", "-c", _CODIGO_HIJO, script],
+                             capture_output=True, text=True, env=entorno)
+    total = time.perf_counter() - inicio
+    if proceso.returncode != 0:
+        raise RuntimeError(f"La app terminó con error:\n{proceso.stderr[-2000:]}")
+    resultado = json.loads(proceso.stdout.strip().splitlines()[-1])
+    modulos = leer_importtime(proceso.stderr)
+    resultado.update({
+        "script": script,
+        "proceso_s": total,
+        # Solo las importaciones de primer nivel: sus acumulados no se solapan
+        "importacion_s": sum(acumulado for _, _, acumulado, nivel in modulos if nivel == 0) / 1000.0,
+        "paquetes_ms": por_paquete(modulos),
+        "modulos_ms": sorted(((m, acumulado) for m, _, acumulado, _ in modulos), key=lambda x: -x[1]),
+    })
+    return resultado
+
+
+def informe(perfil, top=15):
+    lineas = [f"Script: {perfil['script']}",
+              f"Primer render: {perfil['primer_render_s']:.2f} s desde el inicio del proceso "
+              f"(importaciones en total: {perfil['importacion_s']:.2f} s)",
+              f"Fin de la ejecución (incluida la espera al modelo): {perfil['fin_ejecucion_s']:.2f} s", "",
+              f"{'paquete':30s} {'propio (ms)':>12s}"]
+    lineas += [f"{paquete:30s} {ms:12.1f}" for paquete, ms in perfil["paquetes_ms"][:top]]
+    lineas += ["", f"{'módulo':50s} {'acumulado (ms)':>15s}"]
+    lineas += [f"{modulo:50s} {ms:15.1f}" for modulo, ms in perfil["modulos_ms"][:top]]
+    if perfil["excepciones"]:
+        lineas += ["", "Excepciones en la app: " + "; ".join(perfil["excepciones"])]
+    return "\n".join(lineas)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Perfil de arranque de una app de Streamlit.")
+    parser.add_argument("script", help="Archivo de la app, p. ej. app.py o src/app1.py")
+    parser.add_argument("--top", type=int, default=15, help="Paquetes y módulos a mostrar")
+    parser.add_argument("--salida", help="Guardar el perfil completo en JSON")
+    args = parser.parse_args(argv)
+
+    perfil = perfilar(args.script)
+    print(informe(perfil, args.top))
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump(perfil, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
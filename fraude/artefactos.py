@@ -0,0 +1,255 @@
+"""Conversión del artefacto del modelo a formatos de carga más rápida.
+
+``modelo_RandomForest_optimizado.pkl.gz`` es un único blob gzip que hay que
+descomprimir entero en cada carga. Este módulo lo re-codifica en un
+directorio con un ``manifest.json`` y uno o varios formatos:
+
+* ``joblib``: pickle de joblib sin comprimir (se abre con ``mmap_mode``).
+* ``lz4`` / ``zstd``: pickle comprimido con lz4 o zstandard, si el paquete
+  correspondiente está instalado.
+* ``fragmentos``: un esqueleto del bosque sin árboles y un par de ``.npy``
+  (nodos y valores) por árbol, que se abren con ``mmap_mode``.
+
+El manifiesto guarda el SHA-256 del artefacto original y de cada archivo
+generado, además del tamaño y el tiempo de carga medido al convertir, para
+poder elegir un formato por despliegue::
+
+    python -m fraude.artefactos convertir modelo_RandomForest_optimizado.pkl.gz --destino modelo_convertido
+    python -m fraude.artefactos informe modelo_convertido
+
+``cargar_convertido`` elige el formato disponible más rápido, verifica sus
+checksums y devuelve el ``RandomForestClassifier``. ``fraude.modelo``
+lo usa cuando ``RUTA_MODELO`` apunta a un directorio convertido.
+"""
+import argparse
+import copy
+import hashlib
+import io
+import json
+import os
+import time
+
+import joblib
+import numpy as np
+
+from fraude.modelo import cargar_modelo_comprimido, huella_artefacto, validar_modelo
+
+MANIFIESTO = "manifest.json"
+FORMATOS = ("joblib", "lz4", "zstd", "fragmentos")
+
+
+def formato_disponible(formato):
+    """Indica si las dependencias del formato están instaladas."""
+    modulo = {"lz4": "lz4", "zstd": "zstandard"}.get(formato)
+    if modulo is None:
+        return formato in FORMATOS
+    try:
+        __import__(modulo)
+    except ImportError:
+        return False
+    return True
+
+
+def _sha256_archivos(rutas):
+    sha = hashlib.sha256()
+    for ruta in rutas:
+        sha.update(huella_artefacto(ruta).encode("ascii"))
+    return sha.hexdigest()
+
+
+def _guardar_zstd(modelo, ruta):
+    import zstandard
+
+    with open(ruta, "wb") as f, zstandard.ZstdCompressor(level=3).stream_writer(f) as z:
+        joblib.dump(modelo, z)
+
+
+def _cargar_zstd(ruta):
+    import zstandard
+
+    # joblib necesita un archivo con seek; se descomprime a memoria
+    with open(ruta, "rb") as f, zstandard.ZstdDecompressor().stream_reader(f) as z:
+        return joblib.load(io.BytesIO(z.read()))
+
+
+def _guardar_fragmentos(modelo, directorio):
+    """Guarda el esqueleto del bosque y los arrays de cada árbol por separado."""
+    os.makedirs(directorio, exist_ok=True)
+    esqueleto = copy.copy(modelo)
+    esqueleto.estimators_ = []
+    arboles = []
+    for i, estimador in enumerate(modelo.estimators_):
+        vacio = copy.copy(estimador)
+        del vacio.tree_
+        esqueleto.estimators_.append(vacio)
+        estado = estimador.tree_.__getstate__()
+        nodos, valores = f"arbol_{i:04d}_nodos.npy", f"arbol_{i:04d}_valores.npy"
+        np.save(os.path.join(directorio, nodos), estado["nodes"])
+        np.save(os.path.join(directorio, valores), estado["values"])
+        arboles.append({"nodos": nodos, "valores": valores, "max_depth": int(estado["max_depth"]),
+                        "node_count": int(estado["node_count"])})
+    joblib.dump(esqueleto, os.path.join(directorio, "esqueleto.joblib"))
+    with open(os.path.join(directorio, "arboles.json"), "w", encoding="utf-8") as f:
+        json.dump(arboles, f)
+    return ["esqueleto.joblib", "arboles.json"] + [a[k] for a in arboles for k in ("nodos", "valores")]
+
+
+def _cargar_fragmentos(directorio):
+    from sklearn.tree._tree import Tree
+
+    modelo = joblib.load(os.path.join(directorio, "esqueleto.joblib"))
+    with open(os.path.join(directorio, "arboles.json"), encoding="utf-8") as f:
+        arboles = json.load(f)
+    n_classes = np.atleast_1d(np.asarray(modelo.n_classes_, dtype=np.intp))
+    for estimador, arbol in zip(modelo.estimators_, arboles):
+        tree = Tree(modelo.n_features_in_, n_classes, modelo.n_outputs_)
+        tree.__setstate__({
+            "max_depth": arbol["max_depth"],
+            "node_count": arbol["node_count"],
+            "nodes": np.load(os.path.join(directorio, arbol["nodos"]), mmap_mode="r"),
+            "values": np.load(os.path.join(directorio, arbol["valores"]), mmap_mode="r"),
+        })
+        estimador.tree_ = tree
+    return modelo
+
+
+def _guardar(modelo, formato, destino):
+    """Escribe un formato y devuelve la lista de archivos (relativos a ``destino``)."""
+    if formato == "joblib":
+        joblib.dump(modelo, os.path.join(destino, "modelo.joblib"))
+        return ["modelo.joblib"]
+    if formato == "lz4":
+        joblib.dump(modelo, os.path.join(destino, "modelo.joblib.lz4"), compress=("lz4", 3))
+        return ["modelo.joblib.lz4"]
+    if formato == "zstd":
+        _guardar_zstd(modelo, os.path.join(destino, "modelo.joblib.zst"))
+        return ["modelo.joblib.zst"]
+    archivos = _guardar_fragmentos(modelo, os.path.join(destino, "fragmentos"))
+    return [os.path.join("fragmentos", a) for a in archivos]
+
+
+def _cargar(formato, destino):
+    if formato == "joblib":
+        return joblib.load(os.path.join(destino, "modelo.joblib"), mmap_mode="r")
+    if formato == "lz4":
+        return joblib.load(os.path.join(destino, "modelo.joblib.lz4"))
+    if formato == "zstd":
+        return _cargar_zstd(os.path.join(destino, "modelo.joblib.zst"))
+    return _cargar_fragmentos(os.path.join(destino, "fragmentos"))
+
+
+def leer_manifiesto(destino):
+    with open(os.path.join(destino, MANIFIESTO), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _medir_carga(cargar, repeticiones):
+    """Mediana en milisegundos de varias cargas."""
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        cargar()
+        tiempos.append((time.perf_counter() - inicio) * 1000.0)
+    return float(np.median(tiempos))
+
+
+def convertir(origen, destino, formatos=FORMATOS, repeticiones=3):
+    """Convierte ``origen`` (.pkl.gz) a los formatos pedidos que estén disponibles.
+
+    Devuelve el manifiesto escrito en ``destino``; ``omitidos`` lista los
+    formatos pedidos cuya dependencia no está instalada.
+    """
+    modelo = validar_modelo(cargar_modelo_comprimido(origen))
+    os.makedirs(destino, exist_ok=True)
+
+    manifiesto = {
+        "origen": os.path.abspath(origen),
+        "sha256_origen": huella_artefacto(origen),
+        "formatos": {
+            "gzip": {"bytes": os.path.getsize(origen),
+                     "carga_ms": _medir_carga(lambda: cargar_modelo_comprimido(origen), repeticiones)},
+        },
+        "omitidos": [],
+    }
+    for formato in formatos:
+        if not formato_disponible(formato):
+            manifiesto["omitidos"].append(formato)
+            continue
+        archivos = _guardar(modelo, formato, destino)
+        rutas = [os.path.join(destino, a) for a in archivos]
+        manifiesto["formatos"][formato] = {
+            "archivos": archivos,
+            "sha256": _sha256_archivos(rutas),
+            "bytes": sum(os.path.getsize(r) for r in rutas),
+            "carga_ms": _medir_carga(lambda: _cargar(formato, destino), repeticiones),
+        }
+    with open(os.path.join(destino, MANIFIESTO), "w", encoding="utf-8") as f:
+        json.dump(manifiesto, f, indent=2)
+    return manifiesto
+
+
+def verificar(destino, formato, manifiesto=None, origen=None):
+    """Comprueba los checksums de un formato y, si existe, que el original no haya cambiado."""
+    manifiesto = manifiesto or leer_manifiesto(destino)
+    info = manifiesto["formatos"][formato]
+    rutas = [os.path.join(destino, a) for a in info["archivos"]]
+    if _sha256_archivos(rutas) != info["sha256"]:
+        raise ValueError(f"El checksum del formato {formato} no coincide con el manifiesto.")
+    origen = origen or manifiesto.get("origen")
+    if origen and os.path.exists(origen) and huella_artefacto(origen) != manifiesto["sha256_origen"]:
+        raise ValueError("El modelo original cambió desde la conversión; vuelva a convertirlo.")
+
+
+def cargar_convertido(destino, formato=None, verificar_checksums=True):
+    """Carga el formato indicado o, si no se indica, el disponible más rápido."""
+    manifiesto = leer_manifiesto(destino)
+    candidatos = [formato] if formato else sorted(
+        (f for f in manifiesto["formatos"] if f != "gzip"),
+        key=lambda f: manifiesto["formatos"][f]["carga_ms"],
+    )
+    errores = []
+    for candidato in candidatos:
+        if candidato not in manifiesto["formatos"] or not formato_disponible(candidato):
+            errores.append(f"{candidato}: no disponible")
+            continue
+        try:
+            if verificar_checksums:
+                verificar(destino, candidato, manifiesto)
+            return validar_modelo(_cargar(candidato, destino))
+        except (OSError, ValueError) as e:
+            errores.append(f"{candidato}: {e}")
+    raise ValueError("No se pudo cargar ningún formato: " + "; ".join(errores))
+
+
+def informe(manifiesto):
+    """Tabla de texto con el tamaño y el tiempo de carga de cada formato."""
+    base = manifiesto["formatos"]["gzip"]
+    lineas = [f"{'formato':12s} {'tamaño (MB)':>12s} {'carga (ms)':>11s} {'vs gzip':>8s}"]
+    for formato, info in sorted(manifiesto["formatos"].items(), key=lambda x: x[1]["carga_ms"]):
+        lineas.append(f"{formato:12s} {info['bytes'] / 1e6:12.2f} {info['carga_ms']:11.1f} "
+                      f"{base['carga_ms'] / info['carga_ms']:7.1f}x")
+    return "\n".join(lineas)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Conversión del artefacto del modelo de fraude.")
+    sub = parser.add_subparsers(dest="orden", required=True)
+    p_conv = sub.add_parser("convertir", help="Convierte un .pkl.gz a formatos de carga rápida")
+    p_conv.add_argument("origen")
+    p_conv.add_argument("--destino", default="modelo_convertido")
+    p_conv.add_argument("--formatos", nargs="+", choices=FORMATOS, default=list(FORMATOS))
+    p_inf = sub.add_parser("informe", help="Muestra el tamaño y el tiempo de carga de cada formato")
+    p_inf.add_argument("destino")
+    args = parser.parse_args(argv)
+
+    if args.orden == "convertir":
+        manifiesto = convertir(args.origen, args.destino, args.formatos)
+        for formato in manifiesto["omitidos"]:
+            print(f"Formato {formato} omitido: dependencia no instalada.")
+    else:
+        manifiesto = leer_manifiesto(args.destino)
+    print(informe(manifiesto))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,400 @@
+"""Historial de predicciones para auditoría, con memoria acotada.
+
+Cada transacción puntuada (entradas, probabilidad, etiqueta, versión del
+modelo, latencia y origen) se anota en un búfer circular por columnas:
+arrays de NumPy con tipo fijo (``float32`` para las características,
+``int64`` para la fecha, códigos ``int16`` para la versión y el origen), no
+listas de diccionarios. Su tamaño es ``CAPACIDAD`` filas por proceso, sirva
+la app a las sesiones que sirva.
+
+Un hilo en segundo plano vuelca las filas pendientes cada
+``INTERVALO_VOLCADO`` segundos (o en cuanto llenan media capacidad) al
+segmento en curso del proceso en ``DIR_AUDITORIA``: Parquet si ``pyarrow``
+está instalado, CSV si no. Cada volcado añade sus filas a ese segmento
+(reescribiéndolo de forma atómica) hasta que llega a ``FILAS_SEGMENTO``
+filas o ``BYTES_SEGMENTO`` bytes; entonces se empieza uno nuevo y se borran
+los segmentos que pasan de ``MAX_SEGMENTOS`` o de ``DIAS_RETENCION`` días.
+El nombre del segmento lleva la fecha, el proceso y el número de filas, así
+que el historial se pagina sin abrir más segmentos que los de la página
+pedida. ``prefijo`` y ``extras`` (columnas
+``float32`` adicionales) permiten reutilizar el mismo almacén para otros
+registros, como el del modelo retador (``fraude.sombra``). Si el volcado no da abasto, quien
+anota vuelca en el acto antes de sobrescribir filas pendientes: ninguna
+fila se pierde y la memoria no crece. Solo si el disco falla se descartan
+las filas más antiguas (``descartadas``).
+"""
+import atexit
+import importlib.util
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+from fraude.deriva import observar
+
+# Carpeta de los segmentos (se puede sobrescribir por variable de entorno)
+DIR_AUDITORIA = os.environ.get("DIR_AUDITORIA", "auditoria")
+
+# Filas del búfer circular de cada proceso
+CAPACIDAD = int(os.environ.get("CAPACIDAD_AUDITORIA", "32768"))
+
+# Segundos entre dos volcados
+INTERVALO_VOLCADO = float(os.environ.get("INTERVALO_AUDITORIA", "10"))
+
+# Tamaño a partir del cual se deja de añadir filas a un segmento y se empieza otro
+FILAS_SEGMENTO = int(os.environ.get("FILAS_SEGMENTO_AUDITORIA", "100000"))
+BYTES_SEGMENTO = int(os.environ.get("BYTES_SEGMENTO_AUDITORIA", str(32 << 20)))
+
+# Retención: segmentos como máximo y antigüedad máxima (0 desactiva cada límite)
+MAX_SEGMENTOS = int(os.environ.get("MAX_SEGMENTOS_AUDITORIA", "1000"))
+DIAS_RETENCION = float(os.environ.get("DIAS_AUDITORIA", "30"))
+
+COLUMNAS = ("fecha_utc", "version", "origen", "fraud_probability", "fraud_label", "latencia_ms")
+
+PREFIJO = "auditoria"
+
+log = logging.getLogger(__name__)
+
+
+def _patron_segmento(prefijo):
+    return re.compile(rf"^{re.escape(prefijo)}_(\d{{8}}-\d{{6}}-\d{{6}})_(\d+)_(\d{{6}})_(\d+)\.(parquet|csv)$")
+
+
+def formato_por_defecto():
+    # Solo se comprueba que esté instalado: importar pyarrow (o pandas) retrasaría el arranque de las apps
+    return "parquet" if importlib.util.find_spec("pyarrow") is not None else "csv"
+
+
+class Auditoria:
+    """Búfer circular de predicciones con volcado a segmentos en disco."""
+
+    def __init__(self, directorio=DIR_AUDITORIA, capacidad=CAPACIDAD, intervalo=INTERVALO_VOLCADO, formato=None,
+                 prefijo=PREFIJO, extras=(), filas_segmento=FILAS_SEGMENTO, bytes_segmento=BYTES_SEGMENTO,
+                 max_segmentos=MAX_SEGMENTOS, dias_retencion=DIAS_RETENCION):
+        self.directorio = directorio
+        self.prefijo = prefijo
+        self.extras = tuple(extras)
+        self.capacidad = capacidad
+        self.intervalo = intervalo
+        self.formato = formato or formato_por_defecto()
+        self.filas_segmento = filas_segmento
+        self.bytes_segmento = bytes_segmento
+        self.max_segmentos = max_segmentos
+        self.dias_retencion = dias_retencion
+        self.error = None  # error del último volcado
+        self.descartadas = 0  # filas perdidas porque no se pudo escribir en disco
+        self.features = None
+        self._codigos = {"version": {}, "origen": {}}  # texto -> código, por columna
+        self._escritas = 0  # filas anotadas desde el inicio
+        self._volcadas = 0  # filas ya copiadas para volcar
+        self._segmento = 0  # segmentos empezados por este proceso
+        self._actual = None  # (ruta, sello, número, filas, features) del segmento en curso
+        self.eliminados = 0  # segmentos borrados por la retención
+        self._lock = threading.Lock()
+        self._lock_volcado = threading.Lock()
+        self._despertar = threading.Event()
+        self._hilo = threading.Thread(target=self._vigilar, name="auditoria", daemon=True)
+        self._hilo.start()
+        atexit.register(self.volcar)
+
+    def _reservar(self, features):
+        # Arrays del búfer; se crean con la primera anotación, cuando se conocen las características
+        self.features = tuple(features)
+        self._fecha = np.zeros(self.capacidad, dtype=np.int64)
+        self._X = np.zeros((self.capacidad, len(self.features)), dtype=np.float32)
+        self._proba = np.zeros(self.capacidad, dtype=np.float32)
+        self._etiqueta = np.zeros(self.capacidad, dtype=np.int8)
+        self._latencia = np.zeros(self.capacidad, dtype=np.float32)
+        self._version = np.zeros(self.capacidad, dtype=np.int16)
+        self._origen = np.zeros(self.capacidad, dtype=np.int16)
+        self._extras = {nombre: np.zeros(self.capacidad, dtype=np.float32) for nombre in self.extras}
+
+    def _codigo(self, columna, texto):
+        codigos = self._codigos[columna]
+        codigo = codigos.get(texto)
+        if codigo is None:
+            codigo = codigos[texto] = len(codigos)
+        return codigo
+
+    def anotar(self, features, X, etiquetas, version, origen, latencia_ms, proba=None, extras=None):
+        """Anota las filas de ``X`` (columnas en el orden de ``features``).
+
+        ``proba`` es la probabilidad de fraude de cada fila (NaN si solo se
+        calculó la etiqueta) y ``latencia_ms`` la de la petición completa (un
+        valor para todas las filas o uno por fila). ``extras`` da el valor de
+        cada columna adicional (NaN si falta).
+        """
+        X = np.atleast_2d(np.asarray(X, dtype=np.float32))
+        n = X.shape[0]
+        proba = np.full(n, np.nan, dtype=np.float32) if proba is None else proba
+        latencia_ms = np.broadcast_to(np.asarray(latencia_ms, dtype=np.float32), (n,))
+        extras = {nombre: np.broadcast_to(np.asarray((extras or {}).get(nombre, np.nan), dtype=np.float32), (n,))
+                  for nombre in self.extras}
+        if n > self.capacidad:
+            for i in range(0, n, self.capacidad):
+                parte = slice(i, i + self.capacidad)
+                self.anotar(features, X[parte], etiquetas[parte], version, origen, latencia_ms[parte], proba[parte],
+                            {nombre: valores[parte] for nombre, valores in extras.items()})
+            return
+        features = tuple(features)
+        while True:
+            with self._lock:
+                if self.features != features and self._escritas == self._volcadas:
+                    # Primera anotación u otro modelo con otras características: se rehace el búfer
+                    self._reservar(features)
+                if self.features == features and self._escritas + n - self._volcadas <= self.capacidad:
+                    posiciones = np.arange(self._escritas, self._escritas + n) % self.capacidad
+                    self._fecha[posiciones] = time.time_ns()
+                    self._X[posiciones] = X
+                    self._proba[posiciones] = proba
+                    self._etiqueta[posiciones] = etiquetas
+                    self._latencia[posiciones] = latencia_ms
+                    self._version[posiciones] = self._codigo("version", version)
+                    self._origen[posiciones] = self._codigo("origen", origen)
+                    for nombre, valores in extras.items():
+                        self._extras[nombre][posiciones] = valores
+                    self._escritas += n
+                    pendientes = self._escritas - self._volcadas
+                    break
+            # Sin sitio para las filas nuevas: se vuelca lo pendiente antes de sobrescribirlo
+            if not self.volcar() and self.error is not None:
+                with self._lock:
+                    # El disco no admite escrituras: se descartan las filas más antiguas para no crecer
+                    descartar = min(n, self._escritas - self._volcadas)
+                    self._volcadas += descartar
+                    self.descartadas += descartar
+        if pendientes >= self.capacidad // 2:
+            self._despertar.set()
+
+    def _marco(self, inicio, fin):
+        """DataFrame de las filas ``inicio:fin`` (posiciones absolutas), de la más antigua a la más nueva."""
+        import pandas as pd
+
+        posiciones = np.arange(inicio, fin) % self.capacidad
+        textos = {columna: np.array(list(codigos), dtype=object) for columna, codigos in self._codigos.items()}
+        marco = pd.DataFrame({
+            "fecha_utc": pd.to_datetime(self._fecha[posiciones], unit="ns"),
+            "version": textos["version"][self._version[posiciones]],
+            "origen": textos["origen"][self._origen[posiciones]],
+            "fraud_probability": self._proba[posiciones],
+            "fraud_label": self._etiqueta[posiciones],
+            "latencia_ms": self._latencia[posiciones],
+            **{nombre: valores[posiciones] for nombre, valores in self._extras.items()},
+        })
+        return pd.concat([marco, pd.DataFrame(self._X[posiciones], columns=list(self.features))], axis=1)
+
+    def pendientes(self, desde=0, hasta=None):
+        """Filas anotadas que aún no están en disco, de la más nueva a la más antigua.
+
+        ``desde``/``hasta`` recortan ese orden sin construir el resto de filas.
+        """
+        import pandas as pd
+
+        with self._lock:
+            if self.features is None:
+                return pd.DataFrame(columns=list(COLUMNAS))
+            n = self._escritas - self._volcadas
+            hasta = n if hasta is None else min(hasta, n)
+            desde = min(desde, hasta)
+            return self._marco(self._escritas - hasta, self._escritas - desde).iloc[::-1].reset_index(drop=True)
+
+    def volcar(self):
+        """Escribe las filas pendientes en el segmento en curso; devuelve cuántas se escribieron."""
+        with self._lock_volcado:
+            with self._lock:
+                if self.features is None or self._escritas == self._volcadas:
+                    return 0
+                marco = self._marco(self._volcadas, self._escritas)
+                features = self.features
+            try:
+                self._escribir(marco, features)
+            except Exception as e:
+                # Las filas siguen en el búfer y se reintentan en el siguiente volcado, en un segmento nuevo
+                self._actual = None
+                self.error = e
+                return 0
+            with self._lock:
+                self._volcadas += len(marco)
+            self.error = None
+            return len(marco)
+
+    def _lleno(self, actual, features):
+        ruta, _, _, filas, features_actual = actual
+        if features_actual != features or not os.path.exists(ruta):
+            return True
+        return filas >= self.filas_segmento or os.path.getsize(ruta) >= self.bytes_segmento
+
+    def _escribir(self, marco, features):
+        os.makedirs(self.directorio, exist_ok=True)
+        actual = self._actual
+        anterior = None
+        if actual is None or self._lleno(actual, features):
+            self._segmento += 1
+            sello, numero, filas = datetime.now().strftime("%Y%m%d-%H%M%S-%f"), self._segmento, len(marco)
+        else:
+            anterior, sello, numero, filas = actual[0], actual[1], actual[2], actual[3] + len(marco)
+        nombre = f"{self.prefijo}_{sello}_{os.getpid()}_{numero:06d}_{filas}.{self.formato}"
+        destino = os.path.join(self.directorio, nombre)
+        # Escritura atómica: el historial nunca ve un segmento a medio escribir
+        temporal = os.path.join(self.directorio, f".{nombre}.tmp")
+        if self.formato == "parquet":
+            import pandas as pd
+
+            if anterior is not None:
+                marco = pd.concat([leer_segmento(anterior), marco], ignore_index=True)
+            marco.to_parquet(temporal, index=False)
+        elif anterior is not None:
+            # CSV: se copia el segmento y se añaden las filas nuevas sin volver a leerlo
+            shutil.copyfile(anterior, temporal)
+            marco.to_csv(temporal, mode="a", header=False, index=False)
+        else:
+            marco.to_csv(temporal, index=False)
+        os.replace(temporal, destino)
+        if anterior is not None:
+            # Mientras existan los dos, ``segmentos`` solo cuenta el de más filas
+            os.remove(anterior)
+        self._actual = (destino, sello, numero, filas, features)
+        if anterior is None:
+            self.eliminados += limpiar(self.directorio, self.prefijo, self.max_segmentos, self.dias_retencion,
+                                       conservar=destino)
+
+    def _vigilar(self):
+        while True:
+            self._despertar.wait(self.intervalo)
+            self._despertar.clear()
+            self.volcar()
+
+    def estadisticas(self):
+        with self._lock:
+            return {"anotadas": self._escritas, "volcadas": self._volcadas,
+                    "pendientes": self._escritas - self._volcadas, "capacidad": self.capacidad,
+                    "segmentos": self._segmento, "eliminados": self.eliminados, "descartadas": self.descartadas}
+
+
+def _listar(directorio, prefijo):
+    # (sello, proceso, número, ruta, filas) de cada segmento, del más nuevo al más antiguo
+    patron = _patron_segmento(prefijo)
+    try:
+        entradas = list(os.scandir(directorio))
+    except FileNotFoundError:
+        return []
+    encontrados = {}
+    for entrada in entradas:
+        m = patron.match(entrada.name)
+        if m:
+            clave = (m.group(1), m.group(2), int(m.group(3)))
+            filas = int(m.group(4))
+            # Justo al añadir filas a un segmento existen su versión anterior y la nueva: cuenta la de más filas
+            if clave not in encontrados or filas > encontrados[clave][1]:
+                encontrados[clave] = (entrada.path, filas)
+    return [(*clave, ruta, filas) for clave, (ruta, filas) in
+            sorted(encontrados.items(), key=lambda item: (item[0][0], item[0][2]), reverse=True)]
+
+
+def segmentos(directorio=DIR_AUDITORIA, prefijo=PREFIJO):
+    """Lista de (ruta, filas) de los segmentos en disco, del más nuevo al más antiguo."""
+    return [(ruta, filas) for _, _, _, ruta, filas in _listar(directorio, prefijo)]
+
+
+def limpiar(directorio=DIR_AUDITORIA, prefijo=PREFIJO, max_segmentos=MAX_SEGMENTOS, dias=DIAS_RETENCION,
+            conservar=None):
+    """Borra los segmentos que pasan de ``max_segmentos`` o de ``dias`` días; devuelve cuántos se borraron.
+
+    La antigüedad se toma de la fecha del nombre. ``conservar`` (el segmento en
+    curso) no se borra nunca.
+    """
+    limite = datetime.now().timestamp() - dias * 86400 if dias else None
+    borrados = 0
+    for i, (sello, _, _, ruta, _) in enumerate(_listar(directorio, prefijo)):
+        viejo = limite is not None and datetime.strptime(sello, "%Y%m%d-%H%M%S-%f").timestamp() < limite
+        if ruta == conservar or not (viejo or (max_segmentos and i >= max_segmentos)):
+            continue
+        try:
+            os.remove(ruta)
+            borrados += 1
+        except FileNotFoundError:
+            pass  # otro proceso lo borró antes
+    return borrados
+
+
+def leer_segmento(ruta):
+    import pandas as pd
+
+    if ruta.endswith(".parquet"):
+        return pd.read_parquet(ruta)
+    return pd.read_csv(ruta, parse_dates=["fecha_utc"])
+
+
+def total_filas(directorio=DIR_AUDITORIA, auditoria=None, prefijo=PREFIJO):
+    """Filas del historial: las pendientes de ``auditoria`` más las de los segmentos en disco."""
+    pendientes = auditoria.estadisticas()["pendientes"] if auditoria is not None else 0
+    prefijo = auditoria.prefijo if auditoria is not None else prefijo
+    return pendientes + sum(filas for _, filas in segmentos(directorio, prefijo))
+
+
+def pagina(numero, tamano=50, directorio=DIR_AUDITORIA, auditoria=None, prefijo=PREFIJO):
+    """Página ``numero`` (desde 0) del historial, de la predicción más nueva a la más antigua.
+
+    Primero van las filas de ``auditoria`` que aún no están en disco. Solo se
+    leen los segmentos que caen en la página. Devuelve (DataFrame, total de filas).
+    """
+    import pandas as pd
+
+    pendientes = auditoria.estadisticas()["pendientes"] if auditoria is not None else 0
+    fuentes = segmentos(directorio, auditoria.prefijo if auditoria is not None else prefijo)
+    total = pendientes + sum(filas for _, filas in fuentes)
+    inicio, fin = numero * tamano, (numero + 1) * tamano
+    trozos = [auditoria.pendientes(inicio, fin)] if inicio < pendientes else []
+    posicion = pendientes
+    for ruta, filas in fuentes:
+        if posicion >= fin:
+            break
+        if posicion + filas > inicio:
+            # Los segmentos se guardan de la fila más antigua a la más nueva
+            marco = leer_segmento(ruta).iloc[::-1]
+            trozos.append(marco.iloc[max(inicio - posicion, 0):fin - posicion])
+        posicion += filas
+    if not trozos:
+        return pd.DataFrame(columns=list(COLUMNAS)), total
+    return pd.concat(trozos, ignore_index=True), total
+
+
+def auditar(scorer, datos, etiquetas, segundos, origen, proba=None):
+    """Anota en la auditoría del proceso las filas de ``datos`` puntuadas por ``scorer``.
+
+    También las suma al monitor de deriva (``fraude.deriva``), si hay referencia,
+    y las envía al modelo retador en sombra (``fraude.sombra``), si lo hay. Un
+    fallo de cualquiera de ellos se registra y no llega a quien ya tiene su
+    predicción.
+    """
+    # Import diferido: ``fraude.sombra`` usa ``Auditoria`` para su propio registro
+    from fraude.sombra import sombrear
+
+    try:
+        X = scorer.vectorizar(datos)
+        observar(scorer.features, X)
+        etiquetas = np.atleast_1d(etiquetas)
+        proba = None if proba is None else np.atleast_1d(proba)
+        obtener_auditoria().anotar(scorer.features, X, etiquetas, scorer.huella or "", origen, segundos * 1000.0,
+                                   proba)
+        sombrear(scorer.features, X, proba, etiquetas, segundos * 1000.0, origen)
+    except Exception:
+        log.exception("Error al anotar la predicción de %s", origen)
+
+
+_lock = threading.Lock()
+_auditoria = None
+
+
+def obtener_auditoria():
+    """Auditoría compartida por todo el proceso."""
+    global _auditoria
+    with _lock:
+        if _auditoria is None:
+            _auditoria = Auditoria()
+        return _auditoria
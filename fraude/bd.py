@@ -0,0 +1,188 @@
+"""Puntuación masiva de una tabla de la base de datos configurada en ``DATABASE_URL``.
+
+Las filas se leen en bloques con un cursor del lado del servidor
+(``stream_results``), ordenadas por una columna identificadora entera; cada
+bloque se puntúa con el RandomForest cargado y ``fraud_probability`` /
+``fraud_label`` se escriben en una tabla de resultados con una inserción
+masiva (``COPY`` en PostgreSQL, ``executemany`` en el resto).
+
+El último identificador procesado se guarda en la tabla
+``fraude_checkpoints`` dentro de la misma transacción que los resultados,
+así que un trabajo interrumpido se reanuda sin duplicar ni perder filas::
+
+    python -m fraude.bd --tabla transacciones --destino transacciones_puntuaciones
+    python -m fraude.bd --url sqlite:///local.db --consulta "SELECT * FROM transacciones WHERE month = 6"
+"""
+import argparse
+import io
+import os
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import BigInteger, Column, Float, MetaData, SmallInteger, String, Table, create_engine, event, text
+
+from fraude.lotes import COLUMNA_ETIQUETA, COLUMNA_PROBABILIDAD, validar_bloque
+from fraude.modelo import RUTA_MODELO
+from fraude.puntuacion import obtener_scorer
+
+TAMANO_BLOQUE = 50_000
+TABLA_CHECKPOINTS = "fraude_checkpoints"
+
+
+def crear_motor(url=None):
+    """Motor de SQLAlchemy para ``url`` o, por defecto, ``DATABASE_URL`` (también desde ``.env``)."""
+    if url is None:
+        from dotenv import load_dotenv
+
+        load_dotenv()
+        url = os.environ.get("DATABASE_URL")
+        if not url:
+            raise ValueError("No se definió DATABASE_URL (ver .env.example).")
+    motor = create_engine(url)
+    if motor.dialect.name == "sqlite":
+        # En modo WAL el cursor de lectura no bloquea las escrituras de la otra conexión
+        @event.listens_for(motor, "connect")
+        def _activar_wal(conexion, _):
+            conexion.execute("PRAGMA journal_mode=WAL")
+    return motor
+
+
+def _tablas(destino):
+    metadatos = MetaData()
+    resultados = Table(
+        destino, metadatos,
+        Column("id", BigInteger, primary_key=True, autoincrement=False),
+        Column(COLUMNA_PROBABILIDAD, Float, nullable=False),
+        Column(COLUMNA_ETIQUETA, SmallInteger, nullable=False),
+        Column("modelo", String(64), nullable=False),
+    )
+    checkpoints = Table(
+        TABLA_CHECKPOINTS, metadatos,
+        Column("trabajo", String(255), primary_key=True),
+        Column("ultimo_id", BigInteger, nullable=False),
+        Column("filas", BigInteger, nullable=False),
+    )
+    return metadatos, resultados, checkpoints
+
+
+def leer_checkpoint(conexion, checkpoints, trabajo):
+    """(último id procesado, filas procesadas) de un trabajo, o (None, 0)."""
+    fila = conexion.execute(
+        checkpoints.select().where(checkpoints.c.trabajo == trabajo)
+    ).first()
+    return (fila.ultimo_id, fila.filas) if fila is not None else (None, 0)
+
+
+def _guardar_checkpoint(conexion, checkpoints, trabajo, ultimo_id, filas):
+    conexion.execute(checkpoints.delete().where(checkpoints.c.trabajo == trabajo))
+    conexion.execute(checkpoints.insert(), {"trabajo": trabajo, "ultimo_id": ultimo_id, "filas": filas})
+
+
+def escribir_resultados(conexion, tabla, resultados):
+    """Inserción masiva: ``COPY`` con psycopg2, ``executemany`` con el resto de drivers."""
+    if conexion.dialect.name == "postgresql" and conexion.dialect.driver == "psycopg2":
+        buffer = io.StringIO()
+        resultados.to_csv(buffer, index=False, header=False)
+        buffer.seek(0)
+        preparador = conexion.dialect.identifier_preparer
+        columnas = ", ".join(preparador.quote(c) for c in resultados.columns)
+        cursor = conexion.connection.dbapi_connection.cursor()
+        try:
+            cursor.copy_expert(f"COPY {preparador.format_table(tabla)} ({columnas}) FROM STDIN WITH (FORMAT csv)",
+                               buffer)
+        finally:
+            cursor.close()
+    else:
+        conexion.execute(tabla.insert(), resultados.to_dict("records"))
+
+
+def puntuar_tabla(motor, tabla=None, consulta=None, destino=None, columna_id="id", scorer=None,
+                  tamano_bloque=TAMANO_BLOQUE, umbral=0.5, trabajo=None, reiniciar=False, al_progresar=None):
+    """Puntúa ``tabla`` (o el resultado de ``consulta``) y escribe los resultados en ``destino``.
+
+    ``columna_id`` debe ser un entero único: ordena la lectura y hace de
+    checkpoint. Con ``reiniciar`` se descartan el checkpoint del trabajo y
+    solo las filas de ``destino`` que escribió él. Devuelve el número de filas
+    procesadas en esta ejecución.
+    """
+    if (tabla is None) == (consulta is None):
+        raise ValueError("Indique una tabla o una consulta, no ambas.")
+    scorer = scorer or obtener_scorer(RUTA_MODELO)
+    preparador = motor.dialect.identifier_preparer
+    origen = preparador.quote(tabla) if tabla else f"({consulta})"
+    destino = destino or f"{tabla or 'consulta'}_puntuaciones"
+    trabajo = trabajo or f"{tabla or consulta}->{destino}"[:255]
+    id_sql = preparador.quote(columna_id)
+
+    metadatos, resultados, checkpoints = _tablas(destino)
+    metadatos.create_all(motor)
+
+    procesadas = 0
+    with motor.connect() as lectura, motor.connect() as escritura:
+        if reiniciar:
+            with escritura.begin():
+                anterior, _ = leer_checkpoint(escritura, checkpoints, trabajo)
+                if anterior is not None:
+                    # Solo las filas de este trabajo: los ids de su origen hasta su checkpoint. ``destino``
+                    # puede compartirse con otros trabajos; como ``id`` es su clave, ningún otro tiene esos ids
+                    escritura.execute(text(
+                        f"DELETE FROM {preparador.format_table(resultados)} WHERE {preparador.quote('id')} IN "
+                        f"(SELECT {id_sql} FROM {origen} AS origen WHERE {id_sql} <= :ultimo)"
+                    ), {"ultimo": anterior})
+                escritura.execute(checkpoints.delete().where(checkpoints.c.trabajo == trabajo))
+        ultimo_id, filas = leer_checkpoint(escritura, checkpoints, trabajo)
+        escritura.commit()
+
+        filtro = f"WHERE {id_sql} > :ultimo " if ultimo_id is not None else ""
+        sql = text(f"SELECT * FROM {origen} AS origen {filtro}ORDER BY {id_sql}")
+        cursor = lectura.execution_options(stream_results=True, max_row_buffer=tamano_bloque).execute(
+            sql, {"ultimo": ultimo_id} if ultimo_id is not None else {}
+        )
+        columnas = list(cursor.keys())
+        for particion in cursor.partitions(tamano_bloque):
+            bloque = pd.DataFrame(particion, columns=columnas)
+            validar_bloque(bloque, scorer.features)
+            proba = scorer.proba_fraude(bloque[list(scorer.features)].to_numpy(dtype=np.float32))
+            salida = pd.DataFrame({
+                "id": bloque[columna_id].astype(np.int64),
+                COLUMNA_PROBABILIDAD: proba,
+                COLUMNA_ETIQUETA: (proba > umbral).astype(np.int16),
+                "modelo": (scorer.huella or "")[:64],
+            })
+            ultimo_id = int(salida["id"].iloc[-1])
+            filas += len(salida)
+            with escritura.begin():
+                escribir_resultados(escritura, resultados, salida)
+                _guardar_checkpoint(escritura, checkpoints, trabajo, ultimo_id, filas)
+            procesadas += len(salida)
+            if al_progresar is not None:
+                al_progresar(filas, ultimo_id)
+    return procesadas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Puntuación masiva de una tabla de la base de datos.")
+    parser.add_argument("--url", help="URL de SQLAlchemy (por defecto DATABASE_URL)")
+    origen = parser.add_mutually_exclusive_group(required=True)
+    origen.add_argument("--tabla", help="Tabla de transacciones a puntuar")
+    origen.add_argument("--consulta", help="Consulta SQL cuyas filas se puntúan")
+    parser.add_argument("--destino", help="Tabla de resultados (por defecto <tabla>_puntuaciones)")
+    parser.add_argument("--id-columna", default="id", help="Columna entera única usada como checkpoint")
+    parser.add_argument("--modelo", default=RUTA_MODELO)
+    parser.add_argument("--bloque", type=int, default=TAMANO_BLOQUE)
+    parser.add_argument("--umbral", type=float, default=0.5)
+    parser.add_argument("--reiniciar", action="store_true",
+                        help="Descartar el checkpoint y los resultados previos de este trabajo")
+    args = parser.parse_args(argv)
+
+    motor = crear_motor(args.url)
+    procesadas = puntuar_tabla(
+        motor, tabla=args.tabla, consulta=args.consulta, destino=args.destino, columna_id=args.id_columna,
+        scorer=obtener_scorer(args.modelo), tamano_bloque=args.bloque, umbral=args.umbral, reiniciar=args.reiniciar,
+        al_progresar=lambda filas, ultimo: print(f"{filas:,} filas puntuadas (último id {ultimo})"),
+    )
+    print(f"Terminado: {procesadas:,} filas nuevas.")
+
+
+if __name__ == "__main__":
+    main()
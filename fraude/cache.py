@@ -0,0 +1,79 @@
+"""Caché LRU de predicciones compartida entre sesiones.
+
+La clave es el vector de características ya canonicalizado (``float32`` en el
+orden de ``feature_names_in_``) junto con la huella del artefacto del modelo,
+así que dos widgets con el mismo valor producen la misma entrada y un modelo
+nuevo nunca reutiliza resultados del anterior.
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+TAMANO_CACHE = 4096
+
+
+class CachePredicciones:
+    """LRU acotada y segura entre hilos, con contadores de aciertos/fallos/desalojos."""
+
+    def __init__(self, tamano=TAMANO_CACHE):
+        self.tamano = tamano
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+        self._huella = None
+        self.aciertos = 0
+        self.fallos = 0
+        self.desalojos = 0
+        self.invalidaciones = 0
+
+    @staticmethod
+    def clave(vector):
+        """Clave canónica de un vector de características."""
+        return np.ascontiguousarray(vector, dtype=np.float32).tobytes()
+
+    def _sincronizar(self, huella):
+        # Un modelo distinto invalida todo lo guardado
+        if huella != self._huella:
+            if self._datos:
+                self.invalidaciones += 1
+            self._datos.clear()
+            self._huella = huella
+
+    def obtener(self, huella, clave):
+        """Devuelve el valor guardado o None."""
+        with self._lock:
+            self._sincronizar(huella)
+            valor = self._datos.get(clave)
+            if valor is None:
+                self.fallos += 1
+                return None
+            self._datos.move_to_end(clave)
+            self.aciertos += 1
+            return valor
+
+    def guardar(self, huella, clave, valor):
+        with self._lock:
+            self._sincronizar(huella)
+            self._datos[clave] = valor
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.tamano:
+                self._datos.popitem(last=False)
+                self.desalojos += 1
+
+    def limpiar(self):
+        with self._lock:
+            self._datos.clear()
+
+    def estadisticas(self):
+        """Contadores actuales de la caché."""
+        with self._lock:
+            consultas = self.aciertos + self.fallos
+            return {
+                "entradas": len(self._datos),
+                "tamano": self.tamano,
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+                "desalojos": self.desalojos,
+                "invalidaciones": self.invalidaciones,
+                "tasa_aciertos": self.aciertos / consultas if consultas else 0.0,
+            }
@@ -0,0 +1,33 @@
+"""Predicciones de calentamiento de un modelo recién cargado.
+
+Puntuar y explicar cada perfil de ``PERFILES`` antes de poner en servicio
+un modelo llena la caché de predicciones y la de explicaciones, y trae a
+memoria las páginas del bosque (abierto con ``mmap``), de modo que la
+primera petición real no paga ese coste. ``fraude.registro`` lo hace con
+cada versión nueva, en segundo plano, antes del intercambio.
+
+Los perfiles se puntúan y explican en un solo lote (puede haber cientos);
+solo el primero recorre además el camino de una fila.
+"""
+from fraude.cache import CachePredicciones
+from fraude.metricas import medir
+from fraude.perfiles import PERFILES
+
+
+def calentar(scorer, perfiles=None):
+    """Puntúa y explica cada perfil con ``scorer`` y guarda los resultados en sus cachés."""
+    perfiles = PERFILES if perfiles is None else perfiles
+    if not perfiles:
+        return
+    with medir("calentamiento"):
+        registros = [perfil["datos"] for perfil in perfiles.values()]
+        X = scorer.vectorizar(registros)
+        for cache, resultados in ((scorer.cache, scorer.predict_proba(X)),
+                                  (scorer.cache_explicaciones, scorer.explicar(X))):
+            if cache is None:
+                continue
+            for fila, resultado in zip(X, resultados):
+                resultado.setflags(write=False)
+                cache.guardar(scorer.huella, CachePredicciones.clave(fila), resultado)
+        scorer.predict_proba_fila(registros[0])
+        scorer.explicar_fila(registros[0])
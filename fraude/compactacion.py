@@ -0,0 +1,318 @@
+"""Variantes compactas del bosque: menos precisión y menos árboles.
+
+El bosque compilado (``BosqueCompilado``) guarda umbrales y valores de hoja
+en ``float64`` e índices de nodo en ``int32``, y evalúa todos los árboles.
+Este módulo genera variantes más pequeñas y las compara con el original:
+
+* Umbrales ``float32``: se redondean hacia abajo, así que con la entrada en
+  ``float32`` las decisiones ``x <= umbral`` son exactamente las mismas.
+  Con ``float16`` se pierde resolución (y los umbrales por encima de 65504,
+  p. ej. en ``proposed_credit_limit``, se saturan).
+* Valores de hoja ``float32``/``float16``: las probabilidades cambian en los
+  últimos decimales; se siguen acumulando en ``float64``.
+* Índices ``int16`` cuando el bosque tiene menos de 32768 nodos (en la
+  práctica, con un subconjunto de árboles).
+* Subconjunto de árboles elegido de forma voraz para reproducir la
+  probabilidad del bosque completo sobre un conjunto de selección.
+
+Cada variante es un directorio de ``BosqueCompilado.guardar`` y se puede
+servir directamente con ``RUTA_MODELO`` (ver ``fraude.modelo``)::
+
+    python -m fraude.compactacion compactar modelo_RandomForest_optimizado.pkl.gz holdout.csv --destino modelo_compacto
+    python -m fraude.compactacion informe modelo_compacto
+    RUTA_MODELO=modelo_compacto/float32_int16_50 streamlit run app.py
+
+El informe (``informe.json``) compara tamaño en disco, tiempo de carga,
+latencia por fila y por lote, y acuerdo con el original sobre el holdout.
+Sin ``--seleccion``, la mitad del holdout elige los árboles y la otra mitad
+se usa para el informe.
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from fraude.lotes import leer_por_bloques
+from fraude.modelo import cargar_modelo, cargar_modelo_comprimido, huella_artefacto
+from fraude.motor import BosqueCompilado
+
+PRECISIONES = ("float64", "float32", "float16")
+INDICES = ("int32", "int16")
+
+# Filas como máximo para elegir árboles y para el informe
+MUESTRA = 50_000
+
+# Filas puntuadas de una en una para la latencia por fila
+FILAS_LATENCIA = 500
+
+UMBRAL = 0.5
+
+INFORME = "informe.json"
+
+
+def _redondear_abajo(umbral, precision):
+    """Umbrales en ``precision``, redondeados hacia -inf para no mover ninguna decisión con ``float32``."""
+    tipo = np.dtype(precision)
+    if tipo == umbral.dtype:
+        return umbral.copy()
+    with np.errstate(over="ignore"):
+        redondeado = umbral.astype(tipo)
+    mayores = redondeado.astype(np.float64) > umbral
+    redondeado[mayores] = np.nextafter(redondeado[mayores], tipo.type(-np.inf))
+    return redondeado
+
+
+def subconjunto(bosque, arboles):
+    """Bosque con solo ``arboles`` (en ese orden), con los índices de nodo renumerados."""
+    arboles = np.asarray(arboles, dtype=np.intp)
+    raices = np.asarray(bosque.raices, dtype=np.int64)
+    fines = np.append(raices[1:], bosque.n_nodos)
+    tamanos = fines[arboles] - raices[arboles]
+    nuevas = np.concatenate(([0], np.cumsum(tamanos)[:-1]))
+    nodos = np.concatenate([np.arange(raices[t], fines[t]) for t in arboles])
+    # Los hijos son índices globales: se desplazan lo mismo que la raíz de su árbol
+    desplazamiento = np.repeat(nuevas - raices[arboles], tamanos)
+    return BosqueCompilado(
+        np.asarray(bosque.feature)[nodos], np.asarray(bosque.umbral)[nodos],
+        (np.asarray(bosque.izquierdo)[nodos] + desplazamiento).astype(np.int32),
+        (np.asarray(bosque.derecho)[nodos] + desplazamiento).astype(np.int32),
+        np.asarray(bosque.falta_izquierda)[nodos], np.asarray(bosque.valor)[nodos], nuevas.astype(np.int32),
+        bosque.profundidad, bosque.classes_, bosque.features,
+    )
+
+
+def indice_fraude(bosque):
+    positivas = np.flatnonzero(bosque.classes_ == 1)
+    return int(positivas[0]) if len(positivas) else len(bosque.classes_) - 1
+
+
+def seleccionar_arboles(bosque, X, n_arboles):
+    """Índices (ordenados) de ``n_arboles`` árboles cuya media reproduce mejor la del bosque completo.
+
+    Selección voraz sin reemplazo: en cada paso se añade el árbol que más
+    reduce el error cuadrático frente a la probabilidad de fraude del bosque
+    completo sobre ``X``.
+    """
+    if not 0 < n_arboles <= bosque.n_arboles:
+        raise ValueError(f"El número de árboles debe estar entre 1 y {bosque.n_arboles}.")
+    # Probabilidad de fraude de cada árbol para cada fila: (filas, árboles)
+    P = np.asarray(bosque.valor)[bosque.hojas(X), indice_fraude(bosque)].astype(np.float64)
+    objetivo = P.mean(axis=1)
+    suma = np.zeros(len(X))
+    libres = np.ones(bosque.n_arboles, dtype=bool)
+    elegidos = []
+    for k in range(1, n_arboles + 1):
+        error = (((suma[:, None] + P) / k - objetivo[:, None]) ** 2).sum(axis=0)
+        error[~libres] = np.inf
+        t = int(np.argmin(error))
+        elegidos.append(t)
+        libres[t] = False
+        suma += P[:, t]
+    return np.sort(elegidos)
+
+
+def compactar(bosque, precision="float32", indices="int32", arboles=None):
+    """Variante de ``bosque`` con umbrales y valores en ``precision``, índices en ``indices`` y solo ``arboles``."""
+    if precision not in PRECISIONES:
+        raise ValueError(f"Precisión desconocida: {precision}. Opciones: {', '.join(PRECISIONES)}")
+    if indices not in INDICES:
+        raise ValueError(f"Tipo de índice desconocido: {indices}. Opciones: {', '.join(INDICES)}")
+    if arboles is not None:
+        bosque = subconjunto(bosque, arboles)
+    tipo = np.dtype(indices)
+    if bosque.n_nodos > np.iinfo(tipo).max:
+        raise ValueError(f"El bosque tiene {bosque.n_nodos:,} nodos y no caben en índices {indices}; "
+                         "use int32 o menos árboles.")
+    return BosqueCompilado(
+        np.asarray(bosque.feature).astype(tipo), _redondear_abajo(np.asarray(bosque.umbral), precision),
+        np.asarray(bosque.izquierdo).astype(tipo), np.asarray(bosque.derecho).astype(tipo),
+        np.array(bosque.falta_izquierda), np.asarray(bosque.valor).astype(precision),
+        np.asarray(bosque.raices).astype(tipo), bosque.profundidad, bosque.classes_, bosque.features,
+    )
+
+
+def indices_minimos(n_nodos):
+    """El tipo de índice más estrecho en el que caben ``n_nodos`` nodos."""
+    return "int16" if n_nodos <= np.iinfo(np.int16).max else "int32"
+
+
+def guardar_variante(bosque, destino, meta):
+    """Escribe la variante en ``destino`` (sustituyéndola si existe) con sus metadatos en ``compactacion.json``."""
+    padre = os.path.dirname(os.path.abspath(destino))
+    os.makedirs(padre, exist_ok=True)
+    temporal = tempfile.mkdtemp(prefix="variante_", dir=padre)
+    bosque.guardar(temporal)
+    with open(os.path.join(temporal, "compactacion.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    if os.path.exists(destino):
+        anterior = f"{destino}.{os.getpid()}.anterior"
+        os.rename(destino, anterior)
+        shutil.rmtree(anterior, ignore_errors=True)
+    os.rename(temporal, destino)
+    return destino
+
+
+def _bytes(directorio):
+    return sum(os.path.getsize(os.path.join(directorio, n)) for n in os.listdir(directorio)
+               if n.endswith(".npy") or n == "bosque.json")
+
+
+def _mediana_ms(funcion, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000.0)
+    return float(np.median(tiempos))
+
+
+def evaluar(bosque, X, referencia, etiquetas=None, repeticiones=3):
+    """Latencias de ``bosque`` sobre ``X`` y acuerdo con la probabilidad de fraude ``referencia``."""
+    indice = indice_fraude(bosque)
+    filas = X[:FILAS_LATENCIA]
+    tiempos = []
+    for i in range(len(filas)):
+        inicio = time.perf_counter()
+        bosque.predict_proba(filas[i:i + 1])
+        tiempos.append((time.perf_counter() - inicio) * 1000.0)
+    lote_ms = _mediana_ms(lambda: bosque.predict_proba(X), repeticiones)
+    proba = bosque.predict_proba(X)[:, indice]
+    diferencia = np.abs(proba - referencia)
+    resultado = {
+        "fila_p50_ms": float(np.percentile(tiempos, 50)),
+        "fila_p99_ms": float(np.percentile(tiempos, 99)),
+        "lote_ms_por_1000": lote_ms / len(X) * 1000.0,
+        "acuerdo": float(np.mean((proba > UMBRAL) == (referencia > UMBRAL))),
+        "max_dif_proba": float(diferencia.max()),
+        "media_dif_proba": float(diferencia.mean()),
+    }
+    if etiquetas is not None:
+        resultado["acierto"] = float(np.mean((proba > UMBRAL) == (etiquetas == 1)))
+    return resultado
+
+
+def leer_muestra(origen, features, etiqueta=None, muestra=MUESTRA):
+    """(X float32, etiquetas o None) de las primeras ``muestra`` filas de un CSV/Parquet."""
+    partes, etiquetas, filas = [], [], 0
+    for bloque in leer_por_bloques(origen):
+        faltantes = [f for f in features if f not in bloque.columns]
+        if faltantes:
+            raise ValueError(f"Faltan columnas en {origen}: {', '.join(faltantes)}")
+        partes.append(bloque[list(features)].to_numpy(dtype=np.float32))
+        if etiqueta is not None:
+            etiquetas.append(bloque[etiqueta].to_numpy())
+        filas += len(partes[-1])
+        if filas >= muestra:
+            break
+    X = np.concatenate(partes)[:muestra]
+    return X, (np.concatenate(etiquetas)[:muestra] if etiqueta is not None else None)
+
+
+def compactar_modelo(origen, holdout, destino, precisiones=("float32", "float16"), arboles=None,
+                     indices="auto", seleccion=None, etiqueta=None, repeticiones=3):
+    """Genera las variantes de ``origen`` en ``destino`` y devuelve el informe comparativo.
+
+    ``arboles`` son los tamaños de subconjunto (por defecto la mitad y la cuarta
+    parte del bosque); con ``indices="auto"`` cada variante usa el tipo más
+    estrecho en el que caben sus nodos.
+    """
+    if os.path.isdir(origen):
+        completo = cargar_modelo(origen, mmap=False)
+        original = {"bytes": _bytes(origen) if os.path.exists(os.path.join(origen, "bosque.json")) else None}
+    else:
+        original = {"bytes": os.path.getsize(origen),
+                    "carga_ms": _mediana_ms(lambda: cargar_modelo_comprimido(origen), repeticiones)}
+        completo = cargar_modelo_comprimido(origen)
+    if not isinstance(completo, BosqueCompilado):
+        completo = BosqueCompilado.desde_modelo(completo)
+
+    X, y = leer_muestra(holdout, completo.features, etiqueta)
+    if seleccion is not None:
+        X_sel, _ = leer_muestra(seleccion, completo.features)
+    else:
+        # Mitad para elegir árboles y mitad para el informe, sin solaparse
+        orden = np.random.default_rng(0).permutation(len(X))
+        mitad = len(X) // 2
+        X_sel, X, y = X[orden[:mitad]], X[orden[mitad:]], (y[orden[mitad:]] if y is not None else None)
+    referencia = completo.predict_proba(X)[:, indice_fraude(completo)]
+
+    tamanos = sorted({int(n) for n in (arboles or (completo.n_arboles // 2, completo.n_arboles // 4))
+                      if 0 < n < completo.n_arboles}, reverse=True)
+    subconjuntos = {completo.n_arboles: None}
+    for n in tamanos:
+        subconjuntos[n] = seleccionar_arboles(completo, X_sel, n)
+
+    informe = {"origen": os.path.abspath(origen), "sha256_origen": huella_artefacto(origen)
+               if os.path.isfile(origen) else None, "holdout": os.path.abspath(holdout), "filas": len(X),
+               "original": original, "variantes": {}}
+    os.makedirs(destino, exist_ok=True)
+    for precision in ("float64",) + tuple(p for p in precisiones if p != "float64"):
+        for n, elegidos in subconjuntos.items():
+            base = completo if elegidos is None else subconjunto(completo, elegidos)
+            tipo = indices_minimos(base.n_nodos) if indices == "auto" else indices
+            if precision == "float64" and elegidos is None and tipo == "int32":
+                nombre = "original"  # el propio bosque compilado, como referencia de latencia y tamaño
+            else:
+                nombre = f"{precision}_{tipo}_{n}"
+            meta = {"precision": precision, "indices": tipo, "n_arboles": n,
+                    "arboles": None if elegidos is None else elegidos.tolist(),
+                    "origen": informe["origen"], "sha256_origen": informe["sha256_origen"]}
+            directorio = guardar_variante(compactar(base, precision, tipo), os.path.join(destino, nombre), meta)
+            variante = dict(meta, bytes=_bytes(directorio),
+                            carga_ms=_mediana_ms(lambda: BosqueCompilado.cargar(directorio, mmap=False),
+                                                 repeticiones))
+            variante.pop("arboles")
+            variante.update(evaluar(BosqueCompilado.cargar(directorio), X, referencia, y, repeticiones))
+            informe["variantes"][nombre] = variante
+    with open(os.path.join(destino, INFORME), "w", encoding="utf-8") as f:
+        json.dump(informe, f, indent=2)
+    return informe
+
+
+def formatear(informe):
+    """Tabla de texto del informe."""
+    lineas = []
+    original = informe["original"]
+    if original.get("carga_ms") is not None:
+        lineas.append(f"Artefacto original: {original['bytes'] / 1e6:.2f} MB, carga {original['carga_ms']:.1f} ms")
+    lineas.append(f"Acuerdo sobre {informe['filas']:,} filas del holdout (etiqueta con umbral {UMBRAL})")
+    lineas.append(f"{'variante':22s} {'árboles':>7s} {'MB':>6s} {'carga ms':>9s} {'fila p50':>9s} "
+                  f"{'fila p99':>9s} {'ms/1000':>8s} {'acuerdo':>8s} {'máx |Δp|':>9s}")
+    for nombre, v in informe["variantes"].items():
+        lineas.append(f"{nombre:22s} {v['n_arboles']:7d} {v['bytes'] / 1e6:6.2f} {v['carga_ms']:9.2f} "
+                      f"{v['fila_p50_ms']:9.3f} {v['fila_p99_ms']:9.3f} {v['lote_ms_por_1000']:8.2f} "
+                      f"{v['acuerdo']:8.2%} {v['max_dif_proba']:9.2e}")
+    return "\n".join(lineas)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Variantes compactas del bosque de fraude.")
+    sub = parser.add_subparsers(dest="orden", required=True)
+    p_comp = sub.add_parser("compactar", help="Genera las variantes y el informe comparativo")
+    p_comp.add_argument("origen", help="Artefacto .pkl.gz o directorio de bosque compilado")
+    p_comp.add_argument("holdout", help="CSV/Parquet con las características")
+    p_comp.add_argument("--destino", default="modelo_compacto")
+    p_comp.add_argument("--precisiones", nargs="+", choices=PRECISIONES, default=["float32", "float16"])
+    p_comp.add_argument("--arboles", nargs="+", type=int, help="Tamaños de los subconjuntos de árboles")
+    p_comp.add_argument("--indices", choices=("auto",) + INDICES, default="auto")
+    p_comp.add_argument("--seleccion", help="CSV/Parquet para elegir los árboles (por defecto, medio holdout)")
+    p_comp.add_argument("--etiqueta", help="Columna con la etiqueta real, para informar del acierto")
+    p_inf = sub.add_parser("informe", help="Muestra el informe de un directorio de variantes")
+    p_inf.add_argument("destino")
+    args = parser.parse_args(argv)
+
+    if args.orden == "compactar":
+        informe = compactar_modelo(args.origen, args.holdout, args.destino, args.precisiones, args.arboles,
+                                   args.indices, args.seleccion, args.etiqueta)
+    else:
+        with open(os.path.join(args.destino, INFORME), encoding="utf-8") as f:
+            informe = json.load(f)
+    print(formatear(informe))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""Una sola copia del bosque por máquina, compartida por todos los procesos.
+
+Con varios servidores de Streamlit por máquina detrás de un balanceador,
+cada proceso que carga el ``RandomForestClassifier`` tiene su propia copia
+de los nodos: aunque la caché ``.joblib`` se abra con ``mmap_mode``, sklearn
+copia los arrays de cada árbol a memoria privada del proceso.
+
+Con ``MODELO_COMPARTIDO=1`` (y el motor compilado) el registro de modelos
+no carga el modelo de sklearn: el bosque aplanado (``BosqueCompilado``) se
+publica una vez por versión del artefacto como ``.npy`` en ``DIR_CACHE`` y
+cada proceso lo abre con ``mmap`` de solo lectura. Todos los procesos ven
+las mismas páginas de la caché del sistema, así que cada proceso nuevo solo
+añade sus propias estructuras, no el bosque. La publicación se hace en un
+proceso hijo, para que el modelo de sklearn no quede en la memoria del
+proceso que la pide; también se puede hacer al desplegar::
+
+    python -m fraude.compartido publicar modelo_RandomForest_optimizado.pkl.gz
+    python -m fraude.compartido informe --procesos 4
+
+``informe`` arranca varios procesos con cada modo de carga y muestra cuánto
+crece la memoria de cada uno (RSS, PSS y memoria privada).
+"""
+import argparse
+import multiprocessing
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+
+from fraude.modelo import DIR_CACHE, RUTA_MODELO, cargar_modelo, es_bosque_compilado, obtener_huella
+from fraude.motor import BosqueCompilado
+
+# Cargar el bosque compartido en lugar del modelo de sklearn (solo con el motor compilado)
+MODELO_COMPARTIDO = os.environ.get("MODELO_COMPARTIDO", "0") == "1"
+
+# Campos de /proc/self/smaps_rollup que se suman en cada categoría
+_CAMPOS_MEMORIA = {
+    "rss_mb": ("Rss",),
+    "pss_mb": ("Pss",),
+    "privada_mb": ("Private_Clean", "Private_Dirty"),
+    "compartida_mb": ("Shared_Clean", "Shared_Dirty"),
+}
+
+
+def memoria():
+    """Memoria del proceso en MB (Linux), o None si no se puede leer.
+
+    ``privada_mb`` son las páginas que solo usa este proceso y ``compartida_mb``
+    las que comparte con otros (p. ej. el bosque abierto con ``mmap``); ``pss_mb``
+    reparte cada página compartida entre los procesos que la usan.
+    """
+    try:
+        with open("/proc/self/smaps_rollup", encoding="ascii") as f:
+            kb = {partes[0].rstrip(":"): int(partes[1]) for partes in (linea.split() for linea in f)
+                  if len(partes) == 3 and partes[2] == "kB"}
+    except (OSError, ValueError):
+        return None
+    return {nombre: sum(kb.get(c, 0) for c in campos) / 1024.0 for nombre, campos in _CAMPOS_MEMORIA.items()}
+
+
+def crecimiento(antes, despues):
+    """Diferencia entre dos lecturas de ``memoria()``, o None si falta alguna."""
+    if antes is None or despues is None:
+        return None
+    return {nombre: despues[nombre] - antes[nombre] for nombre in despues}
+
+
+def directorio_bosque(ruta=RUTA_MODELO, dir_cache=None):
+    """Directorio donde se publica el bosque compilado de una versión del artefacto."""
+    return os.path.join(dir_cache or DIR_CACHE, f"bosque_{obtener_huella(ruta)[:16]}")
+
+
+def publicar_bosque(ruta=RUTA_MODELO, dir_cache=None):
+    """Guarda el bosque compilado del modelo (una vez por versión) y devuelve su directorio."""
+    if es_bosque_compilado(ruta):
+        # Ya es un bosque compilado (p. ej. una variante compactada): se comparte tal cual
+        return ruta
+    directorio = directorio_bosque(ruta, dir_cache)
+    if os.path.exists(os.path.join(directorio, "bosque.json")):
+        return directorio
+    os.makedirs(os.path.dirname(directorio), exist_ok=True)
+    temporal = tempfile.mkdtemp(prefix="bosque_", dir=os.path.dirname(directorio))
+    BosqueCompilado.desde_modelo(cargar_modelo(ruta)).guardar(temporal)
+    try:
+        os.rename(temporal, directorio)
+    except OSError:
+        # Otro proceso lo publicó a la vez; se usa el suyo
+        shutil.rmtree(temporal, ignore_errors=True)
+    return directorio
+
+
+def cargar_compartido(ruta=RUTA_MODELO, dir_cache=None):
+    """``BosqueCompilado`` de la versión actual del artefacto, abierto con ``mmap``.
+
+    Si todavía no está publicado, lo publica un proceso hijo.
+    """
+    if not os.path.exists(ruta):
+        raise FileNotFoundError(f"El archivo {ruta} no existe. Verifica que está en la carpeta correcta.")
+    directorio = ruta if es_bosque_compilado(ruta) else directorio_bosque(ruta, dir_cache)
+    if not os.path.exists(os.path.join(directorio, "bosque.json")):
+        raiz = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        entorno = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [raiz, os.environ.get("PYTHONPATH")])))
+        orden = [sys.executable, "-m", "fraude.compartido", "publicar", ruta]
+        if dir_cache:
+            orden += ["--dir-cache", dir_cache]
+        proceso = subprocess.run(orden, capture_output=True, text=True, env=entorno)
+        if proceso.returncode != 0:
+            raise ValueError(f"No se pudo publicar el bosque compartido:\n{proceso.stderr[-2000:]}")
+    return BosqueCompilado.cargar(directorio, mmap=True)
+
+
+def _medir_trabajador(modo, ruta, X, barrera, resultados):
+    # Import diferido: el proceso hijo (spawn) importa lo mínimo antes de la primera lectura
+    import joblib  # noqa: F401
+    import sklearn.ensemble  # noqa: F401
+
+    from fraude.puntuacion import FraudScorer
+
+    # sklearn y joblib ya importados en los dos modos: el crecimiento es solo el del modelo
+    antes = memoria()
+    modelo = cargar_compartido(ruta) if modo == "compartido" else cargar_modelo(ruta)
+    scorer = FraudScorer(modelo, motor="compilado")
+    scorer.predict_proba(X)
+    scorer.explicar(X[:1])
+    # Todos los procesos vivos a la vez: el PSS reparte las páginas compartidas entre ellos
+    barrera.wait()
+    resultados.put(crecimiento(antes, memoria()))
+    barrera.wait()
+
+
+def medir_procesos(ruta=RUTA_MODELO, procesos=4, filas=256):
+    """Crecimiento medio de la memoria de ``procesos`` trabajadores para cada modo de carga."""
+    publicar_bosque(ruta)
+    n_features = len(BosqueCompilado.cargar(directorio_bosque(ruta)).features)
+    X = np.random.default_rng(0).random((filas, n_features)).astype(np.float32)
+    contexto = multiprocessing.get_context("spawn")
+    informe = {}
+    for modo in ("sklearn", "compartido"):
+        barrera, resultados = contexto.Barrier(procesos), contexto.Queue()
+        trabajadores = [contexto.Process(target=_medir_trabajador, args=(modo, ruta, X, barrera, resultados))
+                        for _ in range(procesos)]
+        for t in trabajadores:
+            t.start()
+        medidas = [resultados.get() for _ in trabajadores]
+        for t in trabajadores:
+            t.join()
+        if any(m is None for m in medidas):
+            raise RuntimeError("No se puede leer /proc/self/smaps_rollup en este sistema.")
+        informe[modo] = {nombre: float(np.mean([m[nombre] for m in medidas])) for nombre in medidas[0]}
+    return informe
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bosque compartido entre procesos.")
+    sub = parser.add_subparsers(dest="orden", required=True)
+    p_pub = sub.add_parser("publicar", help="Publica el bosque compilado de un artefacto")
+    p_pub.add_argument("modelo", nargs="?", default=RUTA_MODELO)
+    p_pub.add_argument("--dir-cache")
+    p_inf = sub.add_parser("informe", help="Crecimiento de la memoria por proceso con cada modo de carga")
+    p_inf.add_argument("modelo", nargs="?", default=RUTA_MODELO)
+    p_inf.add_argument("--procesos", type=int, default=4)
+    args = parser.parse_args(argv)
+
+    if args.orden == "publicar":
+        print(publicar_bosque(args.modelo, args.dir_cache))
+        return
+    informe = medir_procesos(args.modelo, args.procesos)
+    print(f"Crecimiento medio por proceso con {args.procesos} procesos (MB):")
+    print(f"{'modo':12s} " + " ".join(f"{nombre:>14s}" for nombre in _CAMPOS_MEMORIA))
+    for modo, medidas in informe.items():
+        print(f"{modo:12s} " + " ".join(f"{medidas[nombre]:14.1f}" for nombre in _CAMPOS_MEMORIA))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+"""Monitor de deriva de las características sobre el tráfico puntuado.
+
+Los perfiles de ``app.py`` y los formularios de ``src/app1.py`` muestran lo
+distintas que pueden llegar las entradas (``income`` entre 0 y 1 o hasta
+10.000.000). ``MonitorDeriva`` compara el tráfico en vivo con una
+distribución de referencia sin guardar ni releer el historial:
+
+* La referencia (``referencia_deriva.json``) guarda, por característica, los
+  bordes de ~``BINS`` intervalos de igual masa calculados sobre un archivo de
+  entrenamiento, sus conteos, el mínimo y el máximo y algunos cuantiles::
+
+      python -m fraude.deriva referencia entrenamiento.csv --salida referencia_deriva.json
+
+* Cada predicción suma 1 al intervalo de cada característica (una búsqueda
+  sobre bordes fijos, coste constante por fila), además de los contadores de
+  valores fuera del rango de referencia y de NaN. Los cuantiles en vivo se
+  interpolan sobre ese mismo histograma.
+* PSI se calcula sobre ~10 grupos de intervalos de igual masa en la
+  referencia; KS es la mayor diferencia entre las dos funciones de
+  distribución en los bordes (una cota inferior del KS exacto).
+
+Cada proceso tiene su propio monitor; ``reiniciar`` empieza una ventana nueva.
+"""
+import argparse
+import json
+import os
+import threading
+
+import numpy as np
+
+# Referencia de deriva (se puede sobrescribir por variable de entorno)
+RUTA_REFERENCIA = os.environ.get("RUTA_REFERENCIA_DERIVA", "referencia_deriva.json")
+
+# Intervalos de igual masa por característica y grupos para el PSI
+BINS = 50
+GRUPOS_PSI = 10
+
+# Filas de la muestra con la que se calculan los bordes de la referencia
+MUESTRA_REFERENCIA = 200_000
+
+# Umbrales habituales del PSI: estable, a vigilar, deriva
+UMBRALES_PSI = (0.1, 0.25)
+
+CUANTILES = (0.01, 0.5, 0.99)
+
+_EPS = 1e-4  # evita log(0) en el PSI
+
+
+def _intervalos(bordes, x):
+    """Índice del intervalo de cada valor: 0 para x <= bordes[0], len(bordes) para x > bordes[-1]."""
+    return np.searchsorted(bordes, x, side="left")
+
+
+def crear_referencia(origen, features, bins=BINS, muestra=MUESTRA_REFERENCIA, nombre=None):
+    """Referencia de deriva a partir de un CSV/Parquet leído por bloques.
+
+    Los bordes salen de las primeras ``muestra`` filas; los conteos, de todo el archivo.
+    """
+    # Import diferido: fraude.lotes importa pandas, que no hace falta para vigilar la deriva en las apps
+    from fraude.lotes import leer_por_bloques
+
+    partes, filas = [], 0
+    for bloque in leer_por_bloques(origen, nombre):
+        partes.append(bloque[list(features)].to_numpy(dtype=np.float32))
+        filas += len(partes[-1])
+        if filas >= muestra:
+            break
+    X = np.concatenate(partes)[:muestra]
+    referencia = {"features": list(features), "n": 0, "variables": {}}
+    for j, feature in enumerate(features):
+        x = X[:, j][~np.isnan(X[:, j])]
+        if not len(x):
+            raise ValueError(f"La característica '{feature}' no tiene valores en la referencia.")
+        bordes = np.unique(np.quantile(x, np.linspace(0, 1, bins + 1)).astype(np.float32))
+        referencia["variables"][feature] = {
+            "bordes": bordes.tolist(), "conteos": [0] * (len(bordes) + 1), "nan": 0,
+            "minimo": float(x.min()), "maximo": float(x.max()),
+            "cuantiles": dict(zip(map(str, CUANTILES), np.quantile(x, CUANTILES).tolist())),
+        }
+    # Conteos sobre todo el archivo, bloque a bloque
+    for bloque in leer_por_bloques(origen, nombre):
+        X = bloque[list(features)].to_numpy(dtype=np.float32)
+        referencia["n"] += len(X)
+        for j, feature in enumerate(features):
+            variable = referencia["variables"][feature]
+            nan = np.isnan(X[:, j])
+            variable["nan"] += int(nan.sum())
+            conteos = np.bincount(_intervalos(np.asarray(variable["bordes"], dtype=np.float32), X[~nan, j]),
+                                  minlength=len(variable["conteos"]))
+            variable["conteos"] = (np.asarray(variable["conteos"]) + conteos).tolist()
+    return referencia
+
+
+def guardar_referencia(referencia, ruta=RUTA_REFERENCIA):
+    temporal = f"{ruta}.{os.getpid()}.tmp"
+    with open(temporal, "w", encoding="utf-8") as f:
+        json.dump(referencia, f)
+    os.replace(temporal, ruta)
+    return ruta
+
+
+def cargar_referencia(ruta=RUTA_REFERENCIA):
+    with open(ruta, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def psi(p_ref, p_viva):
+    """Population Stability Index entre dos vectores de proporciones."""
+    p_ref = np.maximum(p_ref, _EPS)
+    p_viva = np.maximum(p_viva, _EPS)
+    return float(np.sum((p_viva - p_ref) * np.log(p_viva / p_ref)))
+
+
+def estado_psi(valor):
+    if valor < UMBRALES_PSI[0]:
+        return "🟢 estable"
+    if valor < UMBRALES_PSI[1]:
+        return "🟡 vigilar"
+    return "🔴 deriva"
+
+
+class MonitorDeriva:
+    """Histogramas en vivo de cada característica comparados con la referencia."""
+
+    def __init__(self, referencia):
+        self.referencia = referencia
+        self.features = tuple(referencia["features"])
+        variables = [referencia["variables"][f] for f in self.features]
+        # Bordes de todas las características en una matriz, rellenada con +inf
+        self.n_bins = max(len(v["bordes"]) for v in variables) + 1
+        self._bordes = np.full((len(self.features), self.n_bins - 1), np.inf, dtype=np.float32)
+        for j, v in enumerate(variables):
+            self._bordes[j, :len(v["bordes"])] = v["bordes"]
+        self._minimos = np.array([v["minimo"] for v in variables], dtype=np.float32)
+        self._maximos = np.array([v["maximo"] for v in variables], dtype=np.float32)
+        self._ref = [np.asarray(v["conteos"], dtype=np.float64) for v in variables]
+        # Grupo del PSI de cada intervalo: ~GRUPOS_PSI grupos de igual masa en la referencia
+        self._grupos = []
+        for conteos in self._ref:
+            acumulada = np.cumsum(conteos) / max(conteos.sum(), 1.0)
+            self._grupos.append(np.minimum((acumulada * GRUPOS_PSI - 1e-9).astype(np.intp), GRUPOS_PSI - 1))
+        self._desplazamientos = np.arange(len(self.features)) * self.n_bins
+        self._columnas = {}  # tupla de features de entrada -> índices de las columnas de la referencia
+        self.error = None  # p. ej. un modelo sin alguna característica de la referencia
+        self._lock = threading.Lock()
+        self.reiniciar()
+
+    def reiniciar(self):
+        """Empieza una ventana nueva: pone a cero los contadores en vivo."""
+        with self._lock:
+            self.n = 0
+            self._conteos = np.zeros(len(self.features) * self.n_bins, dtype=np.int64)
+            self._nan = np.zeros(len(self.features), dtype=np.int64)
+            self._debajo = np.zeros(len(self.features), dtype=np.int64)
+            self._encima = np.zeros(len(self.features), dtype=np.int64)
+            self._min_vivo = np.full(len(self.features), np.inf, dtype=np.float32)
+            self._max_vivo = np.full(len(self.features), -np.inf, dtype=np.float32)
+
+    def _alinear(self, features, X):
+        features = tuple(features)
+        if features == self.features:
+            return X
+        columnas = self._columnas.get(features)
+        if columnas is None:
+            faltantes = [f for f in self.features if f not in features]
+            if faltantes:
+                # La puntuación no debe fallar por el monitor: se anota y se ignoran esas filas
+                self.error = f"Faltan características de la referencia: {', '.join(faltantes)}"
+                return None
+            columnas = self._columnas[features] = np.array([features.index(f) for f in self.features])
+        return X[:, columnas]
+
+    def actualizar(self, features, X):
+        """Suma las filas de ``X`` (columnas en el orden de ``features``) a los histogramas."""
+        X = self._alinear(features, np.atleast_2d(np.asarray(X, dtype=np.float32)))
+        if X is None:
+            return
+        nan = np.isnan(X)
+        if X.shape[0] <= 64:
+            # Pocas filas: una sola comparación contra la matriz de bordes
+            indices = (X[:, :, None] > self._bordes[None]).sum(axis=2)
+        else:
+            indices = np.stack([_intervalos(self._bordes[j], X[:, j]) for j in range(X.shape[1])], axis=1)
+        planos = (indices + self._desplazamientos)[~nan]
+        conteos = np.bincount(planos, minlength=len(self._conteos))
+        with self._lock:
+            self.n += X.shape[0]
+            self._conteos += conteos
+            self._nan += nan.sum(axis=0)
+            self._debajo += (X < self._minimos).sum(axis=0)
+            self._encima += (X > self._maximos).sum(axis=0)
+            self._min_vivo = np.fmin(self._min_vivo, np.fmin.reduce(X, axis=0))
+            self._max_vivo = np.fmax(self._max_vivo, np.fmax.reduce(X, axis=0))
+
+    def _cuantil(self, j, conteos, q, minimo, maximo):
+        # Interpolación lineal dentro del intervalo; los intervalos abiertos de los extremos
+        # se acotan con el mínimo y el máximo vistos en vivo
+        total = conteos.sum()
+        if not total:
+            return float("nan")
+        v = self.referencia["variables"][self.features[j]]
+        bordes = np.concatenate(([min(minimo, v["bordes"][0])], v["bordes"], [max(maximo, v["bordes"][-1])]))
+        acumulada = np.concatenate(([0.0], np.cumsum(conteos))) / total
+        i = int(np.searchsorted(acumulada, q, side="left"))
+        i = min(max(i, 1), len(conteos))
+        tramo = acumulada[i] - acumulada[i - 1]
+        fraccion = (q - acumulada[i - 1]) / tramo if tramo > 0 else 0.0
+        return float(bordes[i - 1] + fraccion * (bordes[i] - bordes[i - 1]))
+
+    def informe(self):
+        """Lista de diccionarios con PSI, KS y resumen de cada característica, de mayor a menor PSI."""
+        with self._lock:
+            n = self.n
+            conteos = self._conteos.reshape(len(self.features), self.n_bins).copy()
+            nan, debajo, encima = self._nan.copy(), self._debajo.copy(), self._encima.copy()
+            minimos, maximos = self._min_vivo.copy(), self._max_vivo.copy()
+        filas = []
+        for j, feature in enumerate(self.features):
+            ref = self._ref[j]
+            viva = conteos[j, :len(ref)].astype(np.float64)
+            validos = viva.sum()
+            p_ref = ref / max(ref.sum(), 1.0)
+            p_viva = viva / validos if validos else np.zeros_like(viva)
+            grupos = self._grupos[j]
+            fila = {
+                "feature": feature, "n": n,
+                "psi": psi(np.bincount(grupos, p_ref, GRUPOS_PSI), np.bincount(grupos, p_viva, GRUPOS_PSI))
+                if validos else float("nan"),
+                "ks": float(np.abs(np.cumsum(p_ref) - np.cumsum(p_viva)).max()) if validos else float("nan"),
+                "fuera_de_rango": (debajo[j] + encima[j]) / n if n else 0.0,
+                "nan": nan[j] / n if n else 0.0,
+            }
+            v = self.referencia["variables"][feature]
+            for q in CUANTILES:
+                fila[f"p{int(q * 100)}_ref"] = v["cuantiles"][str(q)]
+                fila[f"p{int(q * 100)}_vivo"] = self._cuantil(j, viva, q, float(minimos[j]), float(maximos[j]))
+            filas.append(fila)
+        return sorted(filas, key=lambda f: -np.nan_to_num(f["psi"], nan=-1.0))
+
+    def histograma(self, feature):
+        """(bordes, proporciones de referencia, proporciones en vivo) de una característica."""
+        j = self.features.index(feature)
+        with self._lock:
+            viva = self._conteos[j * self.n_bins:j * self.n_bins + len(self._ref[j])].astype(np.float64)
+        ref = self._ref[j]
+        return (self.referencia["variables"][feature]["bordes"], ref / max(ref.sum(), 1.0),
+                viva / viva.sum() if viva.sum() else viva)
+
+
+_lock = threading.Lock()
+_monitores = {}  # ruta de la referencia -> MonitorDeriva, None o la excepción si no se pudo cargar
+
+
+def obtener_monitor(ruta=RUTA_REFERENCIA):
+    """Monitor compartido por todo el proceso, o None si no hay referencia o no carga."""
+    with _lock:
+        if ruta not in _monitores:
+            try:
+                _monitores[ruta] = MonitorDeriva(cargar_referencia(ruta)) if os.path.exists(ruta) else None
+            except Exception as e:
+                # Una referencia dañada no debe hacer fallar cada predicción: se recuerda el error
+                _monitores[ruta] = e
+        monitor = _monitores[ruta]
+    return None if isinstance(monitor, Exception) else monitor
+
+
+def error_monitor(ruta=RUTA_REFERENCIA):
+    """Error de carga de la referencia, o None."""
+    monitor = _monitores.get(ruta)
+    return monitor if isinstance(monitor, Exception) else None
+
+
+def observar(features, X):
+    """Suma filas puntuadas al monitor del proceso; sin referencia no hace nada."""
+    monitor = obtener_monitor()
+    if monitor is not None:
+        monitor.actualizar(features, X)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Monitor de deriva de las características.")
+    sub = parser.add_subparsers(dest="orden", required=True)
+    p_ref = sub.add_parser("referencia", help="Crea la referencia a partir de un CSV/Parquet de entrenamiento")
+    p_ref.add_argument("origen")
+    p_ref.add_argument("--salida", default=RUTA_REFERENCIA)
+    p_ref.add_argument("--modelo", help="Artefacto del modelo del que tomar las características")
+    p_ref.add_argument("--bins", type=int, default=BINS)
+    p_cmp = sub.add_parser("comparar", help="Compara un CSV/Parquet con la referencia")
+    p_cmp.add_argument("origen")
+    p_cmp.add_argument("--referencia", default=RUTA_REFERENCIA)
+    args = parser.parse_args(argv)
+
+    if args.orden == "referencia":
+        from fraude.modelo import RUTA_MODELO, cargar_modelo
+        from fraude.puntuacion import FraudScorer
+
+        # FraudScorer resuelve las características tanto de un RandomForest como de un bosque compilado
+        features = FraudScorer(cargar_modelo(args.modelo or RUTA_MODELO)).features
+        referencia = crear_referencia(args.origen, features, args.bins)
+        print(f"Referencia con {referencia['n']:,} filas guardada en {guardar_referencia(referencia, args.salida)}")
+        return
+    from fraude.lotes import leer_por_bloques
+
+    monitor = MonitorDeriva(cargar_referencia(args.referencia))
+    for bloque in leer_por_bloques(args.origen):
+        monitor.actualizar(monitor.features, bloque[list(monitor.features)].to_numpy(dtype=np.float32))
+    print(f"{'característica':32s} {'PSI':>8s} {'KS':>6s} {'fuera':>7s}  estado")
+    for fila in monitor.informe():
+        print(f"{fila['feature']:32s} {fila['psi']:8.3f} {fila['ks']:6.3f} {fila['fuera_de_rango']:7.1%}  "
+              f"{estado_psi(fila['psi'])}")
+
+
+if __name__ == "__main__":
+    main()
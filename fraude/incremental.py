@@ -0,0 +1,64 @@
+"""Repuntuación incremental de un registro cuando cambian pocos campos.
+
+En ``app.py`` el usuario suele tocar un solo control (p. ej.
+``customer_age``) y volver a predecir. Si ningún nodo del camino de un árbol
+divide por un campo modificado, el árbol llega a la misma hoja.
+``PuntuadorIncremental`` guarda por sesión el último vector y, por árbol, la
+hoja alcanzada y la máscara de características de su camino
+(``EstadoIncremental``); en la siguiente petición solo recorre los árboles
+cuyo camino usa alguna de las características modificadas.
+
+El índice es por camino y no por árbol: en un bosque profundo casi todos los
+árboles usan todas las características en algún nodo, pero cada camino solo
+pasa por unas pocas. La probabilidad se suma con
+``BosqueCompilado.proba_desde_hojas``, en el orden de sklearn, así que es
+idéntica a un ``predict_proba`` completo.
+"""
+import numpy as np
+
+
+class EstadoIncremental:
+    """Último vector puntuado en una sesión, con la hoja y el camino de cada árbol."""
+
+    __slots__ = ("bosque", "fila", "hojas", "mascaras")
+
+    def __init__(self, bosque, fila, hojas, mascaras):
+        self.bosque = bosque
+        self.fila = fila
+        self.hojas = hojas
+        self.mascaras = mascaras
+
+
+class PuntuadorIncremental:
+    """Puntúa registros de uno en uno reutilizando las hojas de los árboles no afectados."""
+
+    def __init__(self, bosque):
+        self.bosque = bosque
+        self._todos = range(bosque.n_arboles)
+
+    def puntuar(self, X, estado=None):
+        """Probabilidades de una fila ``float32`` (1, n_features).
+
+        Devuelve (probabilidades, nuevo estado, árboles recorridos). Sin estado
+        previo, o si es de otro modelo, se recorre el bosque entero.
+        """
+        fila = np.asarray(X, dtype=np.float32).reshape(-1).tolist()
+        if estado is None or estado.bosque is not self.bosque:
+            hojas, mascaras = self.bosque.hojas_fila(fila, self._todos)
+            recorridos = self.bosque.n_arboles
+        else:
+            cambio = 0
+            for j, (nuevo, anterior) in enumerate(zip(fila, estado.fila)):
+                # NaN -> NaN no cuenta como cambio
+                if nuevo != anterior and (nuevo == nuevo or anterior == anterior):
+                    cambio |= 1 << j
+            hojas, mascaras = list(estado.hojas), list(estado.mascaras)
+            arboles = [t for t, mascara in enumerate(mascaras) if mascara & cambio] if cambio else []
+            if arboles:
+                nuevas, nuevas_mascaras = self.bosque.hojas_fila(fila, arboles)
+                for t, hoja, mascara in zip(arboles, nuevas, nuevas_mascaras):
+                    hojas[t] = hoja
+                    mascaras[t] = mascara
+            recorridos = len(arboles)
+        proba = self.bosque.proba_desde_hojas(np.array([hojas], dtype=np.intp))[0]
+        return proba, EstadoIncremental(self.bosque, fila, hojas, mascaras), recorridos
@@ -0,0 +1,136 @@
+"""Puntuación por lotes de archivos CSV/Parquet.
+
+El archivo se lee en bloques de tamaño fijo, cada bloque se valida contra
+``feature_names_in_``, se puntúa con una sola llamada vectorizada y se
+escribe de inmediato al archivo de salida. La memoria máxima depende del
+tamaño de bloque, no del tamaño del archivo.
+"""
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+TAMANO_BLOQUE = 100_000
+
+# Columnas añadidas a la salida
+COLUMNA_PROBABILIDAD = "fraud_probability"
+COLUMNA_ETIQUETA = "fraud_label"
+
+
+def es_parquet(nombre):
+    """Indica si el nombre de archivo corresponde a Parquet."""
+    return str(nombre).lower().endswith((".parquet", ".pq"))
+
+
+def leer_por_bloques(origen, nombre=None, tamano_bloque=TAMANO_BLOQUE):
+    """Genera DataFrames de como mucho ``tamano_bloque`` filas.
+
+    ``origen`` puede ser una ruta o un objeto tipo archivo; ``nombre`` decide
+    el formato cuando ``origen`` no es una ruta.
+    """
+    nombre = nombre or str(origen)
+    if es_parquet(nombre):
+        import pyarrow.parquet as pq
+
+        archivo = pq.ParquetFile(origen)
+        for lote in archivo.iter_batches(batch_size=tamano_bloque):
+            yield lote.to_pandas()
+    else:
+        with pd.read_csv(origen, chunksize=tamano_bloque) as lector:
+            yield from lector
+
+
+def contar_filas(origen, nombre=None):
+    """Número total de filas si se conoce sin leer el archivo (Parquet), o None."""
+    if es_parquet(nombre or str(origen)):
+        import pyarrow.parquet as pq
+
+        return pq.ParquetFile(origen).metadata.num_rows
+    return None
+
+
+def validar_bloque(bloque, features):
+    """Verifica que el bloque tenga todas las características numéricas del modelo."""
+    faltantes = [f for f in features if f not in bloque.columns]
+    if faltantes:
+        raise ValueError(f"Faltan columnas requeridas por el modelo: {', '.join(faltantes)}")
+    no_numericas = [f for f in features if not pd.api.types.is_numeric_dtype(bloque[f])]
+    if no_numericas:
+        raise ValueError(f"Columnas no numéricas: {', '.join(no_numericas)}")
+
+
+class EscritorResultados:
+    """Escribe bloques de resultados a CSV o Parquet a medida que llegan."""
+
+    def __init__(self, destino):
+        self.destino = destino
+        self._parquet = es_parquet(destino)
+        self._escritor = None
+        self._primero = True
+
+    def escribir(self, bloque):
+        if self._parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            tabla = pa.Table.from_pandas(bloque, preserve_index=False)
+            if self._escritor is None:
+                self._escritor = pq.ParquetWriter(self.destino, tabla.schema)
+            self._escritor.write_table(tabla.cast(self._escritor.schema))
+        else:
+            bloque.to_csv(self.destino, mode="w" if self._primero else "a", header=self._primero, index=False)
+        self._primero = False
+
+    def cerrar(self):
+        if self._escritor is not None:
+            self._escritor.close()
+            self._escritor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+
+def puntuar_bloque(bloque, scorer, umbral=0.5):
+    """Añade probabilidad y etiqueta de fraude a un bloque ya validado."""
+    proba = scorer.proba_fraude(bloque[list(scorer.features)].to_numpy(dtype=np.float32))
+    resultado = bloque.copy()
+    resultado[COLUMNA_PROBABILIDAD] = proba
+    resultado[COLUMNA_ETIQUETA] = (proba > umbral).astype(np.int8)
+    return resultado
+
+
+def puntuar_archivo(origen, destino, scorer, nombre=None, tamano_bloque=TAMANO_BLOQUE, umbral=0.5,
+                    al_progresar=None):
+    """Puntúa ``origen`` bloque a bloque y escribe los resultados en ``destino``.
+
+    ``al_progresar(filas, total, segundos)`` se llama tras cada bloque; ``total``
+    es None cuando no se conoce de antemano. Devuelve un resumen con las filas
+    procesadas, las marcadas como fraude, los segundos y las filas/segundo.
+    """
+    total = contar_filas(origen, nombre)
+    filas = fraudes = 0
+    inicio = time.perf_counter()
+    with EscritorResultados(destino) as escritor:
+        for bloque in leer_por_bloques(origen, nombre, tamano_bloque):
+            # Un CSV con solo cabecera da un bloque vacío de tipo object: no hay nada que validar
+            if bloque.empty:
+                continue
+            validar_bloque(bloque, scorer.features)
+            resultado = puntuar_bloque(bloque, scorer, umbral)
+            escritor.escribir(resultado)
+            filas += len(resultado)
+            fraudes += int(resultado[COLUMNA_ETIQUETA].sum())
+            if al_progresar is not None:
+                al_progresar(filas, total, time.perf_counter() - inicio)
+    segundos = time.perf_counter() - inicio
+    return {
+        "filas": filas,
+        "fraudes": fraudes,
+        "segundos": segundos,
+        "filas_por_segundo": filas / segundos if segundos > 0 else 0.0,
+        "destino": os.path.abspath(destino),
+    }
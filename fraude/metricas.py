@@ -0,0 +1,125 @@
+"""Instrumentación ligera del camino de predicción.
+
+Cada etapa (obtener el modelo, cargarlo, vectorizar la entrada, predecir...)
+se mide con ``medir(etapa)`` y la duración se guarda en un histograma
+circular compartido por todas las sesiones del proceso. Con la
+instrumentación desactivada ``medir`` devuelve siempre el mismo contexto
+vacío, así que el coste es una llamada a función.
+
+Se activa con la variable de entorno ``FRAUDE_METRICAS=1`` o con
+``activar(True)`` desde el panel de administración.
+"""
+import os
+import threading
+import time
+from contextlib import nullcontext
+
+import numpy as np
+
+# Muestras que guarda cada histograma (las más recientes)
+CAPACIDAD = 2048
+
+PERCENTILES = (50, 95, 99)
+
+_activadas = os.environ.get("FRAUDE_METRICAS", "0") == "1"
+_lock = threading.Lock()
+_histogramas = {}
+_NULO = nullcontext()
+
+
+class Histograma:
+    """Ventana circular de duraciones con totales acumulados."""
+
+    def __init__(self, capacidad=CAPACIDAD):
+        self._muestras = np.zeros(capacidad, dtype=np.float64)
+        self._pos = 0
+        self._lock = threading.Lock()
+        self.total = 0
+        self.suma = 0.0
+
+    def registrar(self, segundos):
+        with self._lock:
+            self._muestras[self._pos % len(self._muestras)] = segundos
+            self._pos += 1
+            self.total += 1
+            self.suma += segundos
+
+    def percentiles(self, percentiles=PERCENTILES):
+        """Percentiles (en segundos) de la ventana actual."""
+        with self._lock:
+            muestras = self._muestras[: min(self._pos, len(self._muestras))].copy()
+        if not len(muestras):
+            return {p: 0.0 for p in percentiles}
+        return {p: float(v) for p, v in zip(percentiles, np.percentile(muestras, percentiles))}
+
+
+class _Cronometro:
+    __slots__ = ("histograma", "inicio")
+
+    def __init__(self, histograma):
+        self.histograma = histograma
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histograma.registrar(time.perf_counter() - self.inicio)
+
+
+def activadas():
+    return _activadas
+
+
+def activar(valor=True):
+    """Activa o desactiva la instrumentación para todo el proceso."""
+    global _activadas
+    _activadas = bool(valor)
+
+
+def histograma(etapa):
+    """Histograma de una etapa, creado la primera vez que se usa."""
+    h = _histogramas.get(etapa)
+    if h is None:
+        with _lock:
+            h = _histogramas.setdefault(etapa, Histograma())
+    return h
+
+
+def medir(etapa):
+    """Contexto que mide la duración de ``etapa`` si la instrumentación está activa."""
+    if not _activadas:
+        return _NULO
+    return _Cronometro(histograma(etapa))
+
+
+def resumen():
+    """{etapa: {"p50_ms", "p95_ms", "p99_ms", "total", "media_ms"}} de todas las etapas."""
+    with _lock:
+        etapas = dict(_histogramas)
+    resultado = {}
+    for etapa, h in sorted(etapas.items()):
+        fila = {f"p{p}_ms": v * 1000.0 for p, v in h.percentiles().items()}
+        fila["total"] = h.total
+        fila["media_ms"] = h.suma / h.total * 1000.0 if h.total else 0.0
+        resultado[etapa] = fila
+    return resultado
+
+
+def reiniciar():
+    with _lock:
+        _histogramas.clear()
+
+
+def exportar_texto(prefijo="fraude_etapa_segundos"):
+    """Exporta los histogramas en formato de texto de Prometheus (tipo summary)."""
+    with _lock:
+        etapas = dict(_histogramas)
+    lineas = [f"# HELP {prefijo} Duración de cada etapa del camino de predicción.",
+              f"# TYPE {prefijo} summary"]
+    for etapa, h in sorted(etapas.items()):
+        for p, v in h.percentiles().items():
+            lineas.append(f'{prefijo}{{etapa="{etapa}",quantile="{p / 100:g}"}} {v:.9f}')
+        lineas.append(f'{prefijo}_sum{{etapa="{etapa}"}} {h.suma:.9f}')
+        lineas.append(f'{prefijo}_count{{etapa="{etapa}"}} {h.total}')
+    return "\n".join(lineas) + "\n"
@@ -0,0 +1,181 @@
+"""Carga compartida del modelo de fraude para todas las variantes de la app.
+
+Streamlit vuelve a ejecutar el script completo con cada cambio de un widget,
+así que el modelo se comparte como una instancia única por proceso (ver
+``fraude.registro``). Además, el artefacto ``.pkl.gz`` se descomprime una sola vez a un ``.joblib`` sin
+comprimir que se abre con ``mmap_mode``: los arrays del bosque se leen desde
+la caché de páginas del disco en lugar de descomprimirse en cada arranque.
+
+``RUTA_MODELO`` también puede apuntar a un directorio generado por
+``python -m fraude.artefactos convertir``; en ese caso se carga el formato
+más rápido disponible (ver ``fraude.artefactos``), o a un bosque compilado
+guardado con ``BosqueCompilado.guardar`` (p. ej. una variante de
+``python -m fraude.compactacion``), que se puntúa con el motor compilado.
+"""
+import gzip
+import hashlib
+import json
+import os
+import threading
+
+# Ruta del modelo (se puede sobrescribir por variable de entorno)
+RUTA_MODELO = os.environ.get("RUTA_MODELO", "modelo_RandomForest_optimizado.pkl.gz")
+
+# Carpeta donde se guarda la copia sin comprimir del modelo
+DIR_CACHE = os.environ.get("DIR_CACHE_MODELO", ".cache_modelo")
+
+_lock = threading.Lock()
+_huellas = {}  # ruta absoluta -> (sello del artefacto, sha256)
+
+
+def cargar_modelo_comprimido(ruta):
+    """Carga el modelo comprimido con gzip."""
+    if not os.path.exists(ruta):
+        raise FileNotFoundError(f"El archivo {ruta} no existe. Verifica que está en la carpeta correcta.")
+    import joblib
+
+    with gzip.open(ruta, "rb") as f:
+        modelo = joblib.load(f)
+    return modelo
+
+
+def validar_modelo(modelo):
+    """Verifica que el objeto cargado sea un RandomForestClassifier."""
+    # Import diferido: sklearn tarda en importarse y al deserializar el modelo ya se carga
+    from sklearn.ensemble import RandomForestClassifier
+
+    if not isinstance(modelo, RandomForestClassifier):
+        raise ValueError("El modelo cargado no es un RandomForestClassifier.")
+    return modelo
+
+
+def es_bosque_compilado(ruta):
+    """Indica si ``ruta`` es un directorio escrito por ``BosqueCompilado.guardar``."""
+    return os.path.isfile(os.path.join(ruta, "bosque.json"))
+
+
+def sello_artefacto(ruta):
+    """Devuelve (tamaño, mtime) del artefacto para detectar cambios sin leerlo."""
+    if os.path.isdir(ruta):
+        # Directorio convertido o bosque compilado: cambia cuando se reescribe el JSON que se escribe al final
+        ruta = os.path.join(ruta, "bosque.json" if es_bosque_compilado(ruta) else "manifest.json")
+    info = os.stat(ruta)
+    return [info.st_size, info.st_mtime_ns]
+
+
+def huella_artefacto(ruta, bloque=1 << 20):
+    """Calcula el SHA-256 del artefacto."""
+    sha = hashlib.sha256()
+    with open(ruta, "rb") as f:
+        for parte in iter(lambda: f.read(bloque), b""):
+            sha.update(parte)
+    return sha.hexdigest()
+
+
+def huella_bosque(directorio):
+    """SHA-256 de los arrays y el ``bosque.json`` de un bosque compilado."""
+    sha = hashlib.sha256()
+    for nombre in sorted(os.listdir(directorio)):
+        if nombre.endswith(".npy") or nombre == "bosque.json":
+            sha.update(nombre.encode("utf-8"))
+            sha.update(huella_artefacto(os.path.join(directorio, nombre)).encode("ascii"))
+    return sha.hexdigest()
+
+
+def obtener_huella(ruta=RUTA_MODELO):
+    """SHA-256 del artefacto, recalculado solo cuando cambia su sello."""
+    clave = os.path.abspath(ruta)
+    sello = sello_artefacto(ruta)
+    with _lock:
+        actual = _huellas.get(clave)
+    if actual is not None and actual[0] == sello:
+        return actual[1]
+    if es_bosque_compilado(ruta):
+        huella = huella_bosque(ruta)
+    elif os.path.isdir(ruta):
+        # Un directorio convertido conserva la identidad del artefacto original
+        from fraude.artefactos import leer_manifiesto
+
+        huella = leer_manifiesto(ruta)["sha256_origen"]
+    else:
+        meta = leer_metadatos_cache(ruta)
+        huella = meta["sha256"] if meta is not None and meta.get("sello") == sello else huella_artefacto(ruta)
+    with _lock:
+        _huellas[clave] = (sello, huella)
+    return huella
+
+
+def ruta_cache(ruta, dir_cache=None):
+    """Ruta del ``.joblib`` sin comprimir que corresponde a un artefacto."""
+    nombre = os.path.basename(ruta)
+    for sufijo in (".gz", ".pkl"):
+        if nombre.endswith(sufijo):
+            nombre = nombre[: -len(sufijo)]
+    return os.path.join(dir_cache or DIR_CACHE, nombre + ".joblib")
+
+
+def leer_metadatos_cache(ruta, dir_cache=None):
+    """Devuelve los metadatos guardados junto a la caché, o None si no existen."""
+    try:
+        with open(ruta_cache(ruta, dir_cache) + ".json", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def preparar_cache(ruta, dir_cache=None):
+    """Descomprime el artefacto a un ``.joblib`` sin comprimir si aún no está al día.
+
+    La caché se reconstruye cuando cambia el tamaño o la fecha de modificación
+    del ``.pkl.gz`` original. Devuelve la ruta de la caché.
+    """
+    destino = ruta_cache(ruta, dir_cache)
+    sello = sello_artefacto(ruta)
+    meta = leer_metadatos_cache(ruta, dir_cache)
+    if meta is not None and meta.get("sello") == sello and os.path.exists(destino):
+        return destino
+
+    modelo = validar_modelo(cargar_modelo_comprimido(ruta))
+    os.makedirs(os.path.dirname(destino), exist_ok=True)
+
+    # Escritura atómica: otro proceso nunca ve un archivo a medio escribir
+    import joblib
+
+    temporal = f"{destino}.{os.getpid()}.tmp"
+    joblib.dump(modelo, temporal)
+    os.replace(temporal, destino)
+
+    meta = {"origen": os.path.abspath(ruta), "sello": sello, "sha256": huella_artefacto(ruta)}
+    temporal = f"{destino}.json.{os.getpid()}.tmp"
+    with open(temporal, "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(temporal, destino + ".json")
+    return destino
+
+
+def cargar_modelo(ruta=RUTA_MODELO, mmap=True, dir_cache=None):
+    """Carga y valida el modelo.
+
+    Con ``mmap=True`` se usa la caché sin comprimir abierta con
+    ``mmap_mode="r"``; si no se puede escribir la caché se recurre al gzip.
+    """
+    if not os.path.exists(ruta):
+        raise FileNotFoundError(f"El archivo {ruta} no existe. Verifica que está en la carpeta correcta.")
+    if es_bosque_compilado(ruta):
+        from fraude.motor import BosqueCompilado
+
+        return BosqueCompilado.cargar(ruta, mmap=mmap)
+    if os.path.isdir(ruta):
+        from fraude.artefactos import cargar_convertido
+
+        return cargar_convertido(ruta)
+    if not mmap:
+        return validar_modelo(cargar_modelo_comprimido(ruta))
+    try:
+        destino = preparar_cache(ruta, dir_cache)
+    except OSError:
+        return validar_modelo(cargar_modelo_comprimido(ruta))
+    import joblib
+
+    return validar_modelo(joblib.load(destino, mmap_mode="r"))
+
@@ -0,0 +1,245 @@
+"""Motor de inferencia compilado para el RandomForest.
+
+``BosqueCompilado`` aplana todos los ``estimators_[i].tree_`` en un único
+juego de arrays contiguos (característica, umbral, hijo izquierdo, hijo
+derecho, valor de hoja) y recorre todos los árboles a la vez, nivel por
+nivel, con operaciones vectorizadas de NumPy. Evita el bucle de Python por
+estimador y el despacho de joblib de ``model.predict_proba``, y su salida es
+idéntica bit a bit.
+
+Las hojas apuntan a sí mismas, de modo que basta con avanzar
+``profundidad`` niveles para que todas las filas lleguen a su hoja.
+
+``guardar``/``cargar`` escriben los arrays como ``.npy`` en un directorio;
+al cargarlos con ``mmap=True`` varios procesos comparten las mismas páginas
+del bosque sin copiarlas.
+
+``arboles()`` devuelve cada árbol con la interfaz de ``tree_`` de sklearn
+que usa ``fraude.rapido``, para puntuar sin el modelo de sklearn cuando el
+bosque se comparte entre procesos (ver ``fraude.compartido``).
+
+``hojas_fila`` recorre en Python puro unos pocos árboles para una sola fila:
+cuando solo hay que evaluar parte del bosque, el coste fijo de cada
+operación de NumPy pesa más que el propio recorrido.
+
+Los arrays pueden tener tipos más estrechos que los de sklearn (umbrales y
+valores ``float32``/``float16``, índices ``int16``; ver
+``fraude.compactacion``): el recorrido usa índices de al menos 32 bits y las
+probabilidades se acumulan siempre en ``float64``.
+"""
+import json
+import os
+
+import numpy as np
+
+# Filas procesadas por pasada; limita la memoria de la matriz (filas, árboles)
+FILAS_POR_PASADA = 4096
+
+
+class ArbolCompilado:
+    """Un árbol del bosque con los atributos de ``sklearn.tree._tree.Tree`` (índices locales, -1 en las hojas)."""
+
+    def __init__(self, bosque, t):
+        self._bosque = bosque
+        self._t = t
+        self._inicio = inicio = int(bosque.raices[t])
+        fin = int(bosque.raices[t + 1]) if t + 1 < bosque.n_arboles else bosque.n_nodos
+        self.node_count = fin - inicio
+        propios = np.arange(self.node_count)
+        izquierdo = np.asarray(bosque.izquierdo[inicio:fin]) - inicio
+        hoja = izquierdo == propios
+        self.children_left = np.where(hoja, -1, izquierdo)
+        self.children_right = np.where(hoja, -1, np.asarray(bosque.derecho[inicio:fin]) - inicio)
+        self.feature = np.where(hoja, -2, bosque.feature[inicio:fin])
+        self.threshold = np.where(hoja, -2.0, bosque.umbral[inicio:fin])
+        self.missing_go_to_left = np.asarray(bosque.falta_izquierda[inicio:fin], dtype=np.uint8)
+        self.value = bosque.valor[inicio:fin, None, :]
+
+    def apply(self, X):
+        """Hoja (índice local) alcanzada por cada fila."""
+        return self._bosque.hojas(X, [self._t])[:, 0] - self._inicio
+
+
+class BosqueCompilado:
+    """Bosque aplanado en arrays contiguos, equivalente a ``predict_proba``."""
+
+    # Arrays que definen el bosque (los usa también la persistencia en disco)
+    ARRAYS = ("feature", "umbral", "izquierdo", "derecho", "falta_izquierda", "valor", "raices")
+
+    def __init__(self, feature, umbral, izquierdo, derecho, falta_izquierda, valor, raices,
+                 profundidad, classes_, features):
+        self.feature = feature
+        self.umbral = umbral
+        self.izquierdo = izquierdo
+        self.derecho = derecho
+        self.falta_izquierda = falta_izquierda
+        self.valor = valor
+        self.raices = raices
+        self.profundidad = int(profundidad)
+        self.classes_ = np.asarray(classes_)
+        self.features = tuple(features)
+        self.n_arboles = len(raices)
+        self.n_nodos = len(feature)
+
+    @classmethod
+    def desde_modelo(cls, modelo):
+        """Aplana un ``RandomForestClassifier`` ya entrenado."""
+        if getattr(modelo, "n_outputs_", 1) != 1:
+            raise ValueError("El motor compilado solo admite modelos de una salida.")
+        n_classes = len(modelo.classes_)
+        arboles = [estimador.tree_ for estimador in modelo.estimators_]
+        tamanos = np.array([arbol.node_count for arbol in arboles])
+        raices = np.concatenate(([0], np.cumsum(tamanos)[:-1])).astype(np.int32)
+        n_nodos = int(tamanos.sum())
+
+        feature = np.zeros(n_nodos, dtype=np.int32)
+        umbral = np.zeros(n_nodos, dtype=np.float64)
+        izquierdo = np.empty(n_nodos, dtype=np.int32)
+        derecho = np.empty(n_nodos, dtype=np.int32)
+        falta_izquierda = np.zeros(n_nodos, dtype=bool)
+        valor = np.empty((n_nodos, n_classes), dtype=np.float64)
+
+        for arbol, inicio in zip(arboles, raices):
+            fin = inicio + arbol.node_count
+            propios = np.arange(inicio, fin, dtype=np.int32)
+            hoja = arbol.children_left == -1
+            feature[inicio:fin] = np.where(hoja, 0, arbol.feature)
+            umbral[inicio:fin] = np.where(hoja, 0.0, arbol.threshold)
+            izquierdo[inicio:fin] = np.where(hoja, propios, arbol.children_left + inicio)
+            derecho[inicio:fin] = np.where(hoja, propios, arbol.children_right + inicio)
+            if hasattr(arbol, "missing_go_to_left"):
+                falta_izquierda[inicio:fin] = arbol.missing_go_to_left.astype(bool)
+            valor[inicio:fin] = arbol.value[:, 0, :n_classes]
+
+        profundidad = max(arbol.max_depth for arbol in arboles)
+        return cls(feature, umbral, izquierdo, derecho, falta_izquierda, valor, raices,
+                   profundidad, modelo.classes_, modelo.feature_names_in_)
+
+    @property
+    def _hijos(self):
+        # Hijos intercalados [izq0, der0, izq1, der1, ...]: un solo gather por nivel
+        hijos = getattr(self, "_hijos_cache", None)
+        if hijos is None:
+            # Al menos 32 bits: con índices int16, ``2 * nodos`` desbordaría
+            tipo = np.promote_types(self.izquierdo.dtype, np.int32)
+            hijos = self._hijos_cache = np.ascontiguousarray(
+                np.stack([self.izquierdo, self.derecho], axis=1).ravel(), dtype=tipo)
+        return hijos
+
+    def _hojas_pasada(self, X, arboles):
+        hijos = self._hijos
+        plano = X.ravel()
+        nodos = np.broadcast_to(self.raices[arboles], (X.shape[0], len(arboles))).astype(hijos.dtype)
+        base = (np.arange(X.shape[0], dtype=np.intp) * X.shape[1])[:, None]
+        for _ in range(self.profundidad):
+            x = plano[base + self.feature[nodos]]
+            derecha = ~(x <= self.umbral[nodos])
+            faltantes = np.isnan(x)
+            if faltantes.any():
+                derecha = np.where(faltantes, ~self.falta_izquierda[nodos], derecha)
+            nodos = hijos[2 * nodos + derecha]
+        return nodos
+
+    def hojas(self, X, arboles=None):
+        """Índice global de la hoja alcanzada por cada fila en cada árbol.
+
+        ``X`` debe ser ``float32`` con las columnas en el orden de ``features``.
+        Con ``arboles`` se recorre solo ese subconjunto de árboles.
+        """
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        arboles = np.arange(self.n_arboles) if arboles is None else np.asarray(arboles)
+        if X.shape[0] <= FILAS_POR_PASADA:
+            return self._hojas_pasada(X, arboles)
+        return np.concatenate([self._hojas_pasada(X[i:i + FILAS_POR_PASADA], arboles)
+                               for i in range(0, X.shape[0], FILAS_POR_PASADA)])
+
+    def arboles(self):
+        """Lista de ``ArbolCompilado``, uno por árbol, en el orden del bosque."""
+        return [ArbolCompilado(self, t) for t in range(self.n_arboles)]
+
+    def _vistas(self):
+        # memoryview de los arrays: indexado escalar rápido sin copiar (ni romper el mmap)
+        vistas = getattr(self, "_vistas_cache", None)
+        if vistas is None:
+            # memoryview no admite float16; pasar a float32 no cambia ningún umbral
+            umbral = self.umbral.astype(np.float32) if self.umbral.dtype == np.float16 else self.umbral
+            vistas = self._vistas_cache = tuple(
+                memoryview(np.ascontiguousarray(a)) for a in
+                (self.feature, umbral, self.izquierdo, self.derecho, self.falta_izquierda, self.raices)
+            )
+        return vistas
+
+    def hojas_fila(self, x, arboles):
+        """Hoja alcanzada por una fila en cada uno de ``arboles`` y características de su camino.
+
+        ``x`` es una secuencia de floats (p. ej. ``fila_float32.tolist()``): la
+        comparación con el umbral ``float64`` es la misma que en sklearn. Devuelve
+        (hojas, máscaras), donde el bit ``j`` de cada máscara indica que el camino
+        hasta la hoja pasa por un nodo que divide por la característica ``j``.
+        """
+        feature, umbral, izquierdo, derecho, falta_izquierda, raices = self._vistas()
+        hojas, mascaras = [], []
+        for arbol in arboles:
+            nodo = raices[arbol]
+            hijo = izquierdo[nodo]
+            mascara = 0
+            while hijo != nodo:
+                j = feature[nodo]
+                mascara |= 1 << j
+                v = x[j]
+                if v != v:
+                    nodo = hijo if falta_izquierda[nodo] else derecho[nodo]
+                elif v <= umbral[nodo]:
+                    nodo = hijo
+                else:
+                    nodo = derecho[nodo]
+                hijo = izquierdo[nodo]
+            hojas.append(nodo)
+            mascaras.append(mascara)
+        return hojas, mascaras
+
+    def proba_desde_hojas(self, hojas):
+        """Promedia los valores de hoja en el orden de los árboles, como sklearn."""
+        # (árboles, filas, clases): la suma sobre el eje 0 es secuencial, igual que
+        # la acumulación árbol a árbol de RandomForestClassifier.predict_proba
+        proba = np.add.reduce(self.valor[hojas.T], axis=0, dtype=np.float64)
+        proba /= hojas.shape[1]
+        return proba
+
+    def predict_proba(self, X):
+        """Probabilidades por clase; idénticas a ``RandomForestClassifier.predict_proba``."""
+        return self.proba_desde_hojas(self.hojas(X))
+
+    def predict(self, X):
+        """Clase predicha para cada fila."""
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
+
+    def guardar(self, directorio):
+        """Escribe los arrays del bosque como ``.npy`` más un ``bosque.json``."""
+        os.makedirs(directorio, exist_ok=True)
+        for nombre in self.ARRAYS:
+            np.save(os.path.join(directorio, f"{nombre}.npy"), getattr(self, nombre))
+        if self._hijos.dtype == self.izquierdo.dtype:
+            # Con índices más estrechos se reconstruye al cargar: ocuparía el doble que izquierdo y derecho
+            np.save(os.path.join(directorio, "hijos.npy"), self._hijos)
+        meta = {"profundidad": self.profundidad, "classes_": self.classes_.tolist(), "features": list(self.features)}
+        # El JSON se escribe al final: su presencia indica que el directorio está completo
+        temporal = os.path.join(directorio, f"bosque.json.{os.getpid()}.tmp")
+        with open(temporal, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(temporal, os.path.join(directorio, "bosque.json"))
+        return directorio
+
+    @classmethod
+    def cargar(cls, directorio, mmap=True):
+        """Carga un bosque guardado; con ``mmap=True`` los arrays son vistas de solo lectura del archivo."""
+        with open(os.path.join(directorio, "bosque.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        modo = "r" if mmap else None
+        arrays = {nombre: np.load(os.path.join(directorio, f"{nombre}.npy"), mmap_mode=modo)
+                  for nombre in cls.ARRAYS}
+        bosque = cls(**arrays, profundidad=meta["profundidad"], classes_=meta["classes_"], features=meta["features"])
+        ruta_hijos = os.path.join(directorio, "hijos.npy")
+        if os.path.exists(ruta_hijos):
+            bosque._hijos_cache = np.load(ruta_hijos, mmap_mode=modo)
+        return bosque
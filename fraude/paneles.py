@@ -0,0 +1,74 @@
+"""Paneles de Streamlit reutilizados por varias aplicaciones."""
+import streamlit as st
+
+from fraude import arranque, compartido, metricas
+
+
+def panel_modelo(registro):
+    """Versión del modelo en servicio, memoria del proceso e historial de recargas."""
+    version = registro.actual()
+    with st.sidebar.expander("🧠 Modelo"):
+        if version is None:
+            st.caption("Cargando..." if not registro.listo() else "Sin versión válida.")
+        else:
+            st.metric("Versión", version.corta)
+            st.caption(f"Cargado {version.cargado} en {version.segundos_carga:.1f} s · motor {version.scorer.motor}"
+                       + (" · bosque compartido" if registro.compartido else ""))
+        mem = compartido.memoria()
+        if mem is not None:
+            st.caption(f"Memoria del proceso: {mem['rss_mb']:.0f} MB (privada {mem['privada_mb']:.0f} MB, "
+                       f"compartida {mem['compartida_mb']:.0f} MB, PSS {mem['pss_mb']:.0f} MB)")
+        if version is not None and version.memoria is not None:
+            st.caption(f"La carga de esta versión añadió {version.memoria['rss_mb']:.0f} MB de RSS "
+                       f"({version.memoria['privada_mb']:.0f} MB privados)")
+        if registro.error is not None and version is not None:
+            st.warning(f"Última versión rechazada: {registro.error}")
+        if registro.historial:
+            st.dataframe(list(reversed(registro.historial)), hide_index=True)
+
+
+def panel_cache(cache):
+    """Muestra en la barra lateral los contadores de la caché de predicciones."""
+    if cache is None:
+        return
+    est = cache.estadisticas()
+    with st.sidebar.expander("⚡ Caché de predicciones"):
+        col1, col2 = st.columns(2)
+        col1.metric("Aciertos", f"{est['aciertos']:,}")
+        col2.metric("Fallos", f"{est['fallos']:,}")
+        col1.metric("Desalojos", f"{est['desalojos']:,}")
+        col2.metric("Entradas", f"{est['entradas']:,}/{est['tamano']:,}")
+        st.caption(f"Tasa de aciertos: {est['tasa_aciertos']:.1%} · Invalidaciones por cambio de modelo: "
+                   f"{est['invalidaciones']}")
+
+
+def panel_metricas():
+    """Panel de administración con la latencia p50/p95/p99 de cada etapa."""
+    with st.sidebar.expander("⏱️ Latencia por etapa"):
+        activas = st.checkbox("Activar instrumentación", value=metricas.activadas(), key="metricas_activas")
+        if activas != metricas.activadas():
+            metricas.activar(activas)
+        resumen = metricas.resumen()
+        if not resumen:
+            st.caption("Sin mediciones todavía.")
+            return
+        st.dataframe(
+            [{"Etapa": etapa, "p50 (ms)": round(r["p50_ms"], 3), "p95 (ms)": round(r["p95_ms"], 3),
+              "p99 (ms)": round(r["p99_ms"], 3), "Llamadas": r["total"]} for etapa, r in resumen.items()],
+            hide_index=True,
+        )
+        st.download_button("⬇️ Exportar métricas", metricas.exportar_texto(), file_name="metricas.txt",
+                           mime="text/plain")
+
+
+def panel_arranque():
+    """Con ``FRAUDE_PERFIL_ARRANQUE=1``, tiempo desde el inicio del proceso hasta el primer render."""
+    if not arranque.activado():
+        return
+    segundos = arranque.registrar_primer_render()
+    with st.sidebar.expander("🚀 Arranque"):
+        if segundos is None:
+            st.caption("No se puede medir el inicio del proceso en este sistema.")
+        else:
+            st.metric("Primer render", f"{segundos:.2f} s")
+        st.caption("Detalle por módulo: python -m fraude.arranque <app>")
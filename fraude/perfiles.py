@@ -0,0 +1,70 @@
+"""Perfiles de cliente de ejemplo usados por las aplicaciones.
+
+Los perfiles (arquetipos de cliente) están en ``datos/perfiles.json``
+(``RUTA_PERFILES``): un objeto con un perfil por nombre, cada uno con una
+explicación y un registro completo con las 20 características del modelo.
+Las apps parten de uno y el usuario ajusta algunos campos; para añadir
+arquetipos basta con ampliar el archivo.
+
+``PuntuacionPerfiles`` puntúa todos los perfiles con una sola llamada al
+modelo. ``fraude.registro`` la calcula al cargar cada versión y la guarda en
+``VersionModelo.perfiles``, así que la probabilidad de un perfil sin editar
+no se vuelve a calcular.
+"""
+import json
+import os
+
+import numpy as np
+
+# Archivo de perfiles (por defecto, el del proyecto, sea cual sea el directorio de trabajo)
+RUTA_PERFILES = os.environ.get(
+    "RUTA_PERFILES",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "datos", "perfiles.json"),
+)
+
+
+def cargar_perfiles(ruta=RUTA_PERFILES):
+    """Perfiles del archivo, por nombre y en el orden del archivo."""
+    with open(ruta, encoding="utf-8") as f:
+        perfiles = json.load(f)
+    for nombre, perfil in perfiles.items():
+        if not isinstance(perfil.get("datos"), dict):
+            raise ValueError(f"El perfil '{nombre}' no tiene 'datos'.")
+        perfil.setdefault("explicacion", "")
+    return perfiles
+
+
+PERFILES = cargar_perfiles()
+
+
+class PuntuacionPerfiles:
+    """Probabilidad de fraude de cada perfil con una versión del modelo; no cambia una vez creada."""
+
+    def __init__(self, scorer, perfiles=None):
+        perfiles = PERFILES if perfiles is None else perfiles
+        self.nombres = tuple(perfiles)
+        self.features = scorer.features
+        self.indices = {nombre: i for i, nombre in enumerate(self.nombres)}
+        self.X = scorer.vectorizar([perfiles[nombre]["datos"] for nombre in self.nombres])
+        self.proba = scorer.proba_fraude(self.X)
+        self.X.setflags(write=False)
+        self.proba.setflags(write=False)
+
+    def proba_de(self, nombre):
+        """Probabilidad de fraude precalculada de un perfil."""
+        return float(self.proba[self.indices[nombre]])
+
+    def repuntuar(self, scorer, X):
+        """(probabilidades, filas cambiadas) para ``X``, una fila por perfil en el orden de ``nombres``.
+
+        ``X`` tiene las columnas en el orden de ``features``. Solo se puntúan,
+        en un lote, las filas que difieren de los perfiles; el resto sale de la
+        puntuación precalculada. ``scorer`` debe ser el de la misma versión.
+        """
+        X = np.asarray(X, dtype=np.float32)
+        distintas = (X != self.X) & ~(np.isnan(X) & np.isnan(self.X))
+        cambiadas = np.flatnonzero(distintas.any(axis=1))
+        proba = self.proba.copy()
+        if len(cambiadas):
+            proba[cambiadas] = scorer.proba_fraude(X[cambiadas])
+        return proba, cambiadas
@@ -0,0 +1,268 @@
+"""Núcleo de puntuación compartido por las aplicaciones.
+
+``FraudScorer`` compila una sola vez el orden de características a partir de
+``feature_names_in_`` y pasa un array ``float32`` contiguo directamente a los
+árboles del bosque. Así se evita construir y reindexar un ``pd.DataFrame`` por
+cada petición, que con una sola fila cuesta más que la propia predicción.
+
+Hay dos motores: ``"sklearn"`` recorre ``estimators_[i].tree_`` uno a uno y
+``"compilado"`` usa ``BosqueCompilado``, que evalúa todos los árboles a la
+vez sobre arrays aplanados. Ambos dan resultados idénticos. El recorrido
+vectorizado con NumPy gana cuando hay pocas filas (domina el coste fijo por
+árbol); con lotes grandes el recorrido en C de sklearn es más rápido, así que
+el motor compilado solo se usa hasta ``LIMITE_FILAS_COMPILADO`` filas.
+Construido sobre un ``BosqueCompilado`` (bosque compartido entre procesos,
+ver ``fraude.compartido``), el scorer no tiene árboles de sklearn y usa el
+motor compilado con cualquier tamaño de lote.
+
+``predict_rapido`` es el modo de "decisión rápida": solo devuelve la
+etiqueta y deja de evaluar árboles en cuanto el resto ya no puede cambiarla
+(ver ``fraude.rapido``). ``predict_proba_incremental`` reutiliza las hojas
+de la predicción anterior de la sesión (ver ``fraude.incremental``).
+"""
+import os
+import threading
+
+import numpy as np
+
+from fraude.cache import CachePredicciones
+from fraude.explicacion import contribuciones, sesgo
+from fraude.incremental import PuntuadorIncremental
+from fraude.metricas import medir
+from fraude.modelo import RUTA_MODELO
+from fraude.motor import BosqueCompilado
+from fraude.rapido import DecisorRapido
+
+MOTORES = ("compilado", "sklearn")
+
+# Motor de puntuación por defecto (se puede sobrescribir por variable de entorno)
+MOTOR_PUNTUACION = os.environ.get("MOTOR_PUNTUACION", "compilado")
+
+# Por encima de este número de filas se recorre cada árbol con sklearn
+LIMITE_FILAS_COMPILADO = 32
+
+
+class FraudScorer:
+    """Puntúa transacciones con un RandomForest ya cargado.
+
+    Acepta un diccionario, una lista de diccionarios o un array de NumPy con
+    las columnas en el orden de ``features``. Los resultados coinciden
+    exactamente con ``model.predict_proba`` / ``model.predict``.
+    """
+
+    def __init__(self, modelo, motor=MOTOR_PUNTUACION, cache=None, huella=None, cache_explicaciones=None):
+        if motor not in MOTORES:
+            raise ValueError(f"Motor de puntuación desconocido: {motor}. Opciones: {', '.join(MOTORES)}")
+        if isinstance(modelo, BosqueCompilado):
+            # Bosque compartido entre procesos (ver ``fraude.compartido``): sin árboles de sklearn
+            if motor != "compilado":
+                raise ValueError("Un bosque compilado solo se puede puntuar con el motor compilado.")
+            features, classes_ = modelo.features, modelo.classes_
+            self._arboles = []
+            self._compilado = modelo
+        else:
+            if not hasattr(modelo, "feature_names_in_"):
+                raise ValueError("El modelo cargado no tiene información de características.")
+            features, classes_ = modelo.feature_names_in_, modelo.classes_
+            self._arboles = [estimador.tree_ for estimador in modelo.estimators_]
+            self._compilado = BosqueCompilado.desde_modelo(modelo) if motor == "compilado" else None
+        self.modelo = modelo
+        self.motor = motor
+        # Caché de predicciones opcional; ``huella`` identifica el artefacto del modelo
+        self.cache = cache
+        self.cache_explicaciones = cache_explicaciones
+        self.huella = huella
+        self.features = tuple(str(f) for f in features)
+        self.n_features = len(self.features)
+        self.classes_ = classes_
+        self.n_classes = len(self.classes_)
+        # Columna de la clase "fraude" (1) dentro de predict_proba
+        positivas = np.flatnonzero(self.classes_ == 1)
+        self.indice_fraude = int(positivas[0]) if len(positivas) else self.n_classes - 1
+        self.n_arboles = len(self._arboles) if self._arboles else self._compilado.n_arboles
+        self._decisores = {}  # umbral -> DecisorRapido
+        self._bosque = None  # bosque compilado bajo demanda con el motor sklearn
+        self._incremental = None
+        self._local = threading.local()
+
+    def _buffer_fila(self):
+        """Array (1, n_features) preasignado y reutilizado por cada hilo."""
+        fila = getattr(self._local, "fila", None)
+        if fila is None:
+            fila = self._local.fila = np.zeros((1, self.n_features), dtype=np.float32)
+        return fila
+
+    def _rellenar(self, fila, registro):
+        for j, nombre in enumerate(self.features):
+            try:
+                fila[j] = registro[nombre]
+            except KeyError:
+                raise KeyError(f"Falta la característica '{nombre}' en los datos de entrada.") from None
+
+    def vectorizar(self, datos):
+        """Convierte la entrada en un array ``float32`` contiguo (n_filas, n_features)."""
+        if isinstance(datos, dict):
+            X = self._buffer_fila()
+            self._rellenar(X[0], datos)
+            return X
+        if isinstance(datos, np.ndarray):
+            X = np.atleast_2d(datos)
+            if X.ndim != 2 or X.shape[1] != self.n_features:
+                raise ValueError(f"Se esperaban {self.n_features} columnas y se recibieron {X.shape[-1]}.")
+            return np.ascontiguousarray(X, dtype=np.float32)
+        if hasattr(datos, "columns"):
+            # DataFrame: se reordena por nombre, sin depender del orden de origen
+            return np.ascontiguousarray(datos[list(self.features)].to_numpy(dtype=np.float32))
+        registros = list(datos)
+        X = np.empty((len(registros), self.n_features), dtype=np.float32)
+        for i, registro in enumerate(registros):
+            self._rellenar(X[i], registro)
+        return X
+
+    def _proba(self, X):
+        if self._compilado is not None and (X.shape[0] <= LIMITE_FILAS_COMPILADO or not self._arboles):
+            return self._compilado.predict_proba(X)
+        proba = np.zeros((X.shape[0], self.n_classes), dtype=np.float64)
+        for arbol in self._arboles:
+            proba += arbol.predict(X)[:, : self.n_classes]
+        proba /= len(self._arboles)
+        return proba
+
+    def predict_proba(self, datos):
+        """Probabilidades por clase, promediadas sobre los árboles del bosque."""
+        with medir("vectorizar"):
+            X = self.vectorizar(datos)
+        with medir("predict_proba"):
+            return self._proba(X)
+
+    def proba_fraude(self, datos):
+        """Probabilidad de fraude de cada fila."""
+        return self.predict_proba(datos)[:, self.indice_fraude]
+
+    def predict(self, datos):
+        """Clase predicha para cada fila."""
+        return self.classes_.take(np.argmax(self.predict_proba(datos), axis=1), axis=0)
+
+    def _consultar_cache(self, X):
+        """(clave, probabilidades en caché o None); sin caché, (None, None)."""
+        if self.cache is None:
+            return None, None
+        with medir("cache"):
+            clave = CachePredicciones.clave(X)
+            return clave, self.cache.obtener(self.huella, clave)
+
+    def _guardar_cache(self, clave, proba):
+        proba.setflags(write=False)
+        if clave is not None:
+            self.cache.guardar(self.huella, clave, proba)
+        return proba
+
+    def predict_proba_fila(self, registro):
+        """Probabilidades de un solo registro, consultando la caché si la hay."""
+        with medir("vectorizar"):
+            X = self.vectorizar(registro)
+        clave, proba = self._consultar_cache(X)
+        if proba is None:
+            with medir("predict_proba"):
+                proba = self._guardar_cache(clave, self._proba(X)[0])
+        return proba
+
+    def bosque(self):
+        """``BosqueCompilado`` del modelo; con el motor sklearn se compila la primera vez que se pide."""
+        if self._compilado is not None:
+            return self._compilado
+        if self._bosque is None:
+            self._bosque = BosqueCompilado.desde_modelo(self.modelo)
+        return self._bosque
+
+    def incremental(self):
+        """``PuntuadorIncremental`` sobre el bosque compilado, creado la primera vez que se pide."""
+        if self._incremental is None:
+            self._incremental = PuntuadorIncremental(self.bosque())
+        return self._incremental
+
+    def predict_proba_incremental(self, registro, estado=None):
+        """Probabilidades de un registro recorriendo solo los árboles afectados por los cambios.
+
+        ``estado`` es el ``EstadoIncremental`` devuelto por la llamada anterior de
+        la misma sesión. Devuelve (probabilidades, estado, árboles recorridos).
+        """
+        with medir("vectorizar"):
+            X = self.vectorizar(registro)
+        clave, proba = self._consultar_cache(X)
+        if proba is not None:
+            # El estado anterior sigue siendo coherente (su vector y sus hojas)
+            return proba, estado, 0
+        with medir("incremental"):
+            proba, estado, recorridos = self.incremental().puntuar(X, estado)
+        return self._guardar_cache(clave, proba), estado, recorridos
+
+    def sesgo(self):
+        """Probabilidad de fraude de partida de las explicaciones (media de las raíces)."""
+        return sesgo(self.bosque(), self.indice_fraude)
+
+    def explicar(self, datos):
+        """Contribución de cada característica a la probabilidad de fraude, (n_filas, n_features).
+
+        Para cada fila, ``sesgo() + contribuciones.sum()`` es su ``proba_fraude``.
+        """
+        with medir("vectorizar"):
+            X = self.vectorizar(datos)
+        with medir("explicacion"):
+            return contribuciones(self.bosque(), X, self.indice_fraude)
+
+    def explicar_fila(self, registro):
+        """Contribuciones de un solo registro, consultando la caché de explicaciones si la hay."""
+        with medir("vectorizar"):
+            X = self.vectorizar(registro)
+        clave = None
+        if self.cache_explicaciones is not None:
+            with medir("cache"):
+                clave = CachePredicciones.clave(X)
+                contribucion = self.cache_explicaciones.obtener(self.huella, clave)
+            if contribucion is not None:
+                return contribucion
+        with medir("explicacion"):
+            contribucion = contribuciones(self.bosque(), X, self.indice_fraude)[0]
+        contribucion.setflags(write=False)
+        if clave is not None:
+            self.cache_explicaciones.guardar(self.huella, clave, contribucion)
+        return contribucion
+
+    def decisor(self, umbral=0.5):
+        """``DecisorRapido`` para el umbral indicado, creado la primera vez que se pide."""
+        decisor = self._decisores.get(umbral)
+        if decisor is None:
+            decisor = self._decisores[umbral] = DecisorRapido(self.modelo, umbral)
+        return decisor
+
+    def predict_rapido(self, datos, umbral=0.5):
+        """Clase de cada fila con salida temprana: (etiquetas, árboles evaluados por fila).
+
+        Con ``umbral=0.5`` las etiquetas coinciden con ``predict``; con otro
+        umbral, con ``proba_fraude(datos) > umbral``.
+        """
+        with medir("vectorizar"):
+            X = self.vectorizar(datos)
+        with medir("decision_rapida"):
+            return self.decisor(umbral).predecir(X)
+
+
+# Cachés de predicciones y de explicaciones compartidas por todas las sesiones del proceso
+CACHE_PREDICCIONES = CachePredicciones()
+CACHE_EXPLICACIONES = CachePredicciones()
+
+
+def obtener_scorer(ruta=RUTA_MODELO, motor=MOTOR_PUNTUACION):
+    """Scorer de la versión del modelo en servicio (ver ``fraude.registro``).
+
+    Espera a la primera carga; si no hay ninguna versión válida, relanza el error de carga.
+    """
+    # Import diferido: fraude.registro importa este módulo
+    from fraude.registro import obtener_registro
+
+    registro = obtener_registro(ruta, motor)
+    if registro.actual() is None and registro.listo() and registro.error is not None:
+        registro.reintentar()
+    registro.esperar()
+    return registro.scorer()
@@ -0,0 +1,180 @@
+"""Decisión rápida con votación de salida temprana.
+
+``app.py`` y ``src/app2.py`` solo usan la etiqueta (fraude / no fraude), pero
+``predict`` evalúa siempre todos los árboles. ``DecisorRapido`` recorre los
+árboles de uno en uno (``tree_.apply``, en C) y acota la probabilidad final
+con el mínimo y el máximo valor de hoja de los árboles que faltan. En cuanto
+la cota inferior supera el umbral (o la superior queda por debajo) la
+decisión ya no puede cambiar y la fila deja de evaluarse.
+
+Los árboles se ordenan de mayor a menor rango de valores de hoja, que son
+los que más estrechan la cota, y no se comprueba nada antes del primer
+árbol en el que una decisión es posible. Las filas que llegan al final se
+resuelven con la suma exacta en el orden de sklearn, así que la etiqueta
+coincide siempre con la de ``model.predict`` (umbral 0.5).
+
+Con una sola fila el coste fijo de cada llamada a NumPy o a ``apply`` pesa
+más que el recorrido, así que los árboles se recorren en Python puro sobre
+listas, con la misma comparación que sklearn (``float32`` contra umbral
+``float64``, ``missing_go_to_left`` para los NaN).
+
+``modelo`` puede ser también un ``BosqueCompilado`` (bosque compartido
+entre procesos): sus ``arboles()`` tienen la misma interfaz que ``tree_``.
+
+Con árboles profundos cada árbol puede votar casi 0 o casi 1, así que la
+salida temprana ocurre como pronto hacia la mitad del bosque: el ahorro es
+de hasta ~50 % de los árboles en las filas claras y nulo en las dudosas.
+"""
+import numpy as np
+
+from fraude.motor import BosqueCompilado
+
+# Margen de seguridad frente a errores de redondeo al comparar cotas con el umbral
+MARGEN = 1e-9
+
+# Árboles evaluados entre dos comprobaciones de las cotas
+ARBOLES_POR_CONTROL = 4
+
+
+class DecisorRapido:
+    """Etiqueta filas evaluando solo los árboles necesarios para fijar la decisión."""
+
+    def __init__(self, modelo, umbral=0.5, orden=None, arboles_por_control=ARBOLES_POR_CONTROL):
+        self.classes_ = modelo.classes_
+        if len(self.classes_) != 2:
+            raise ValueError("La decisión rápida solo admite clasificación binaria.")
+        self.umbral = float(umbral)
+        self.arboles_por_control = arboles_por_control
+        positivas = np.flatnonzero(self.classes_ == 1)
+        self.indice_fraude = int(positivas[0]) if len(positivas) else 1
+        if isinstance(modelo, BosqueCompilado):
+            self._arboles = modelo.arboles()
+        else:
+            self._arboles = [estimador.tree_ for estimador in modelo.estimators_]
+        self.n_arboles = len(self._arboles)
+
+        # Valores de todos los nodos concatenados; ``_desplazamientos[t]`` es el primero del árbol t
+        valores = [arbol.value[:, 0, :2] for arbol in self._arboles]
+        self._valor = np.concatenate(valores).astype(np.float64)
+        tamanos = np.array([len(v) for v in valores], dtype=np.intp)
+        self._desplazamientos = np.concatenate(([0], np.cumsum(tamanos)[:-1])).astype(np.intp)
+        self._p = [np.ascontiguousarray(v[:, self.indice_fraude], dtype=np.float64) for v in valores]
+
+        # El valor de un nodo interno es una media de sus hojas, así que el
+        # mínimo/máximo sobre todos los nodos del árbol es el de sus hojas
+        self.minimos = np.array([p.min() for p in self._p])
+        self.maximos = np.array([p.max() for p in self._p])
+        self.orden = np.asarray(orden if orden is not None else
+                                np.argsort(-(self.maximos - self.minimos), kind="stable"))
+
+        # Suma del mínimo/máximo de los árboles que quedan tras evaluar los ``i`` primeros
+        minimos, maximos = self.minimos[self.orden], self.maximos[self.orden]
+        self._resto_min = np.concatenate((np.cumsum(minimos[::-1])[::-1], [0.0]))
+        self._resto_max = np.concatenate((np.cumsum(maximos[::-1])[::-1], [0.0]))
+        # Primer número de árboles con el que alguna fila podría quedar decidida
+        total = self.n_arboles
+        hechos_min = np.concatenate(([0.0], np.cumsum(minimos)))
+        hechos_max = np.concatenate(([0.0], np.cumsum(maximos)))
+        posible = ((hechos_min + self._resto_max) / total < self.umbral - MARGEN) | \
+                  ((hechos_max + self._resto_min) / total > self.umbral + MARGEN)
+        posibles = np.flatnonzero(posible[1:total]) + 1
+        self.primer_control = int(posibles[0]) if len(posibles) else total
+
+        # (feature, umbral, izquierdo, derecho, falta_izquierda, p) de cada árbol para el recorrido escalar
+        self._listas = [
+            (a.feature.tolist(), a.threshold.tolist(), a.children_left.tolist(), a.children_right.tolist(),
+             getattr(a, "missing_go_to_left", np.zeros(a.node_count, dtype=np.uint8)).astype(bool).tolist(),
+             p.tolist())
+            for a, p in zip(self._arboles, self._p)
+        ]
+
+    def _predecir_fila(self, x):
+        """Versión escalar de ``predecir`` para una fila: (es fraude, árboles evaluados)."""
+        listas = self._listas
+        total = self.n_arboles
+        cota_fraude = (self.umbral + MARGEN) * total
+        cota_no = (self.umbral - MARGEN) * total
+        resto_min, resto_max = self._resto_min, self._resto_max
+        hojas = [0] * total
+        suma = 0.0
+        for pos, t in enumerate(self.orden.tolist(), 1):
+            feature, umbral, izquierdo, derecho, falta_izquierda, p = listas[t]
+            nodo = 0
+            while izquierdo[nodo] != -1:
+                v = x[feature[nodo]]
+                if v != v:
+                    nodo = izquierdo[nodo] if falta_izquierda[nodo] else derecho[nodo]
+                elif v <= umbral[nodo]:
+                    nodo = izquierdo[nodo]
+                else:
+                    nodo = derecho[nodo]
+            hojas[t] = nodo
+            suma += p[nodo]
+            if pos >= self.primer_control and pos < total:
+                if suma + resto_min[pos] > cota_fraude:
+                    return True, pos
+                if suma + resto_max[pos] < cota_no:
+                    return False, pos
+        proba = self._exacta(np.array([hojas], dtype=np.intp))[0]
+        if self.umbral == 0.5:
+            return int(np.argmax(proba)) == self.indice_fraude, total
+        return proba[self.indice_fraude] > self.umbral, total
+
+    def _exacta(self, hojas):
+        """Probabilidades sumando los árboles en su orden original, como ``predict_proba``."""
+        proba = np.add.reduce(self._valor[(hojas + self._desplazamientos).T], axis=0)
+        proba /= self.n_arboles
+        return proba
+
+    def predecir(self, X):
+        """Devuelve (etiquetas, árboles evaluados por fila).
+
+        ``X`` debe ser ``float32`` con las columnas en el orden del modelo.
+        """
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.shape[0] == 1:
+            fraude, evaluados = self._predecir_fila(X[0].tolist())
+            clase = self.classes_[self.indice_fraude if fraude else 1 - self.indice_fraude]
+            return np.array([clase], dtype=self.classes_.dtype), np.array([evaluados], dtype=np.int32)
+        n, total = X.shape[0], self.n_arboles
+        hojas = np.zeros((n, total), dtype=np.intp)
+        suma = np.zeros(n, dtype=np.float64)
+        evaluados = np.zeros(n, dtype=np.int32)
+        fraude = np.zeros(n, dtype=bool)
+        activos = np.arange(n)
+        X_activos = X
+
+        for pos, t in enumerate(self.orden, 1):
+            h = self._arboles[t].apply(X_activos)
+            if X_activos is X:
+                # Mientras no se ha descartado ninguna fila se evita el indexado por posiciones
+                hojas[:, t] = h
+                suma += self._p[t][h]
+            else:
+                hojas[activos, t] = h
+                suma[activos] += self._p[t][h]
+            if pos == total or pos < self.primer_control or (pos - self.primer_control) % self.arboles_por_control:
+                continue
+            evaluados[activos] = pos
+            inferior = (suma[activos] + self._resto_min[pos]) / total
+            superior = (suma[activos] + self._resto_max[pos]) / total
+            seguro_fraude = inferior > self.umbral + MARGEN
+            decididas = seguro_fraude | (superior < self.umbral - MARGEN)
+            if decididas.any():
+                fraude[activos[seguro_fraude]] = True
+                activos = activos[~decididas]
+                if not activos.size:
+                    break
+                X_activos = X[activos]
+
+        if activos.size:
+            # Filas dudosas: todos los árboles evaluados, suma exacta
+            evaluados[activos] = total
+            proba = self._exacta(hojas[activos])
+            if self.umbral == 0.5:
+                fraude[activos] = np.argmax(proba, axis=1) == self.indice_fraude
+            else:
+                fraude[activos] = proba[:, self.indice_fraude] > self.umbral
+
+        etiquetas = np.where(fraude, self.classes_[self.indice_fraude], self.classes_[1 - self.indice_fraude])
+        return etiquetas, evaluados
@@ -0,0 +1,211 @@
+"""Registro de versiones del modelo con recarga en caliente.
+
+``RegistroModelos`` vigila el artefacto (``RUTA_MODELO``) desde un hilo en
+segundo plano. Cuando cambia su tamaño o su fecha de modificación, carga la
+versión nueva sin bloquear a nadie, la valida y solo entonces la pone en
+servicio:
+
+1. ``cargar_modelo`` comprueba que sea un ``RandomForestClassifier`` (o
+   carga un bosque compilado, p. ej. una variante de ``fraude.compactacion``).
+2. ``feature_names_in_`` debe coincidir con el de la versión en servicio.
+3. Conjunto de referencia (*golden set*): las probabilidades deben ser
+   finitas y sumar 1 y, si el conjunto trae etiquetas esperadas, la
+   predicción debe coincidir. Por defecto son los ``PERFILES`` sin
+   etiquetas; ``RUTA_GOLDEN`` apunta a un JSON ``[{"datos": {...},
+   "etiqueta": 0}, ...]``.
+4. Calentamiento con ``fraude.calentamiento.calentar``.
+
+Cada versión guarda además la probabilidad de todos los perfiles, puntuados
+en un solo lote (``VersionModelo.perfiles``, ver ``fraude.perfiles``).
+
+Con ``MODELO_COMPARTIDO=1`` y el motor compilado se carga el bosque
+compartido entre procesos (``fraude.compartido``) en lugar del modelo de
+sklearn. Cada versión guarda cuánto creció la memoria del proceso al
+cargarla.
+
+El intercambio es la asignación de una sola referencia a un
+``VersionModelo`` inmutable: quien ya tomó la versión anterior con
+``actual()`` termina su predicción con ella, y las siguientes usan la nueva.
+Si la validación falla, la versión en servicio sigue activa y el motivo
+queda en ``historial``.
+"""
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+from fraude.calentamiento import calentar
+from fraude.compartido import MODELO_COMPARTIDO, cargar_compartido, crecimiento, memoria
+from fraude.metricas import medir
+from fraude.modelo import RUTA_MODELO, cargar_modelo, obtener_huella, sello_artefacto
+from fraude.perfiles import PERFILES, PuntuacionPerfiles
+from fraude.puntuacion import CACHE_EXPLICACIONES, CACHE_PREDICCIONES, MOTOR_PUNTUACION, FraudScorer
+
+# Segundos entre dos comprobaciones del artefacto
+INTERVALO_VIGILANCIA = float(os.environ.get("INTERVALO_RECARGA_MODELO", "5"))
+
+# Conjunto de referencia opcional con etiquetas esperadas
+RUTA_GOLDEN = os.environ.get("RUTA_GOLDEN")
+
+# Entradas del historial que se conservan
+MAX_HISTORIAL = 50
+
+
+class VersionModelo:
+    """Versión del modelo en servicio; no cambia una vez creada."""
+
+    __slots__ = ("scorer", "version", "sello", "cargado", "segundos_carga", "memoria", "perfiles")
+
+    def __init__(self, scorer, version, sello, cargado, segundos_carga, memoria=None, perfiles=None):
+        self.scorer = scorer
+        self.version = version
+        self.sello = sello
+        self.cargado = cargado
+        self.segundos_carga = segundos_carga
+        self.memoria = memoria  # crecimiento de la memoria del proceso al cargarla (MB), si se pudo medir
+        self.perfiles = perfiles  # ``PuntuacionPerfiles`` con esta versión
+
+    @property
+    def corta(self):
+        """Versión abreviada (12 caracteres del SHA-256) para mostrar."""
+        return (self.version or "")[:12]
+
+
+def cargar_golden(ruta=None):
+    """Lista de (registro, etiqueta esperada o None) del conjunto de referencia."""
+    ruta = ruta or RUTA_GOLDEN
+    if not ruta:
+        return [(perfil["datos"], None) for perfil in PERFILES.values()]
+    with open(ruta, encoding="utf-8") as f:
+        return [(caso["datos"], caso.get("etiqueta")) for caso in json.load(f)]
+
+
+def comprobar_golden(scorer, golden):
+    """Lanza ``ValueError`` si el modelo no supera el conjunto de referencia."""
+    if not golden:
+        return
+    proba = scorer.predict_proba([registro for registro, _ in golden])
+    if not np.all(np.isfinite(proba)) or np.any(np.abs(proba.sum(axis=1) - 1.0) > 1e-6):
+        raise ValueError("El modelo devuelve probabilidades no válidas en el conjunto de referencia.")
+    predichas = scorer.classes_.take(np.argmax(proba, axis=1))
+    fallos = [i for i, (_, esperada) in enumerate(golden) if esperada is not None and predichas[i] != esperada]
+    if fallos:
+        raise ValueError(f"El modelo falla {len(fallos)} de {len(golden)} casos del conjunto de referencia.")
+
+
+class RegistroModelos:
+    """Versión en servicio de un artefacto y vigilancia de sus cambios."""
+
+    def __init__(self, ruta=RUTA_MODELO, motor=MOTOR_PUNTUACION, intervalo=INTERVALO_VIGILANCIA, golden=None,
+                 compartido=MODELO_COMPARTIDO):
+        self.ruta = ruta
+        self.motor = motor
+        self.compartido = compartido and motor == "compilado"
+        self.intervalo = intervalo
+        self.golden = cargar_golden() if golden is None else golden
+        self.error = None  # error del último intento de carga
+        self.historial = []
+        self._version = None
+        self._sello_intentado = None
+        self._forzar = False
+        self._intento = threading.Event()  # se activa al terminar cada intento de carga
+        self._despertar = threading.Event()
+        self._hilo = threading.Thread(target=self._vigilar, name="registro-modelo", daemon=True)
+        self._hilo.start()
+
+    def actual(self):
+        """``VersionModelo`` en servicio, o None si todavía no hay ninguna."""
+        return self._version
+
+    def listo(self):
+        """Indica si terminó el último intento de carga (con éxito o con error)."""
+        return self._intento.is_set()
+
+    def esperar(self, timeout=None):
+        """Espera a que termine el intento de carga en curso; devuelve ``listo()``."""
+        return self._intento.wait(timeout)
+
+    def scorer(self):
+        """Scorer de la versión en servicio; relanza el error de carga si no hay ninguna."""
+        version = self._version
+        if version is not None:
+            return version.scorer
+        if self.error is not None:
+            raise self.error
+        raise RuntimeError("El modelo sigue cargándose.")
+
+    def reintentar(self):
+        """Vuelve a comprobar el artefacto ya, aunque la última versión se haya rechazado."""
+        self._forzar = True
+        self._intento.clear()
+        self._despertar.set()
+
+    def _vigilar(self):
+        while True:
+            self._revisar()
+            self._despertar.wait(self.intervalo)
+            self._despertar.clear()
+
+    def _anotar(self, estado, version, mensaje=""):
+        self.historial.append({"fecha": datetime.now().isoformat(timespec="seconds"), "estado": estado,
+                               "version": (version or "")[:12], "mensaje": mensaje})
+        del self.historial[:-MAX_HISTORIAL]
+
+    def _revisar(self):
+        forzar, self._forzar = self._forzar, False
+        try:
+            sello = sello_artefacto(self.ruta) if os.path.exists(self.ruta) else None
+            actual = self._version
+            if actual is not None and sello == actual.sello:
+                return
+            if sello is not None and sello == self._sello_intentado and not forzar:
+                return  # esta versión ya se rechazó
+            self._sello_intentado = sello
+            if sello is None:
+                raise FileNotFoundError(f"El archivo {self.ruta} no existe. Verifica que está en la carpeta correcta.")
+            version = self._cargar(sello)
+            if sello_artefacto(self.ruta) != sello:
+                # El artefacto cambió durante la carga (copia a medias): se reintenta en la siguiente vuelta
+                self._sello_intentado = None
+                return
+            self._version = version  # intercambio atómico
+            self.error = None
+            self._anotar("activa", version.version, f"cargada en {version.segundos_carga:.1f} s")
+        except Exception as e:
+            self.error = e
+            self._anotar("rechazada", None, str(e))
+        finally:
+            self._intento.set()
+
+    def _cargar(self, sello):
+        inicio = time.perf_counter()
+        antes = memoria()
+        with medir("carga_modelo"):
+            modelo = cargar_compartido(self.ruta) if self.compartido else cargar_modelo(self.ruta)
+        huella = obtener_huella(self.ruta)
+        scorer = FraudScorer(modelo, self.motor, cache=CACHE_PREDICCIONES, huella=huella,
+                             cache_explicaciones=CACHE_EXPLICACIONES)
+        anterior = self._version
+        if anterior is not None and scorer.features != anterior.scorer.features:
+            raise ValueError("Las características del modelo nuevo no coinciden con las del modelo en servicio.")
+        comprobar_golden(scorer, self.golden)
+        perfiles = PuntuacionPerfiles(scorer)
+        calentar(scorer)
+        return VersionModelo(scorer, huella, sello, datetime.now().isoformat(timespec="seconds"),
+                             time.perf_counter() - inicio, crecimiento(antes, memoria()), perfiles)
+
+
+_lock = threading.Lock()
+_registros = {}  # (ruta, motor) -> RegistroModelos
+
+
+def obtener_registro(ruta=RUTA_MODELO, motor=MOTOR_PUNTUACION):
+    """Registro compartido por todo el proceso para un artefacto y un motor."""
+    with _lock:
+        registro = _registros.get((ruta, motor))
+        if registro is None:
+            registro = _registros[(ruta, motor)] = RegistroModelos(ruta, motor)
+        return registro
@@ -0,0 +1,243 @@
+"""Servicio HTTP local de puntuación con micro-lotes dinámicos.
+
+Expone el mismo modelo y el mismo esquema de características que la interfaz
+de Streamlit como un endpoint JSON::
+
+    python -m fraude.servicio --puerto 8080 --max-lote 64 --espera-ms 2
+
+    POST /predict   {"income": 0.3, ...}  o  [{...}, {...}]
+    GET  /salud
+    GET  /metricas  (formato de texto de Prometheus; ver ``fraude.metricas``)
+
+Las peticiones concurrentes se agrupan en micro-lotes (hasta ``max_lote``
+filas o ``espera_ms`` milisegundos de espera) y cada lote se puntúa con una
+sola llamada a ``predict_proba``, lo que reparte el coste fijo del bosque
+entre todas las peticiones del lote.
+
+Cada lote se anota de una vez en el historial de auditoría del proceso
+(``fraude.auditoria``), con la latencia de cada petición desde que entró en
+la cola; ``--sin-auditoria`` lo desactiva. También se suma al monitor de
+deriva (``fraude.deriva``) si hay referencia y, con ``RUTA_RETADOR``, se
+puntúa en sombra con el modelo retador (``fraude.sombra``).
+"""
+import argparse
+import json
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from fraude import metricas
+from fraude.auditoria import obtener_auditoria
+from fraude.deriva import observar
+from fraude.lotes import COLUMNA_ETIQUETA, COLUMNA_PROBABILIDAD
+from fraude.modelo import RUTA_MODELO
+from fraude.puntuacion import obtener_scorer
+from fraude.sombra import sombrear
+
+log = logging.getLogger(__name__)
+
+MAX_LOTE = 64
+ESPERA_MS = 2.0
+UMBRAL = 0.5
+
+# Conexiones pendientes de aceptar; con el valor por defecto (5) una ráfaga de clientes recibe ECONNRESET.
+# El núcleo lo limita además a net.core.somaxconn
+COLA_CONEXIONES = 1024
+
+
+class MicroLotes:
+    """Agrupa peticiones concurrentes y las puntúa con una llamada por lote."""
+
+    def __init__(self, obtener=None, max_lote=MAX_LOTE, espera_ms=ESPERA_MS, auditoria=True):
+        # ``obtener`` devuelve el scorer actual; así un modelo nuevo entra en el siguiente lote
+        self.obtener = obtener or (lambda: obtener_scorer(RUTA_MODELO))
+        self.auditoria = obtener_auditoria() if auditoria else None
+        self.max_lote = max_lote
+        self.espera = espera_ms / 1000.0
+        self._cola = queue.Queue()
+        self._lock = threading.Lock()
+        self.lotes = 0
+        self.filas = 0
+        self.errores = 0  # fallos de la auditoría, la deriva o la sombra; no afectan a la respuesta
+        self._hilo = threading.Thread(target=self._bucle, name="micro-lotes", daemon=True)
+        self._hilo.start()
+
+    def enviar(self, X):
+        """Encola un array ya vectorizado y devuelve un ``Future`` con sus probabilidades."""
+        futuro = Future()
+        self._cola.put((X, futuro, time.perf_counter()))
+        return futuro
+
+    def _recoger(self):
+        pendientes = [self._cola.get()]
+        filas = len(pendientes[0][0])
+        limite = time.monotonic() + self.espera
+        while filas < self.max_lote:
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                break
+            try:
+                pendiente = self._cola.get(timeout=restante)
+            except queue.Empty:
+                break
+            pendientes.append(pendiente)
+            filas += len(pendiente[0])
+        return pendientes
+
+    def _bucle(self):
+        while True:
+            pendientes = self._recoger()
+            try:
+                X_lote = np.concatenate([X for X, _, _ in pendientes])
+                scorer = self.obtener()
+                proba = scorer.proba_fraude(X_lote)
+            except Exception as e:
+                for _, futuro, _ in pendientes:
+                    futuro.set_exception(e)
+                continue
+            inicio = 0
+            for X, futuro, _ in pendientes:
+                futuro.set_result(proba[inicio:inicio + len(X)])
+                inicio += len(X)
+            with self._lock:
+                self.lotes += 1
+                self.filas += len(proba)
+            try:
+                self._anotar(scorer, pendientes, X_lote, proba)
+            except Exception:
+                # Las respuestas ya se enviaron: un fallo aquí no debe parar el hilo de los lotes
+                log.exception("Error al anotar un micro-lote")
+                with self._lock:
+                    self.errores += 1
+
+    def _anotar(self, scorer, pendientes, X_lote, proba):
+        observar(scorer.features, X_lote)
+        fin = time.perf_counter()
+        latencias = np.repeat([(fin - llegada) * 1000.0 for _, _, llegada in pendientes],
+                              [len(X) for X, _, _ in pendientes])
+        etiquetas = (proba > UMBRAL).astype(np.int8)
+        if self.auditoria is not None:
+            self.auditoria.anotar(scorer.features, X_lote, etiquetas, scorer.huella or "", "servicio", latencias,
+                                  proba)
+        sombrear(scorer.features, X_lote, proba, etiquetas, latencias, "servicio")
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                "lotes": self.lotes,
+                "filas": self.filas,
+                "filas_por_lote": self.filas / self.lotes if self.lotes else 0.0,
+                "errores_anotacion": self.errores,
+                "en_cola": self._cola.qsize(),
+            }
+
+
+class ManejadorPrediccion(BaseHTTPRequestHandler):
+    """Manejador HTTP; ``server.micro_lotes`` hace la puntuación."""
+
+    protocol_version = "HTTP/1.1"
+
+    def _responder(self, estado, cuerpo):
+        datos = json.dumps(cuerpo).encode("utf-8")
+        self.send_response(estado)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(datos)))
+        self.end_headers()
+        self.wfile.write(datos)
+
+    def do_GET(self):
+        if self.path == "/metricas":
+            datos = metricas.exportar_texto().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(datos)))
+            self.end_headers()
+            self.wfile.write(datos)
+            return
+        if self.path != "/salud":
+            self._responder(404, {"error": "Ruta no encontrada"})
+            return
+        scorer = self.server.micro_lotes.obtener()
+        self._responder(200, {"estado": "ok", "modelo": scorer.huella, "features": list(scorer.features),
+                              **self.server.micro_lotes.estadisticas()})
+
+    def do_POST(self):
+        if self.path != "/predict":
+            self._responder(404, {"error": "Ruta no encontrada"})
+            return
+        try:
+            longitud = int(self.headers.get("Content-Length", 0))
+            datos = json.loads(self.rfile.read(longitud))
+            registros = [datos] if isinstance(datos, dict) else datos
+            scorer = self.server.micro_lotes.obtener()
+            # Se copia: vectorizar() reutiliza un buffer por hilo para registros sueltos
+            X = np.array(scorer.vectorizar(registros), dtype=np.float32)
+        except (ValueError, KeyError, TypeError) as e:
+            self._responder(400, {"error": str(e.args[0]) if e.args else str(e)})
+            return
+        try:
+            proba = self.server.micro_lotes.enviar(X).result()
+        except Exception as e:
+            self._responder(500, {"error": f"Error en la predicción: {str(e)}"})
+            return
+        predicciones = [{COLUMNA_PROBABILIDAD: float(p), COLUMNA_ETIQUETA: int(p > UMBRAL)} for p in proba]
+        self._responder(200, {"modelo": scorer.huella,
+                              "predicciones": predicciones[0] if isinstance(datos, dict) else predicciones})
+
+    def log_message(self, formato, *args):
+        # Sin registro por petición: a miles de peticiones por segundo domina la escritura en stderr
+        pass
+
+
+class ServidorPrediccion(ThreadingHTTPServer):
+    """``ThreadingHTTPServer`` con una cola de conexiones a la medida de ráfagas concurrentes."""
+
+    daemon_threads = True
+
+    def __init__(self, direccion, manejador, cola=COLA_CONEXIONES):
+        # ``listen`` lee el valor en ``server_activate``, dentro del constructor base
+        self.request_queue_size = cola
+        super().__init__(direccion, manejador)
+
+
+def crear_servidor(host="127.0.0.1", puerto=8080, max_lote=MAX_LOTE, espera_ms=ESPERA_MS, obtener=None,
+                   auditoria=True, cola=COLA_CONEXIONES):
+    """Crea el servidor HTTP (sin arrancarlo)."""
+    servidor = ServidorPrediccion((host, puerto), ManejadorPrediccion, cola=cola)
+    servidor.micro_lotes = MicroLotes(obtener, max_lote=max_lote, espera_ms=espera_ms, auditoria=auditoria)
+    return servidor
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servicio HTTP de predicción de fraude con micro-lotes.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=8080)
+    parser.add_argument("--modelo", default=RUTA_MODELO, help="Ruta del artefacto del modelo")
+    parser.add_argument("--max-lote", type=int, default=MAX_LOTE, help="Filas máximas por micro-lote")
+    parser.add_argument("--espera-ms", type=float, default=ESPERA_MS, help="Espera máxima para completar un lote")
+    parser.add_argument("--sin-auditoria", action="store_true", help="No anotar las predicciones en el historial")
+    parser.add_argument("--cola-conexiones", type=int, default=COLA_CONEXIONES,
+                        help="Conexiones pendientes de aceptar antes de rechazar clientes")
+    args = parser.parse_args(argv)
+
+    # Cargar el modelo antes de aceptar peticiones
+    obtener_scorer(args.modelo)
+    servidor = crear_servidor(args.host, args.puerto, args.max_lote, args.espera_ms,
+                              obtener=lambda: obtener_scorer(args.modelo), auditoria=not args.sin_auditoria,
+                              cola=args.cola_conexiones)
+    print(f"Servicio de predicción escuchando en http://{args.host}:{args.puerto}")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+
+
+if __name__ == "__main__":
+    main()
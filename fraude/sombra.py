@@ -0,0 +1,244 @@
+"""Puntuación en sombra de un modelo retador.
+
+Con ``RUTA_RETADOR`` apuntando a un segundo artefacto (un ``.pkl.gz`` o
+``.joblib`` con cualquier clasificador con ``predict_proba`` y
+``feature_names_in_``, o un ``.json``/``.ubj`` de XGBoost si ``xgboost``
+está instalado), cada transacción puntuada por el modelo en servicio (el
+campeón) se puntúa también con el retador, fuera del camino de la petición:
+
+* El retador se carga en un hilo en segundo plano, como los modelos de
+  ``fraude.registro``: ninguna petición espera a su carga. Hasta que está
+  listo, sus comparaciones se omiten; si la carga falla, se reintenta cada
+  ``REINTENTO_SOMBRA`` segundos.
+* La petición solo copia la fila y la deja en una cola acotada
+  (``put_nowait``); si la cola está llena (o el retador no está listo) la
+  comparación se omite y se cuenta en ``omitidas``, nunca se espera.
+* Un pequeño pool de hilos (``HILOS_SOMBRA``) vacía la cola, puntúa con el
+  retador y mide su latencia.
+* Cada comparación se anota en un registro propio con el mismo formato que
+  la auditoría (``fraude.auditoria``, prefijo ``sombra``): entradas,
+  probabilidad, etiqueta y latencia del retador, y las del campeón en
+  columnas adicionales. Los contadores de desacuerdos y los percentiles de
+  latencia de ambos modelos están en ``estadisticas()``.
+
+``benchmarks/bench_sombra.py`` mide el p99 de la predicción principal de
+``app.py`` y ``src/app1.py`` con y sin sombra.
+"""
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+from fraude.auditoria import CAPACIDAD, INTERVALO_VOLCADO, Auditoria
+from fraude.metricas import Histograma
+from fraude.modelo import cargar_modelo_comprimido, huella_artefacto
+from fraude.motor import BosqueCompilado
+
+# Artefacto del modelo retador; sin él no hay puntuación en sombra
+RUTA_RETADOR = os.environ.get("RUTA_RETADOR")
+
+# Hilos del pool de sombra y comparaciones que pueden esperar en la cola
+HILOS_SOMBRA = int(os.environ.get("HILOS_SOMBRA", "1"))
+COLA_SOMBRA = 1024
+
+# Carpeta del registro de comparaciones
+DIR_SOMBRA = os.environ.get("DIR_SOMBRA", "sombra")
+
+# Segundos antes de reintentar una carga fallida del retador
+REINTENTO_SOMBRA = float(os.environ.get("REINTENTO_SOMBRA", "60"))
+
+UMBRAL = 0.5
+
+COLUMNAS_CAMPEON = ("proba_campeon", "etiqueta_campeon", "latencia_campeon_ms")
+
+
+def cargar_retador(ruta):
+    """Carga el modelo retador y devuelve (modelo, características en el orden que espera)."""
+    if not os.path.exists(ruta):
+        raise FileNotFoundError(f"El archivo {ruta} no existe. Verifica que está en la carpeta correcta.")
+    if ruta.endswith((".json", ".ubj")):
+        import xgboost
+
+        modelo = xgboost.XGBClassifier()
+        modelo.load_model(ruta)
+        features = modelo.get_booster().feature_names
+    elif ruta.endswith(".gz"):
+        modelo = cargar_modelo_comprimido(ruta)
+        features = getattr(modelo, "feature_names_in_", None)
+    else:
+        import joblib
+
+        modelo = joblib.load(ruta)
+        features = getattr(modelo, "feature_names_in_", None)
+    if not hasattr(modelo, "predict_proba") or features is None:
+        raise ValueError("El retador debe tener predict_proba y los nombres de sus características.")
+    return modelo, tuple(str(f) for f in features)
+
+
+class RetadorSombra:
+    """Puntúa en segundo plano con un modelo retador y lo compara con el campeón."""
+
+    def __init__(self, ruta, hilos=HILOS_SOMBRA, cola=COLA_SOMBRA, directorio=DIR_SOMBRA, umbral=UMBRAL):
+        self.ruta = ruta
+        self.umbral = umbral
+        self.hilos = hilos
+        self.modelo = None
+        self.features = None
+        self.version = None
+        self.indice_fraude = None
+        self.error_carga = None  # error del último intento de carga
+        self.registro = Auditoria(directorio, CAPACIDAD, INTERVALO_VOLCADO, prefijo="sombra", extras=COLUMNAS_CAMPEON)
+        self.latencia_campeon = Histograma()
+        self.latencia_retador = Histograma()
+        self.comparadas = 0
+        self.desacuerdos = 0
+        self.omitidas = 0
+        self.errores = 0
+        self.error = None
+        self._columnas = {}  # tupla de features del campeón -> índices en el orden del retador
+        self._lock = threading.Lock()
+        self._cola = queue.Queue(cola)
+        self._cargado = threading.Event()  # el modelo está listo y los hilos de sombra en marcha
+        self._intento = threading.Event()  # se activa al terminar cada intento de carga
+        self._fin_intento = None
+        self.reintentar()
+
+    def cargado(self):
+        """Indica si el retador ya está cargado y puntuando."""
+        return self._cargado.is_set()
+
+    def reintentar(self):
+        """Lanza la carga del retador en segundo plano."""
+        self._intento.clear()
+        threading.Thread(target=self._cargar, name="sombra-carga", daemon=True).start()
+
+    def debe_reintentar(self):
+        """Indica si la última carga falló hace más de ``REINTENTO_SOMBRA`` segundos."""
+        return (self._intento.is_set() and not self._cargado.is_set()
+                and time.monotonic() - self._fin_intento >= REINTENTO_SOMBRA)
+
+    def _cargar(self):
+        try:
+            modelo, features = cargar_retador(self.ruta)
+            version = huella_artefacto(self.ruta)
+            from sklearn.ensemble import RandomForestClassifier
+
+            if isinstance(modelo, RandomForestClassifier):
+                # Otro bosque: se puntúa con el motor compilado, como el campeón
+                modelo = BosqueCompilado.desde_modelo(modelo)
+            positivas = np.flatnonzero(np.asarray(modelo.classes_) == 1)
+            self.indice_fraude = int(positivas[0]) if len(positivas) else len(modelo.classes_) - 1
+            self.modelo, self.features, self.version = modelo, features, version
+            self.error_carga = None
+            for i in range(self.hilos):
+                threading.Thread(target=self._trabajar, name=f"sombra-{i}", daemon=True).start()
+            self._cargado.set()
+        except Exception as e:
+            self.error_carga = e
+        finally:
+            self._fin_intento = time.monotonic()
+            self._intento.set()
+
+    def enviar(self, features, X, proba, etiquetas, latencia_ms, origen):
+        """Encola filas ya puntuadas por el campeón; no bloquea nunca."""
+        if not self._cargado.is_set():
+            with self._lock:
+                self.omitidas += 1
+            return
+        try:
+            # Copia: ``X`` puede ser el buffer por hilo de ``FraudScorer.vectorizar``
+            self._cola.put_nowait((tuple(features), np.array(X, dtype=np.float32, ndmin=2), proba, etiquetas,
+                                   latencia_ms, origen))
+        except queue.Full:
+            with self._lock:
+                self.omitidas += 1
+
+    def _alinear(self, features, X):
+        columnas = self._columnas.get(features)
+        if columnas is None:
+            faltantes = [f for f in self.features if f not in features]
+            if faltantes:
+                raise ValueError(f"El retador usa características que el campeón no recibe: {', '.join(faltantes)}")
+            columnas = self._columnas[features] = np.array([features.index(f) for f in self.features])
+        return X[:, columnas]
+
+    def _trabajar(self):
+        while True:
+            features, X, proba, etiquetas, latencia_ms, origen = self._cola.get()
+            try:
+                self._comparar(features, X, proba, etiquetas, latencia_ms, origen)
+            except Exception as e:
+                with self._lock:
+                    self.errores += 1
+                    self.error = e
+            finally:
+                self._cola.task_done()
+
+    def _comparar(self, features, X, proba, etiquetas, latencia_ms, origen):
+        inicio = time.perf_counter()
+        proba_retador = self.modelo.predict_proba(self._alinear(features, X))[:, self.indice_fraude]
+        segundos = time.perf_counter() - inicio
+        etiquetas = np.atleast_1d(np.asarray(etiquetas)).astype(np.int8)
+        etiquetas_retador = (proba_retador > self.umbral).astype(np.int8)
+        self.registro.anotar(self.features, X[:, self._columnas[features]], etiquetas_retador, self.version,
+                             origen, segundos * 1000.0, proba_retador,
+                             {"proba_campeon": np.nan if proba is None else proba,
+                              "etiqueta_campeon": etiquetas, "latencia_campeon_ms": latencia_ms})
+        # Una muestra por petición: en los micro-lotes las filas de una petición repiten su latencia
+        for latencia in np.unique(np.atleast_1d(latencia_ms)):
+            self.latencia_campeon.registrar(float(latencia) / 1000.0)
+        self.latencia_retador.registrar(segundos)
+        with self._lock:
+            self.comparadas += len(X)
+            self.desacuerdos += int((etiquetas_retador != etiquetas).sum())
+
+    def esperar(self, timeout=None):
+        """Espera a que termine la carga y a que el retador haya puntuado todo lo encolado."""
+        if self._intento.wait(timeout) and self._cargado.is_set():
+            self._cola.join()
+
+    def estadisticas(self):
+        with self._lock:
+            resumen = {"cargado": self.cargado(), "comparadas": self.comparadas, "desacuerdos": self.desacuerdos,
+                       "omitidas": self.omitidas, "errores": self.errores, "en_cola": self._cola.qsize()}
+        resumen["tasa_desacuerdo"] = resumen["desacuerdos"] / resumen["comparadas"] if resumen["comparadas"] else 0.0
+        for nombre, histograma in (("campeon", self.latencia_campeon), ("retador", self.latencia_retador)):
+            for p, v in histograma.percentiles().items():
+                resumen[f"p{p}_{nombre}_ms"] = v * 1000.0
+        return resumen
+
+
+_lock = threading.Lock()
+_retadores = {}  # ruta -> RetadorSombra
+
+
+def obtener_retador(ruta=RUTA_RETADOR):
+    """Retador compartido por todo el proceso (quizá aún cargándose), o None si no hay ninguno configurado.
+
+    No espera a la carga: la primera llamada solo la lanza en segundo plano.
+    Una carga fallida se reintenta pasados ``REINTENTO_SOMBRA`` segundos.
+    """
+    if not ruta:
+        return None
+    with _lock:
+        retador = _retadores.get(ruta)
+        if retador is None:
+            retador = _retadores[ruta] = RetadorSombra(ruta)
+        elif retador.debe_reintentar():
+            retador.reintentar()
+    return retador
+
+
+def error_retador(ruta=RUTA_RETADOR):
+    """Error del último intento de carga del retador, o None."""
+    retador = _retadores.get(ruta)
+    return None if retador is None else retador.error_carga
+
+
+def sombrear(features, X, proba, etiquetas, latencia_ms, origen):
+    """Envía filas puntuadas por el campeón al retador del proceso, si lo hay."""
+    retador = obtener_retador(RUTA_RETADOR)
+    if retador is not None:
+        retador.enviar(features, X, proba, etiquetas, latencia_ms, origen)
@@ -0,0 +1,122 @@
+import os
+import sys
+import tempfile
+import time
+import uuid
+from contextlib import nullcontext
+
+import streamlit as st
+
+# Permitir importar el paquete compartido desde la raíz del proyecto
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fraude.lotes import TAMANO_BLOQUE, es_parquet, puntuar_archivo
+from fraude.modelo import RUTA_MODELO
+from fraude.paralelo import usar_puntuador
+from fraude.puntuacion import obtener_scorer
+
+# Resultados temporales: uno por sesión, que se sobrescribe en cada puntuación
+DIR_SALIDA = tempfile.gettempdir()
+PREFIJO_SALIDA = "puntuaciones_"
+
+# Los de sesiones que ya no los usan se borran pasado este tiempo
+HORAS_SALIDA = 24
+
+# Por encima de este tamaño no se ofrece la descarga: el navegador recibiría el archivo entero desde la memoria
+LIMITE_DESCARGA = 200 * 1024 * 1024
+
+
+def limpiar_salidas(conservar):
+    limite = time.time() - HORAS_SALIDA * 3600
+    for entrada in os.scandir(DIR_SALIDA):
+        if (entrada.name.startswith(PREFIJO_SALIDA) and entrada.path not in conservar
+                and entrada.stat().st_mtime < limite):
+            try:
+                os.remove(entrada.path)
+            except OSError:
+                pass
+
+
+def leer(ruta):
+    # Descarga diferida: el archivo solo se lee al pulsar el botón
+    def contenido():
+        with open(ruta, "rb") as f:
+            return f.read()
+    return contenido
+
+st.title("📦 Puntuación por Lotes")
+st.markdown("Suba un archivo CSV o Parquet con las columnas del modelo. El archivo se procesa por bloques, "
+            "así que la memoria usada no depende de su tamaño.")
+
+# Cargar el modelo (una sola instancia por proceso)
+try:
+    scorer = obtener_scorer(RUTA_MODELO)
+except Exception as e:
+    st.error(f"Error al cargar el modelo: {str(e)}")
+    st.stop()
+
+archivo = st.file_uploader("Archivo de transacciones", type=["csv", "parquet"])
+col1, col2, col3, col4 = st.columns(4)
+with col1:
+    tamano_bloque = st.number_input("Filas por bloque", min_value=1000, max_value=1000000, value=TAMANO_BLOQUE, step=10000)
+with col2:
+    umbral = st.slider("Umbral de fraude", 0.0, 1.0, 0.5, step=0.01)
+with col3:
+    formato_salida = st.radio("Formato de salida", ["CSV", "Parquet"])
+with col4:
+    procesos = st.number_input("Procesos", min_value=1, max_value=os.cpu_count() or 1, value=1,
+                               help="Con más de un proceso cada bloque se reparte entre un pool de procesos")
+
+if st.button("🚀 Puntuar Archivo"):
+    if archivo is not None:
+        origen, nombre, tamano = archivo, archivo.name, archivo.size
+    else:
+        st.warning("Seleccione un archivo para puntuar.")
+        st.stop()
+
+    extension = ".parquet" if formato_salida == "Parquet" else ".csv"
+    # Un solo archivo temporal por sesión: cada puntuación sustituye a la anterior
+    sesion = st.session_state.setdefault("id_lotes", uuid.uuid4().hex)
+    temporales = {os.path.join(DIR_SALIDA, f"{PREFIJO_SALIDA}{sesion}{e}") for e in (".csv", ".parquet")}
+    destino = os.path.join(DIR_SALIDA, f"{PREFIJO_SALIDA}{sesion}{extension}")
+    # Sin filas no se escribe nada: no debe quedar el resultado de la puntuación anterior
+    for anterior in temporales:
+        if os.path.exists(anterior):
+            os.remove(anterior)
+    limpiar_salidas(temporales)
+    barra = st.progress(0.0, text="Puntuando...")
+
+    def al_progresar(filas, total, segundos):
+        # Sin total conocido (CSV) se estima con la posición de lectura del archivo
+        if total:
+            avance = filas / total
+        elif hasattr(origen, "tell") and tamano:
+            avance = origen.tell() / tamano
+        else:
+            avance = 0.0
+        barra.progress(min(avance, 1.0), text=f"{filas:,} filas · {filas / max(segundos, 1e-9):,.0f} filas/s")
+
+    try:
+        # Pool de procesos compartido por todas las sesiones; al cambiar la versión o los procesos se sustituye
+        # y el anterior se cierra cuando terminan los lotes que lo usan
+        uso = nullcontext(scorer) if procesos == 1 else usar_puntuador(RUTA_MODELO, int(procesos), scorer.huella)
+        with uso as puntuador:
+            resumen = puntuar_archivo(origen, destino, puntuador, nombre=nombre, tamano_bloque=int(tamano_bloque),
+                                      umbral=umbral, al_progresar=al_progresar)
+    except Exception as e:
+        st.error(f"Error en la puntuación: {str(e)}")
+        st.stop()
+
+    barra.progress(1.0, text="Completado")
+    if resumen["filas"] == 0:
+        st.warning("El archivo no contiene filas para puntuar.")
+        st.stop()
+    st.success(f"🔮 **{resumen['filas']:,} filas** puntuadas en {resumen['segundos']:.2f} s "
+               f"({resumen['filas_por_segundo']:,.0f} filas/s). Fraudes detectados: {resumen['fraudes']:,}.")
+    st.caption(f"Resultados guardados en {resumen['destino']}")
+    if os.path.getsize(destino) > LIMITE_DESCARGA:
+        st.info("El resultado es demasiado grande para descargarlo desde el navegador; "
+                "para extractos de este tamaño use `fraude.lotes.puntuar_archivo` directamente en el servidor.")
+    else:
+        st.download_button("⬇️ Descargar resultados", leer(destino), file_name="puntuaciones" + extension,
+                           mime="application/octet-stream" if es_parquet(destino) else "text/csv", on_click="ignore")
@@ -0,0 +1,106 @@
+import os
+import sys
+import time
+
+import streamlit as st
+
+# Permitir importar el paquete compartido desde la raíz del proyecto
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fraude.modelo import RUTA_MODELO
+from fraude.perfiles import PERFILES
+from fraude.puntuacion import obtener_scorer
+from fraude.sensibilidad import PASOS_MAXIMOS, barrido, frontera, rango_por_defecto, valores_eje
+
+st.title("🔍 Análisis What-If")
+st.markdown("Elija un perfil y una o dos características: la probabilidad de fraude se calcula sobre toda "
+            "la rejilla de valores en una sola llamada al modelo.")
+
+# Cargar el modelo (una sola instancia por proceso)
+try:
+    scorer = obtener_scorer(RUTA_MODELO)
+except Exception as e:
+    st.error(f"Error al cargar el modelo: {str(e)}")
+    st.stop()
+
+
+def dibujar_curva(feature, valores, proba, umbral):
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(8, 4))
+    ax.plot(valores, proba, color="tab:red")
+    ax.axhline(umbral, color="gray", linestyle="--", label=f"Umbral {umbral:.2f}")
+    ax.set_xlabel(feature)
+    ax.set_ylabel("Probabilidad de fraude")
+    ax.set_ylim(0, 1)
+    ax.legend()
+    return fig
+
+
+def dibujar_mapa(feature_x, valores_x, feature_y, valores_y, proba, umbral):
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(8, 6))
+    imagen = ax.imshow(proba, origin="lower", aspect="auto", cmap="RdYlGn_r", vmin=0, vmax=1,
+                       extent=(valores_x[0], valores_x[-1], valores_y[0], valores_y[-1]))
+    if proba.min() < umbral < proba.max():
+        # Frontera de decisión: a partir de esta línea el cliente se clasifica como fraude
+        ax.contour(valores_x, valores_y, proba, levels=[umbral], colors="black", linewidths=1.5)
+    fig.colorbar(imagen, ax=ax, label="Probabilidad de fraude")
+    ax.set_xlabel(feature_x)
+    ax.set_ylabel(feature_y)
+    return fig
+
+
+def mostrar(fig):
+    import matplotlib.pyplot as plt
+
+    st.pyplot(fig)
+    # pyplot guarda una referencia a cada figura: sin cerrarla, cada barrido deja una en el servidor
+    plt.close(fig)
+
+
+perfil = st.selectbox("Perfil base", list(PERFILES.keys()))
+base = PERFILES[perfil]["datos"]
+seleccion = st.multiselect("Características a barrer (una o dos)", list(scorer.features),
+                           default=["proposed_credit_limit", "credit_risk_score"], max_selections=2)
+umbral = st.slider("Umbral de fraude", 0.0, 1.0, 0.5, step=0.01)
+
+ejes = []
+for feature in seleccion:
+    minimo, maximo = rango_por_defecto(feature, base.get(feature, 0))
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        desde = st.number_input(f"{feature}: desde", value=float(minimo), key=f"desde_{feature}")
+    with col2:
+        hasta = st.number_input(f"{feature}: hasta", value=float(maximo), key=f"hasta_{feature}")
+    with col3:
+        pasos = st.number_input(f"{feature}: pasos", min_value=2, max_value=PASOS_MAXIMOS, value=100,
+                                key=f"pasos_{feature}")
+    ejes.append((feature, valores_eje(desde, hasta, pasos)))
+
+if st.button("📈 Calcular Barrido", disabled=not ejes):
+    # El eje Y (segunda característica) va primero para que la matriz sea (filas=Y, columnas=X)
+    ejes = ejes[::-1]
+    inicio = time.perf_counter()
+    try:
+        proba = barrido(scorer, base, ejes)
+    except Exception as e:
+        st.error(f"Error en el barrido: {str(e)}")
+        st.stop()
+    segundos = time.perf_counter() - inicio
+    st.caption(f"{proba.size:,} combinaciones puntuadas en {segundos * 1000:.0f} ms")
+
+    if len(ejes) == 1:
+        feature, valores = ejes[0]
+        mostrar(dibujar_curva(feature, valores, proba, umbral))
+        corte = frontera(valores, proba, umbral)[0]
+        if corte == corte:
+            st.markdown(f"**Frontera:** la probabilidad supera el umbral por primera vez con `{feature}` = {corte:,.2f}")
+        else:
+            st.markdown("**Frontera:** el perfil no supera el umbral en este rango.")
+    else:
+        (feature_y, valores_y), (feature_x, valores_x) = ejes
+        mostrar(dibujar_mapa(feature_x, valores_x, feature_y, valores_y, proba, umbral))
+        with st.expander(f"Primer valor de {feature_x} que supera el umbral, por {feature_y}"):
+            st.dataframe({feature_y: valores_y, feature_x: frontera(valores_x, proba, umbral)})
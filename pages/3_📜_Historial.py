@@ -0,0 +1,45 @@
+import math
+import os
+import sys
+
+import streamlit as st
+
+# Permitir importar el paquete compartido desde la raíz del proyecto
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fraude.auditoria import obtener_auditoria, pagina, total_filas
+
+st.title("📜 Historial de Predicciones")
+st.markdown("Todas las predicciones puntuadas, de la más reciente a la más antigua: entradas, probabilidad, "
+            "etiqueta, versión del modelo y latencia. Solo se leen los segmentos de la página mostrada.")
+
+auditoria = obtener_auditoria()
+est = auditoria.estadisticas()
+
+# Estado del búfer de este proceso
+col1, col2, col3, col4 = st.columns(4)
+col1.metric("Anotadas (este proceso)", f"{est['anotadas']:,}")
+col2.metric("Pendientes de volcar", f"{est['pendientes']:,}/{est['capacidad']:,}")
+col3.metric("Segmentos empezados", f"{est['segmentos']:,}", f"{est['eliminados']:,} borrados por retención",
+            delta_color="off")
+col4.metric("Descartadas", f"{est['descartadas']:,}")
+if auditoria.error is not None:
+    st.warning(f"⚠️ Último volcado fallido: {auditoria.error}")
+if st.button("💾 Volcar ahora", disabled=not est["pendientes"]):
+    filas = auditoria.volcar()
+    st.toast(f"{filas:,} filas escritas en {auditoria.directorio}")
+
+# Paginación
+col1, col2 = st.columns(2)
+tamano = col1.selectbox("Filas por página", [25, 50, 100, 200], index=1)
+paginas = max(1, math.ceil(total_filas(auditoria.directorio, auditoria) / tamano))
+numero = col2.number_input(f"Página (de {paginas:,})", min_value=1, max_value=paginas, value=1)
+
+marco, total = pagina(int(numero) - 1, tamano, directorio=auditoria.directorio, auditoria=auditoria)
+if not total:
+    st.info("Todavía no hay predicciones registradas.")
+else:
+    st.caption(f"{total:,} predicciones en total · fechas en UTC · versión = SHA-256 del artefacto del modelo")
+    st.dataframe(marco, hide_index=True)
+    st.download_button("⬇️ Descargar esta página (CSV)", marco.to_csv(index=False),
+                       file_name=f"historial_pagina_{int(numero)}.csv", mime="text/csv")
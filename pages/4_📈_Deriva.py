@@ -0,0 +1,58 @@
+import os
+import sys
+
+import streamlit as st
+
+# Permitir importar el paquete compartido desde la raíz del proyecto
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fraude.deriva import RUTA_REFERENCIA, UMBRALES_PSI, error_monitor, estado_psi, obtener_monitor
+
+st.title("📈 Deriva de las Características")
+st.markdown("Distribución de las entradas puntuadas por este proceso frente a la de entrenamiento, "
+            "actualizada con cada predicción sin guardar el historial.")
+
+monitor = obtener_monitor()
+if monitor is None:
+    error = error_monitor()
+    if error is not None:
+        st.error(f"❌ No se pudo cargar la referencia `{RUTA_REFERENCIA}`: {error}")
+        st.stop()
+    st.info(f"No hay referencia en `{RUTA_REFERENCIA}`. Créela a partir de los datos de entrenamiento con:\n\n"
+            "`python -m fraude.deriva referencia entrenamiento.csv`")
+    st.stop()
+
+if monitor.error is not None:
+    st.warning(f"⚠️ {monitor.error}")
+
+col1, col2 = st.columns(2)
+col1.metric("Predicciones observadas", f"{monitor.n:,}")
+col2.metric("Filas de referencia", f"{monitor.referencia['n']:,}")
+if st.button("🔄 Reiniciar ventana"):
+    monitor.reiniciar()
+    st.rerun()
+
+if not monitor.n:
+    st.info("Todavía no se ha puntuado ninguna transacción en este proceso.")
+    st.stop()
+
+# Resumen por característica, de mayor a menor PSI
+informe = monitor.informe()
+st.caption(f"PSI < {UMBRALES_PSI[0]}: estable · {UMBRALES_PSI[0]}–{UMBRALES_PSI[1]}: vigilar · "
+           f"> {UMBRALES_PSI[1]}: deriva. KS calculado sobre los intervalos del histograma.")
+st.dataframe(
+    [{"Característica": f["feature"], "Estado": estado_psi(f["psi"]), "PSI": round(f["psi"], 4),
+      "KS": round(f["ks"], 4), "Fuera de rango": f"{f['fuera_de_rango']:.1%}", "NaN": f"{f['nan']:.1%}",
+      "Mediana ref.": f["p50_ref"], "Mediana en vivo": f["p50_vivo"],
+      "p99 ref.": f["p99_ref"], "p99 en vivo": f["p99_vivo"]} for f in informe],
+    hide_index=True,
+)
+
+# Histograma de una característica: referencia frente a tráfico en vivo
+feature = st.selectbox("Característica", [f["feature"] for f in informe])
+bordes, p_ref, p_viva = monitor.histograma(feature)
+etiquetas = [f"≤ {bordes[0]:.4g}"] + [f"{a:.4g} – {b:.4g}" for a, b in zip(bordes[:-1], bordes[1:])] + \
+            [f"> {bordes[-1]:.4g}"]
+st.bar_chart({"Intervalo": etiquetas * 2, "Proporción": list(p_ref) + list(p_viva),
+              "Origen": ["Referencia"] * len(etiquetas) + ["En vivo"] * len(etiquetas)},
+             x="Intervalo", y="Proporción", color="Origen", stack=False, sort=False)
@@ -0,0 +1,65 @@
+import math
+import os
+import sys
+
+import streamlit as st
+
+# Permitir importar el paquete compartido desde la raíz del proyecto
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fraude.auditoria import pagina, total_filas
+from fraude.sombra import RUTA_RETADOR, error_retador, obtener_retador
+
+st.title("🥊 Modelo Retador en Sombra")
+st.markdown("Cada transacción puntuada por el modelo en servicio se puntúa también con el retador, en segundo "
+            "plano y sin retrasar la respuesta. Aquí se comparan sus decisiones y latencias.")
+
+retador = obtener_retador(RUTA_RETADOR)
+if retador is None:
+    st.info("No hay retador configurado. Indique su artefacto con la variable de entorno `RUTA_RETADOR` "
+            "(`.pkl.gz`, `.joblib` o XGBoost `.json`/`.ubj`).")
+    st.stop()
+if not retador.cargado():
+    error = error_retador(RUTA_RETADOR)
+    if error is not None:
+        st.error(f"❌ No se pudo cargar el retador (se reintentará): {error}")
+    else:
+        st.info("⏳ Cargando el retador en segundo plano; mientras tanto no se compara ninguna predicción.")
+    if st.button("🔄 Actualizar"):
+        st.rerun()
+    st.stop()
+
+st.caption(f"Retador: `{retador.ruta}` · versión `{retador.version[:12]}`")
+est = retador.estadisticas()
+col1, col2, col3, col4 = st.columns(4)
+col1.metric("Comparadas (este proceso)", f"{est['comparadas']:,}")
+col2.metric("Desacuerdos", f"{est['desacuerdos']:,}", f"{est['tasa_desacuerdo']:.2%}", delta_color="off")
+col3.metric("Omitidas (carga o cola llena)", f"{est['omitidas']:,}")
+col4.metric("Errores", f"{est['errores']:,}")
+if retador.error is not None:
+    st.warning(f"⚠️ Último error del retador: {retador.error}")
+
+st.subheader("⏱️ Latencia")
+st.dataframe(
+    [{"Modelo": nombre, **{f"p{p}": f"{est[f'p{p}_{clave}_ms']:.2f} ms" for p in (50, 95, 99)}}
+     for nombre, clave in (("Campeón (petición)", "campeon"), ("Retador (en sombra)", "retador"))],
+    hide_index=True,
+)
+
+# Registro de comparaciones, paginado como el historial
+st.subheader("📋 Comparaciones")
+registro = retador.registro
+solo_desacuerdos = st.toggle("Solo desacuerdos de esta página")
+col1, col2 = st.columns(2)
+tamano = col1.selectbox("Filas por página", [25, 50, 100, 200], index=1)
+paginas = max(1, math.ceil(total_filas(registro.directorio, registro) / tamano))
+numero = col2.number_input(f"Página (de {paginas:,})", min_value=1, max_value=paginas, value=1)
+
+marco, total = pagina(int(numero) - 1, tamano, directorio=registro.directorio, auditoria=registro)
+if not total:
+    st.info("Todavía no hay comparaciones registradas.")
+else:
+    if solo_desacuerdos:
+        marco = marco[marco["fraud_label"] != marco["etiqueta_campeon"]]
+    st.caption(f"{total:,} comparaciones en total · fraud_probability, fraud_label y latencia_ms son del retador")
+    st.dataframe(marco, hide_index=True)
@@ -0,0 +1,72 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+# Permitir importar el paquete compartido desde la raíz del proyecto
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fraude.modelo import RUTA_MODELO
+from fraude.perfiles import PERFILES, RUTA_PERFILES
+from fraude.registro import obtener_registro
+
+st.title("👥 Comparación de Perfiles")
+st.markdown("Probabilidad de fraude de todos los perfiles de cliente, calculada en un solo lote al cargar el "
+            "modelo. Edite cualquier celda: solo se vuelven a puntuar los perfiles modificados.")
+
+# Versión en servicio: su scorer y la puntuación de los perfiles van juntos
+registro = obtener_registro(RUTA_MODELO)
+registro.esperar()
+version = registro.actual()
+if version is None:
+    st.error(f"Error al cargar el modelo: {str(registro.error)}")
+    st.stop()
+puntuacion = version.perfiles
+features = list(puntuacion.features)
+
+col1, col2 = st.columns(2)
+umbral = col1.slider("Umbral de fraude", 0.0, 1.0, 0.5, step=0.01)
+filtro = col2.text_input("Filtrar perfiles por nombre")
+
+# Valores tal como están en el archivo (no los float32 del modelo) para editarlos cómodamente
+clave = f"perfiles_{version.version}"
+base = pd.DataFrame([PERFILES[nombre]["datos"] for nombre in puntuacion.nombres],
+                    index=pd.Index(puntuacion.nombres, name="Perfil"))[features]
+with st.expander(f"✏️ Editar perfiles ({len(base):,} en `{os.path.basename(RUTA_PERFILES)}`)"):
+    editado = st.data_editor(base, key=clave, num_rows="fixed")
+    if st.button("↩️ Descartar cambios"):
+        del st.session_state[clave]
+        st.rerun()
+
+proba, cambiadas = puntuacion.repuntuar(version.scorer, editado[features].to_numpy(dtype=np.float32))
+editados = np.zeros(len(proba), dtype=bool)
+editados[cambiadas] = True
+
+col1, col2, col3 = st.columns(3)
+col1.metric("Perfiles", f"{len(proba):,}")
+col2.metric("Editados (repuntuados)", f"{len(cambiadas):,}")
+col3.metric("Sobre el umbral", f"{int((proba > umbral).sum()):,}")
+
+resultado = pd.DataFrame({
+    "Perfil": puntuacion.nombres,
+    "Probabilidad": proba,
+    "Original": puntuacion.proba,
+    "Cambio": proba - puntuacion.proba,
+    "Predicción": np.where(proba > umbral, "🚨 Fraude", "✅ No Fraude"),
+    "Editado": editados,
+})
+if filtro:
+    resultado = resultado[resultado["Perfil"].str.contains(filtro, case=False, regex=False)]
+st.dataframe(
+    resultado.sort_values("Probabilidad", ascending=False),
+    hide_index=True,
+    column_config={
+        "Probabilidad": st.column_config.ProgressColumn(min_value=0.0, max_value=1.0, format="%.3f"),
+        "Original": st.column_config.NumberColumn(format="%.3f"),
+        "Cambio": st.column_config.NumberColumn(format="%+.3f"),
+    },
+)
+st.caption(f"Modelo {version.corta} (cargado {version.cargado}) · las probabilidades originales se "
+           "calcularon al cargar esta versión")
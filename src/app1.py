@@ -1,33 +1,22 @@
-import joblib
 import streamlit as st
 import os
-import gzip
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-from sklearn.ensemble import RandomForestClassifier
+import sys
+import time
 
-# Configuración de la aplicación
-st.set_page_config(page_title="Fraude Financiero", page_icon="💰", layout="wide")
+# Permitir importar el paquete compartido desde la raíz del proyecto
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-# Ruta del modelo
-RUTA_MODELO = "modelo_RandomForest_optimizado.pkl.gz"
+from fraude.auditoria import auditar
+from fraude.modelo import RUTA_MODELO
+from fraude.paneles import panel_arranque, panel_cache, panel_metricas
+from fraude.puntuacion import obtener_scorer
 
-def cargar_modelo_comprimido(ruta):
-    """Carga el modelo comprimido con gzip y verifica que sea un RandomForestClassifier."""
-    if not os.path.exists(ruta):
-        raise FileNotFoundError(f"El archivo {ruta} no existe. Verifica que está en la carpeta correcta.")
-    with gzip.open(ruta, "rb") as f:
-        modelo = joblib.load(f)
-    
-    if not isinstance(modelo, RandomForestClassifier):
-        raise ValueError("El modelo cargado no es un RandomForestClassifier.")
-    
-    return modelo
+# Configuración de la aplicación
+st.set_page_config(page_title="Fraude Financiero", page_icon="💰", layout="wide")
 
-# Cargar el modelo
+# Cargar el modelo (una sola instancia por proceso, verificada como RandomForest)
 try:
-    model = cargar_modelo_comprimido(RUTA_MODELO)
+    scorer = obtener_scorer(RUTA_MODELO)
 except Exception as e:
     st.error(f"Error al cargar el modelo: {str(e)}")
     st.stop()
@@ -77,24 +66,35 @@ if menu == "Predicción de Fraude":
         submit_button = st.form_submit_button("🚀 Predecir")  
 
     if submit_button:  
-        # Crear el dataframe de entrada con las variables seleccionadas
-        data_df = pd.DataFrame([[
-            income, name_email_similarity, prev_address_months_count, current_address_months_count, customer_age,
-            intended_balcon_amount, velocity_6h, velocity_24h, bank_branch_count_8w, date_of_birth_distinct_emails_4w,
-            credit_risk_score, email_is_free == "Sí", phone_home_valid == "Sí", phone_mobile_valid == "Sí", has_other_cards == "Sí",
-            proposed_credit_limit, foreign_request == "Sí", keep_alive_session, device_distinct_emails_8w, month
-        ]], columns=[
-            'income', 'name_email_similarity', 'prev_address_months_count', 'current_address_months_count', 'customer_age',
-            'intended_balcon_amount', 'velocity_6h', 'velocity_24h', 'bank_branch_count_8w', 'date_of_birth_distinct_emails_4w',
-            'credit_risk_score', 'email_is_free', 'phone_home_valid', 'phone_mobile_valid', 'has_other_cards', 'proposed_credit_limit',
-            'foreign_request', 'keep_alive_session', 'device_distinct_emails_8w', 'month'
-        ])
+        # Crear el registro de entrada; el scorer lo ordena según feature_names_in_
+        registro = {
+            'income': income, 'name_email_similarity': name_email_similarity,
+            'prev_address_months_count': prev_address_months_count,
+            'current_address_months_count': current_address_months_count, 'customer_age': customer_age,
+            'intended_balcon_amount': intended_balcon_amount, 'velocity_6h': velocity_6h, 'velocity_24h': velocity_24h,
+            'bank_branch_count_8w': bank_branch_count_8w,
+            'date_of_birth_distinct_emails_4w': date_of_birth_distinct_emails_4w,
+            'credit_risk_score': credit_risk_score, 'email_is_free': email_is_free == "Sí",
+            'phone_home_valid': phone_home_valid == "Sí", 'phone_mobile_valid': phone_mobile_valid == "Sí",
+            'has_other_cards': has_other_cards == "Sí", 'proposed_credit_limit': proposed_credit_limit,
+            'foreign_request': foreign_request == "Sí", 'keep_alive_session': keep_alive_session,
+            'device_distinct_emails_8w': device_distinct_emails_8w, 'month': month
+        }
         
-        # Filtrar las características para que coincidan con el modelo
         try:
-            data_df = data_df[model.feature_names_in_]
-            prediction = str(model.predict(data_df)[0])
+            inicio = time.perf_counter()
+            proba = scorer.predict_proba_fila(registro)
+            prediction = str(scorer.classes_[int(proba.argmax())])
+            segundos = time.perf_counter() - inicio
             pred_class = class_dict[prediction]
             st.success(f"🔮 **Predicción:** {pred_class}")
         except Exception as e:
             st.error(f"Error en la predicción: {str(e)}")
+        else:
+            # Historial de auditoría: entradas, resultado, versión del modelo y latencia
+            auditar(scorer, registro, int(prediction), segundos, "app1", proba[scorer.indice_fraude])
+
+# Estado de la caché de predicciones y latencia por etapa
+panel_cache(scorer.cache)
+panel_metricas()
+panel_arranque()
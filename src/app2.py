@@ -1,43 +1,44 @@
 import streamlit as st
-import joblib
-import gzip
-import pandas as pd
-import numpy as np
 import os
-from sklearn.preprocessing import StandardScaler
+import sys
+import time
+
+# Permitir importar el paquete compartido desde la raíz del proyecto
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fraude.auditoria import auditar
+from fraude.modelo import RUTA_MODELO
+from fraude.paneles import panel_arranque, panel_modelo
+from fraude.registro import obtener_registro
 
 # Configuración de la app
 st.set_page_config(page_title="Detección de Fraude", page_icon="💰", layout="wide")
 
 # Ruta del modelo
-MODEL_PATH = "modelo_RandomForest_optimizado.pkl.gz"
+MODEL_PATH = RUTA_MODELO
 
-# Cargar el modelo
-@st.cache_resource()
+# Cargar el modelo (registro compartido por el proceso; las versiones nuevas se cargan en segundo plano)
 def cargar_modelo():
     if not os.path.exists(MODEL_PATH):
         st.error(f"⚠️ Error: No se encuentra el modelo en {MODEL_PATH}")
         st.stop()
-    with gzip.open(MODEL_PATH, "rb") as f:
-        model = joblib.load(f)
-    return model
-
-model = cargar_modelo()
-
-# Verificar si el modelo es correcto
-if not hasattr(model, "feature_names_in_"):
-    st.error("El modelo cargado no tiene información de características. Revisa el entrenamiento del modelo.")
-    st.stop()
+    registro_modelos = obtener_registro(MODEL_PATH)
+    registro_modelos.esperar()
+    if registro_modelos.actual() is None:
+        st.error(f"Error al cargar el modelo: {str(registro_modelos.error)}")
+        st.stop()
+    return registro_modelos
 
-# Obtener las características que espera el modelo
-expected_features = list(model.feature_names_in_)
+registro_modelos = cargar_modelo()
 
-# Definir las variables que se deben ingresar
-input_features = expected_features.copy()
+# Versión en servicio al empezar esta ejecución; el scorer ordena las entradas según las características del modelo
+version = registro_modelos.actual()
+scorer = version.scorer
 
 # Sidebar con información
 st.sidebar.title("📌 Menú de Navegación")
 menu = st.sidebar.radio("Selecciona una opción:", ["Predicción de Fraude", "Información sobre Fraude"])
+decision_rapida = st.sidebar.toggle("⚡ Decisión rápida", help="Misma etiqueta, evaluando solo los árboles necesarios.")
 
 if menu == "Predicción de Fraude":
     st.title("🔍 Predicción de Fraude en Transacciones Bancarias")
@@ -60,6 +61,7 @@ if menu == "Predicción de Fraude":
             velocity_6h = st.number_input("Velocidad Transacción En 6h", min_value=0.0, max_value=10000.0, value=10.0)
             velocity_24h = st.number_input("Velocidad Transacción En 24h", min_value=0.0, max_value=10000.0, value=20.0)
             bank_branch_count_8w = st.number_input("Sucursales Bancarias En 8 Semanas", min_value=0, max_value=50, value=5)
+            date_of_birth_distinct_emails_4w = st.number_input("Emails Distintos en 4 Semanas", min_value=0, max_value=50, value=5)
             credit_risk_score = st.number_input("Puntuación de Riesgo Crediticio", min_value=0, max_value=1000, value=300)
             proposed_credit_limit = st.number_input("Límite de Crédito Propuesto", min_value=0.0, max_value=1000000.0, value=5000.0)
             month = st.slider("Mes de la Transacción", min_value=1, max_value=12, value=1)
@@ -84,21 +86,43 @@ if menu == "Predicción de Fraude":
         has_other_cards = binary_mapping[has_other_cards]
         foreign_request = binary_mapping[foreign_request]
         
-        # Crear dataframe con las características ordenadas correctamente
-        data_df = pd.DataFrame([[
-            income, name_email_similarity, prev_address_months_count, current_address_months_count, customer_age,
-            intended_balcon_amount, velocity_6h, velocity_24h, bank_branch_count_8w, credit_risk_score,
-            email_is_free, phone_home_valid, phone_mobile_valid, has_other_cards, proposed_credit_limit,
-            foreign_request, keep_alive_session, device_distinct_emails_8w, month
-        ]], columns=input_features)
-        
-        # Asegurar que las columnas coincidan con el modelo
-        data_df = data_df[expected_features]
+        # Crear el registro de entrada; el scorer lo ordena según feature_names_in_
+        registro = {
+            "income": income, "name_email_similarity": name_email_similarity,
+            "prev_address_months_count": prev_address_months_count,
+            "current_address_months_count": current_address_months_count, "customer_age": customer_age,
+            "intended_balcon_amount": intended_balcon_amount, "velocity_6h": velocity_6h, "velocity_24h": velocity_24h,
+            "bank_branch_count_8w": bank_branch_count_8w,
+            "date_of_birth_distinct_emails_4w": date_of_birth_distinct_emails_4w,
+            "credit_risk_score": credit_risk_score, "email_is_free": email_is_free,
+            "phone_home_valid": phone_home_valid, "phone_mobile_valid": phone_mobile_valid,
+            "has_other_cards": has_other_cards, "proposed_credit_limit": proposed_credit_limit,
+            "foreign_request": foreign_request, "keep_alive_session": keep_alive_session,
+            "device_distinct_emails_8w": device_distinct_emails_8w, "month": month
+        }
         
         # Realizar la predicción
         try:
-            prediction = model.predict(data_df)[0]
+            inicio = time.perf_counter()
+            if decision_rapida:
+                etiquetas, evaluados = scorer.predict_rapido(registro)
+                prediction, proba_fraude = etiquetas[0], None
+            else:
+                proba = scorer.predict_proba_fila(registro)
+                prediction, proba_fraude = scorer.classes_[int(proba.argmax())], proba[scorer.indice_fraude]
+            segundos = time.perf_counter() - inicio
             resultado = "Fraude" if prediction == 1 else "No Fraude"
             st.success(f"🔮 **Predicción:** {resultado}")
+            st.session_state["version_modelo"] = version.version
+            st.caption(f"Modelo {version.corta} (cargado {version.cargado})")
+            if decision_rapida:
+                st.caption(f"Árboles evaluados: {evaluados[0]} de {scorer.n_arboles}")
         except Exception as e:
             st.error(f"Error en la predicción: {str(e)}")
+        else:
+            # Historial de auditoría: entradas, resultado, versión del modelo y latencia
+            auditar(scorer, registro, prediction, segundos, "app2", proba_fraude)
+
+# Versión del modelo en servicio y tiempo hasta el primer render (solo con FRAUDE_PERFIL_ARRANQUE=1)
+panel_modelo(registro_modelos)
+panel_arranque()
@@ -1,54 +1,78 @@
 import streamlit as st
-import joblib
-import gzip
-import pandas as pd
 import os
-from sklearn.ensemble import RandomForestClassifier
+import sys
+import time
+
+# Permitir importar el paquete compartido desde la raíz del proyecto
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fraude.auditoria import auditar
+from fraude.modelo import RUTA_MODELO
+from fraude.paneles import panel_arranque, panel_modelo
+from fraude.registro import obtener_registro
 
 # Configuración de la aplicación
 st.set_page_config(page_title="Fraude Bancario", page_icon="🚨", layout="wide")
 
 # Ruta del modelo
-MODEL_PATH = "modelo_RandomForest_optimizado.pkl.gz"
-
-# Función para cargar el modelo
-@st.cache_resource()
-def load_model():
-    if not os.path.exists(MODEL_PATH):
-        st.error("⚠️ Error: El modelo no se encuentra en la ruta especificada.")
-        return None
-    with gzip.open(MODEL_PATH, "rb") as f:
-        model = joblib.load(f)
-    if not isinstance(model, RandomForestClassifier):
-        st.error("⚠️ El archivo cargado no es un modelo RandomForest.")
-        return None
-    return model
-
-# Cargar el modelo
-model = load_model()
-
-if model:
-    st.success("✅ Modelo cargado correctamente.")
-    
-    # Entrada de datos de prueba
-    st.sidebar.header("📊 Introducir Datos de Transacción")
-    
-    input_data = {
-        'income': st.sidebar.number_input("Ingresos", min_value=0.0, max_value=1e6, value=5000.0),
-        'name_email_similarity': st.sidebar.slider("Similitud Nombre-Email", 0.0, 1.0, 0.5),
-        'customer_age': st.sidebar.number_input("Edad del Cliente", min_value=18, max_value=100, value=30),
-        'proposed_credit_limit': st.sidebar.number_input("Límite de Crédito Propuesto", min_value=0.0, max_value=1e6, value=10000.0),
-        'velocity_6h': st.sidebar.number_input("Velocidad de Transacción (6h)", min_value=0.0, max_value=10000.0, value=100.0),
-    }
-    
-    df_input = pd.DataFrame([input_data])
-    
-    if st.sidebar.button("🚀 Predecir Fraude"):
-        try:
-            prediction = model.predict(df_input)[0]
-            result = "Fraude" if prediction == 1 else "No Fraude"
-            st.subheader(f"🔮 Predicción: {result}")
-        except Exception as e:
-            st.error(f"Error en la predicción: {str(e)}")
+MODEL_PATH = RUTA_MODELO
+
+# Cargar el modelo en segundo plano (registro compartido por el proceso, con recarga en caliente);
+# la página se pinta mientras tanto
+registro = obtener_registro(MODEL_PATH)
+
+# Versión en servicio al empezar esta ejecución: la predicción termina con ella aunque llegue otra
+version = registro.actual()
+scorer = version.scorer if version is not None else None
+if version is not None:
+    st.success(f"✅ Modelo cargado correctamente (versión {version.corta}).")
+elif not registro.listo():
+    st.info("⏳ Cargando el modelo... El botón de predicción se activará en cuanto esté listo.")
+elif isinstance(registro.error, FileNotFoundError):
+    st.error("⚠️ Error: El modelo no se encuentra en la ruta especificada.")
+elif isinstance(registro.error, ValueError):
+    st.error("⚠️ El archivo cargado no es un modelo RandomForest válido.")
 else:
+    st.error(f"Error al cargar el modelo: {str(registro.error)}")
+
+# Entrada de datos de prueba
+st.sidebar.header("📊 Introducir Datos de Transacción")
+
+input_data = {
+    'income': st.sidebar.number_input("Ingresos", min_value=0.0, max_value=1e6, value=5000.0),
+    'name_email_similarity': st.sidebar.slider("Similitud Nombre-Email", 0.0, 1.0, 0.5),
+    'customer_age': st.sidebar.number_input("Edad del Cliente", min_value=18, max_value=100, value=30),
+    'proposed_credit_limit': st.sidebar.number_input("Límite de Crédito Propuesto", min_value=0.0, max_value=1e6, value=10000.0),
+    'velocity_6h': st.sidebar.number_input("Velocidad de Transacción (6h)", min_value=0.0, max_value=10000.0, value=100.0),
+}
+
+if st.sidebar.button("🚀 Predecir Fraude", disabled=scorer is None):
+    try:
+        inicio = time.perf_counter()
+        proba = scorer.predict_proba_fila(input_data)
+        prediction = scorer.classes_[int(proba.argmax())]
+        segundos = time.perf_counter() - inicio
+        result = "Fraude" if prediction == 1 else "No Fraude"
+        st.subheader(f"🔮 Predicción: {result}")
+        st.session_state["version_modelo"] = version.version
+        st.caption(f"Modelo {version.corta}")
+    except Exception as e:
+        st.error(f"Error en la predicción: {str(e)}")
+    else:
+        # Historial de auditoría: entradas, resultado, versión del modelo y latencia
+        auditar(scorer, input_data, prediction, segundos, "app3", proba[scorer.indice_fraude])
+
+if registro.listo() and scorer is None:
     st.warning("⚠️ No se pudo cargar el modelo. Verifica la ruta del archivo.")
+    if st.button("🔄 Reintentar"):
+        registro.reintentar()
+        st.rerun()
+
+# Versión del modelo en servicio y tiempo hasta el primer render (solo con FRAUDE_PERFIL_ARRANQUE=1)
+panel_modelo(registro)
+panel_arranque()
+
+# Con la página ya visible, esperar a que termine la carga y volver a ejecutar para activar el botón
+if not registro.listo():
+    registro.esperar()
+    st.rerun()